@@ -0,0 +1,75 @@
+"""
+Configuração do banco de dados.
+
+`configurar` monta DATABASES["default"] a partir de DATABASE_URL (via
+dj-database-url; sem a variável, o db.sqlite3 do projeto) com conexões
+persistentes (DB_CONN_MAX_AGE) e checagem de saúde antes de reusá-las.
+
+No SQLite, cada conexão nova recebe os PRAGMAs de produção (`ajustar_sqlite`,
+ligado ao sinal connection_created em NoticiasConfig.ready; importar este
+módulo, como faz o settings, não registra nada):
+
+  - journal_mode=WAL: leitores não bloqueiam o escritor nem vice-versa;
+  - synchronous=NORMAL: com WAL, fsync só nos checkpoints (seguro contra
+    queda do processo; uma queda de energia pode perder as últimas transações);
+  - busy_timeout: espera o lock de escrita em vez de falhar na hora;
+  - cache_size e mmap_size: páginas quentes em memória.
+
+As transações abrem com BEGIN IMMEDIATE (pegam o lock de escrita logo no
+início), evitando o "database is locked" de uma transação que lê e depois
+tenta escrever enquanto outra escreve — caso em que o busy_timeout não ajuda.
+
+SQLITE_AJUSTES=0 desliga tudo isso (usado pelo `manage.py benchmark_votos`
+para medir o antes/depois).
+
+`replicas` monta os aliases das réplicas de leitura (ver Brasa/replicas.py).
+"""
+import os
+
+import dj_database_url
+from django.conf import settings
+
+
+def _ajustes_ligados():
+    return os.getenv("SQLITE_AJUSTES", "1") == "1"
+
+
+def configurar(padrao, conn_max_age=60):
+    """DATABASES["default"] a partir de DATABASE_URL, ou de `padrao` (URL) se ela não existir."""
+    banco = dj_database_url.config(
+        default=padrao, conn_max_age=conn_max_age, conn_health_checks=conn_max_age > 0,
+    )
+    if banco["ENGINE"] == "django.db.backends.sqlite3" and _ajustes_ligados():
+        banco.setdefault("OPTIONS", {})["transaction_mode"] = "IMMEDIATE"
+    return banco
+
+
+def replicas(urls, conn_max_age=60):
+    """{"replica_1": {...}, ...} a partir de URLs separadas por vírgula."""
+    bancos = {}
+    for i, url in enumerate(u.strip() for u in urls.split(",") if u.strip()):
+        banco = dj_database_url.parse(url, conn_max_age=conn_max_age, conn_health_checks=conn_max_age > 0)
+        # nos testes a réplica é o próprio banco de teste do primário
+        banco["TEST"] = {"MIRROR": "default"}
+        bancos[f"replica_{i + 1}"] = banco
+    return bancos
+
+
+def pragmas_sqlite():
+    return [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={getattr(settings, 'SQLITE_BUSY_TIMEOUT_MS', 5000)}",
+        # valor negativo = tamanho em KiB
+        f"PRAGMA cache_size=-{getattr(settings, 'SQLITE_CACHE_MB', 64) * 1024}",
+        f"PRAGMA mmap_size={getattr(settings, 'SQLITE_MMAP_MB', 256) * 1024 * 1024}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def ajustar_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite" or not _ajustes_ligados():
+        return
+    with connection.cursor() as cursor:
+        for pragma in pragmas_sqlite():
+            cursor.execute(pragma)
@@ -0,0 +1,258 @@
+"""
+Instrumentação por requisição (SQL, templates e tempo total).
+
+`InstrumentacaoMiddleware` mede, em cada requisição:
+  - quantidade e tempo das consultas SQL (via connection.execute_wrapper);
+  - tempo de renderização de templates;
+  - tempo total da view (incluindo os middlewares abaixo dele).
+
+As medidas saem no cabeçalho `Server-Timing` (visíveis no DevTools do
+navegador). Requisições acima de INSTRUMENTACAO_LIMITE_MS ou de
+INSTRUMENTACAO_LIMITE_CONSULTAS geram uma linha de log JSON no logger
+"Brasa.instrumentacao" com a view, as medidas e a consulta mais lenta.
+
+Cada processo agrega histogramas de latência por view em memória e publica
+um retrato no cache a cada INTERVALO_PUBLICACAO segundos; `painel`
+(/instrumentacao/, só staff) soma os retratos de todos os workers.
+
+O custo por requisição é um wrapper de execute, alguns perf_counter e uma
+atualização de dicionário sob lock; nada é gravado no banco.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.core.cache import caches
+from django.db import connections
+from django.http import JsonResponse
+
+logger = logging.getLogger(__name__)
+
+# limites superiores (ms) dos baldes dos histogramas; o último balde é "acima"
+BALDES_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+INTERVALO_PUBLICACAO = 30
+TTL_RETRATO = 24 * 3600
+CHAVE_PROCESSOS = "instrumentacao:processos"
+
+
+class Medicao:
+    __slots__ = ("sql_qtd", "sql_ms", "sql_mais_lenta", "sql_mais_lenta_ms", "template_ms", "renderizando")
+
+    def __init__(self):
+        self.sql_qtd = 0
+        self.sql_ms = 0.0
+        self.sql_mais_lenta = ""
+        self.sql_mais_lenta_ms = 0.0
+        self.template_ms = 0.0
+        self.renderizando = False
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            ms = (time.perf_counter() - inicio) * 1000
+            self.sql_qtd += 1
+            self.sql_ms += ms
+            if ms > self.sql_mais_lenta_ms:
+                self.sql_mais_lenta, self.sql_mais_lenta_ms = sql, ms
+
+
+_medicao_atual = ContextVar("medicao_atual", default=None)
+
+
+def _instalar_medidor_de_templates():
+    """Envolve o render dos templates Django para somar o tempo na medição atual."""
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, "instrumentado", False):
+        return
+    original = Template.render
+
+    @wraps(original)
+    def render(self, context=None, request=None):
+        medicao = _medicao_atual.get()
+        # só o render de fora conta (templates renderizados dentro de outro)
+        if medicao is None or medicao.renderizando:
+            return original(self, context, request)
+        medicao.renderizando = True
+        inicio = time.perf_counter()
+        try:
+            return original(self, context, request)
+        finally:
+            medicao.template_ms += (time.perf_counter() - inicio) * 1000
+            medicao.renderizando = False
+
+    render.instrumentado = True
+    Template.render = render
+
+
+# ==============================================
+# HISTOGRAMAS POR VIEW
+# ==============================================
+def _vazio():
+    return {
+        "n": 0, "total_ms": 0.0, "sql_ms": 0.0, "sql_qtd": 0, "template_ms": 0.0,
+        "baldes": [0] * (len(BALDES_MS) + 1),
+    }
+
+
+class Histogramas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dados = {}
+        self._publicado_em = time.monotonic()
+
+    def registrar(self, view, total_ms, medicao):
+        with self._lock:
+            d = self._dados.setdefault(view, _vazio())
+            d["n"] += 1
+            d["total_ms"] += total_ms
+            d["sql_ms"] += medicao.sql_ms
+            d["sql_qtd"] += medicao.sql_qtd
+            d["template_ms"] += medicao.template_ms
+            d["baldes"][bisect_left(BALDES_MS, total_ms)] += 1
+
+    def retrato(self):
+        with self._lock:
+            return {view: {**d, "baldes": list(d["baldes"])} for view, d in self._dados.items()}
+
+    def talvez_publicar(self):
+        """Grava o retrato deste processo no cache, no máximo a cada INTERVALO_PUBLICACAO."""
+        agora = time.monotonic()
+        if agora - self._publicado_em < INTERVALO_PUBLICACAO:
+            return
+        self._publicado_em = agora
+        publicar(self.retrato())
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+
+histogramas = Histogramas()
+
+
+def _cache():
+    return caches[getattr(settings, "INSTRUMENTACAO_CACHE", "default")]
+
+
+def publicar(retrato):
+    cache, pid = _cache(), os.getpid()
+    try:
+        cache.set(f"instrumentacao:{pid}", retrato, TTL_RETRATO)
+        processos = cache.get(CHAVE_PROCESSOS) or []
+        if pid not in processos:
+            cache.set(CHAVE_PROCESSOS, (processos + [pid])[-64:], TTL_RETRATO)
+    except Exception:  # instrumentação nunca derruba a requisição
+        logger.exception("Falha ao publicar histogramas")
+
+
+def _somar(destino, origem):
+    for view, d in origem.items():
+        atual = destino.setdefault(view, _vazio())
+        for campo in ("n", "total_ms", "sql_ms", "sql_qtd", "template_ms"):
+            atual[campo] += d[campo]
+        atual["baldes"] = [a + b for a, b in zip(atual["baldes"], d["baldes"])]
+    return destino
+
+
+def _percentil(baldes, n, p):
+    """Limite superior do balde que contém o percentil p (estimativa)."""
+    alvo, acumulado = p / 100 * n, 0
+    for i, qtd in enumerate(baldes):
+        acumulado += qtd
+        if acumulado >= alvo:
+            return BALDES_MS[i] if i < len(BALDES_MS) else None
+    return None
+
+
+def agregado():
+    """Histogramas de todos os processos (este, ao vivo, e os demais, do cache)."""
+    total = {}
+    pid = os.getpid()
+    cache = _cache()
+    for outro in cache.get(CHAVE_PROCESSOS) or []:
+        if outro != pid:
+            _somar(total, cache.get(f"instrumentacao:{outro}") or {})
+    return _somar(total, histogramas.retrato())
+
+
+@staff_member_required
+def painel(request):
+    views = {}
+    for view, d in sorted(agregado().items(), key=lambda item: -item[1]["total_ms"]):
+        n = d["n"] or 1
+        views[view] = {
+            "requisicoes": d["n"],
+            "media_ms": round(d["total_ms"] / n, 2),
+            "p50_ms": _percentil(d["baldes"], d["n"], 50),
+            "p95_ms": _percentil(d["baldes"], d["n"], 95),
+            "p99_ms": _percentil(d["baldes"], d["n"], 99),
+            "sql_media_ms": round(d["sql_ms"] / n, 2),
+            "sql_media_consultas": round(d["sql_qtd"] / n, 1),
+            "template_media_ms": round(d["template_ms"] / n, 2),
+            "histograma": dict(zip([f"<={b}ms" for b in BALDES_MS] + [f">{BALDES_MS[-1]}ms"], d["baldes"])),
+        }
+    return JsonResponse({"processo": os.getpid(), "views": views}, json_dumps_params={"indent": 2})
+
+
+# ==============================================
+# MIDDLEWARE
+# ==============================================
+class InstrumentacaoMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _instalar_medidor_de_templates()
+
+    def __call__(self, request):
+        medicao = Medicao()
+        token = _medicao_atual.set(medicao)
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as pilha:
+                for conexao in connections.all():
+                    pilha.enter_context(conexao.execute_wrapper(medicao))
+                response = self.get_response(request)
+        finally:
+            _medicao_atual.reset(token)
+        total_ms = (time.perf_counter() - inicio) * 1000
+
+        if getattr(settings, "INSTRUMENTACAO_SERVER_TIMING", True):
+            response.headers["Server-Timing"] = (
+                f'sql;dur={medicao.sql_ms:.1f};desc="{medicao.sql_qtd} consultas", '
+                f"tpl;dur={medicao.template_ms:.1f}, "
+                f"total;dur={total_ms:.1f}"
+            )
+
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match else "<sem rota>"
+        histogramas.registrar(view, total_ms, medicao)
+        histogramas.talvez_publicar()
+
+        if (
+            total_ms > getattr(settings, "INSTRUMENTACAO_LIMITE_MS", 500)
+            or medicao.sql_qtd > getattr(settings, "INSTRUMENTACAO_LIMITE_CONSULTAS", 30)
+        ):
+            logger.warning(json.dumps({
+                "evento": "requisicao_lenta",
+                "view": view,
+                "metodo": request.method,
+                "caminho": request.path,
+                "status": response.status_code,
+                "total_ms": round(total_ms, 1),
+                "sql_ms": round(medicao.sql_ms, 1),
+                "sql_qtd": medicao.sql_qtd,
+                "template_ms": round(medicao.template_ms, 1),
+                "sql_mais_lenta_ms": round(medicao.sql_mais_lenta_ms, 1),
+                "sql_mais_lenta": medicao.sql_mais_lenta[:500],
+            }, ensure_ascii=False))
+        return response
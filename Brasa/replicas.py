@@ -0,0 +1,133 @@
+"""
+Leitura em réplicas para as telas do app `noticias`.
+
+Com réplicas configuradas (DATABASE_REPLICA_URLS -> aliases em
+settings.DATABASE_REPLICAS), `ReplicaLeituraMiddleware` escolhe uma réplica
+por requisição, em rodízio, para os GET das views de REPLICA_VIEWS (feed,
+detalhe, salvos — as recomendações do feed vêm junto). `RoteadorReplicas`
+manda para ela as leituras dos modelos do app; todo o resto vai ao
+primário:
+
+  - escritas, select_for_update e leituras dentro de transaction.atomic;
+  - qualquer leitura depois de uma escrita na mesma requisição (ex.: o
+    primeiro cálculo das recomendações no feed);
+  - as requisições de quem acabou de escrever: um POST/PUT/... (voto,
+    salvo, lote de interações) devolve o cookie REPLICA_COOKIE, válido por
+    REPLICA_FIXACAO_S segundos, e enquanto ele existir o usuário lê do
+    primário e vê o próprio voto apesar do atraso da replicação;
+  - réplicas que não conectam ficam REPLICA_PAUSA_S fora do rodízio; sem
+    réplica disponível, lê do primário.
+"""
+import itertools
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_COOKIE = "fixar_primario"
+REPLICA_PAUSA_S = 30
+APPS = {"noticias"}
+VIEWS_PADRAO = ("noticias:index", "noticias:noticia_detalhe", "noticias:salvos")
+
+
+class _Estado:
+    __slots__ = ("alias",)
+
+    def __init__(self):
+        self.alias = None
+
+
+_estado = ContextVar("replica_estado", default=None)
+_rodizio = itertools.count()
+_fora_ate = {}
+_lock = threading.Lock()
+
+
+def replicas():
+    return [alias for alias in getattr(settings, "DATABASE_REPLICAS", []) if alias in settings.DATABASES]
+
+
+def _disponivel(alias):
+    with _lock:
+        if _fora_ate.get(alias, 0) > time.monotonic():
+            return False
+    try:
+        connections[alias].ensure_connection()
+        return True
+    except Exception:
+        with _lock:
+            _fora_ate[alias] = time.monotonic() + REPLICA_PAUSA_S
+        return False
+
+
+def escolher_replica():
+    """Próxima réplica do rodízio que aceita conexão, ou None (usar o primário)."""
+    candidatas = replicas()
+    if not candidatas:
+        return None
+    inicio = next(_rodizio)
+    for i in range(len(candidatas)):
+        alias = candidatas[(inicio + i) % len(candidatas)]
+        if _disponivel(alias):
+            return alias
+    return None
+
+
+class RoteadorReplicas:
+    def db_for_read(self, model, **hints):
+        estado = _estado.get()
+        if estado is None or estado.alias is None or model._meta.app_label not in APPS:
+            return None
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return estado.alias
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None:
+            # lê as próprias escritas no resto da requisição
+            estado.alias = None
+        if model._meta.app_label in APPS:
+            # sem isso o Django gravaria no banco de onde a instância foi lida
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        bancos = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in bancos and obj2._state.db in bancos:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # o esquema chega às réplicas pela replicação
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaLeituraMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _estado.set(_Estado())
+        try:
+            response = self.get_response(request)
+        finally:
+            _estado.reset(token)
+
+        if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400 and replicas():
+            response.set_cookie(
+                REPLICA_COOKIE, "1", max_age=getattr(settings, "REPLICA_FIXACAO_S", 10),
+                httponly=True, samesite="Lax",
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in ("GET", "HEAD") or REPLICA_COOKIE in request.COOKIES:
+            return None
+        if request.resolver_match.view_name in getattr(settings, "REPLICA_VIEWS", VIEWS_PADRAO):
+            _estado.get().alias = escolher_replica()
+        return None
@@ -4,8 +4,11 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib.auth.views import LogoutView
 
+from . import instrumentacao
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("instrumentacao/", instrumentacao.painel, name="instrumentacao"),
     path("accounts/", include("django.contrib.auth.urls")),
     path("", include(("noticias.urls", "noticias"), namespace="noticias")),
     path("accounts/logout/", LogoutView.as_view(next_page='/'), name="logout"),
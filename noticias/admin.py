@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Assunto, Noticia, Voto, Salvo
+from . import busca, cache as cache_noticias
+from .models import Assunto, Noticia, Voto, VotoDiario, Salvo, Recomendacao, TarefaResumo
 
 
 @admin.register(Assunto)
@@ -12,7 +13,7 @@ class AssuntoAdmin(admin.ModelAdmin):
 
 @admin.register(Noticia)
 class NoticiaAdmin(admin.ModelAdmin):
-    list_display = ("id", "titulo", "criado_em")
+    list_display = ("id", "titulo", "criado_em", "score")
     search_fields = ("titulo", "conteudo")
     list_filter = ("assuntos", "criado_em")
     ordering = ("-criado_em",)
@@ -20,6 +21,29 @@ class NoticiaAdmin(admin.ModelAdmin):
     readonly_fields = ("criado_em",)
     autocomplete_fields = ("assuntos",)
 
+    # a busca do admin usa o mesmo índice textual da busca pública
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        ids = busca.buscar_ids(search_term, limite=1000)
+        return queryset.filter(pk__in=ids), False
+
+    # save_related roda depois do M2M de assuntos: só então o cache é invalidado
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        cache_noticias.ao_alterar_noticia(form.instance.pk)
+
+    def delete_model(self, request, obj):
+        pk = obj.pk
+        super().delete_model(request, obj)
+        cache_noticias.ao_alterar_noticia(pk)
+
+    def delete_queryset(self, request, queryset):
+        ids = list(queryset.values_list("pk", flat=True))
+        super().delete_queryset(request, queryset)
+        for pk in ids:
+            cache_noticias.ao_alterar_noticia(pk)
+
 
 @admin.register(Voto)
 class VotoAdmin(admin.ModelAdmin):
@@ -27,6 +51,29 @@ class VotoAdmin(admin.ModelAdmin):
     list_filter = ("valor",)
     search_fields = ("usuario__username", "noticia__titulo")
 
+    # Edições manuais de votos não passam por Noticia.aplicar_voto:
+    # recalcula os contadores, o score_quente e o rollup das notícias afetadas.
+    def _recalcular(self, ids):
+        Noticia.recalcular_contadores(Noticia.objects.filter(pk__in=ids))
+        Noticia.atualizar_scores_quentes(Noticia.objects.filter(pk__in=ids))
+        VotoDiario.reconstruir(ids)
+        for pk in ids:
+            cache_noticias.ao_alterar_noticia(pk)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        self._recalcular([obj.noticia_id])
+
+    def delete_model(self, request, obj):
+        noticia_id = obj.noticia_id
+        super().delete_model(request, obj)
+        self._recalcular([noticia_id])
+
+    def delete_queryset(self, request, queryset):
+        ids = list(queryset.values_list("noticia_id", flat=True).distinct())
+        super().delete_queryset(request, queryset)
+        self._recalcular(ids)
+
 
 @admin.register(Salvo)
 class SalvoAdmin(admin.ModelAdmin):
@@ -34,3 +81,18 @@ class SalvoAdmin(admin.ModelAdmin):
     list_filter = ("criado_em",)
     search_fields = ("usuario__username", "noticia__titulo")
     ordering = ("-criado_em",)
+
+
+@admin.register(Recomendacao)
+class RecomendacaoAdmin(admin.ModelAdmin):
+    list_display = ("id", "usuario", "posicao", "noticia", "afinidade", "calculado_em")
+    search_fields = ("usuario__username", "noticia__titulo")
+    ordering = ("usuario", "posicao")
+
+
+@admin.register(TarefaResumo)
+class TarefaResumoAdmin(admin.ModelAdmin):
+    list_display = ("id", "noticia", "status", "tentativas", "criado_em", "atualizado_em")
+    list_filter = ("status",)
+    search_fields = ("noticia__titulo",)
+    ordering = ("-criado_em",)
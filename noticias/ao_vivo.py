@@ -0,0 +1,95 @@
+"""
+Contadores de votos ao vivo (Server-Sent Events).
+
+Cada leitor do detalhe abre uma conexão EventSource em
+/noticia/<pk>/ao-vivo/ (view assíncrona `contadores_ao_vivo`, só sob
+ASGI) e recebe um evento `contadores` ({"up", "down", "score"}) sempre que
+alguém vota, sem polling.
+
+Pub/sub em memória, por processo: `votar` (e a API de lote) chamam
+`publicar` depois de gravar o voto; cada conexão assinante tem uma fila
+de tamanho 1 no event loop do servidor, alimentada com
+call_soon_threadsafe (as views síncronas rodam em threads). Como o evento
+é o estado completo dos contadores, um leitor lento não acumula nada: o
+evento novo substitui o que ainda não foi enviado (backpressure por
+descarte). Leitores ligados a outros workers não recebem os votos deste
+processo; no próximo reconectar, o primeiro evento já traz os contadores
+atuais do banco.
+
+Limites por worker: no máximo NOTICIAS_AO_VIVO_MAX_CONEXOES conexões
+(acima disso, 503); comentário de heartbeat a cada
+NOTICIAS_AO_VIVO_HEARTBEAT segundos para proxies não derrubarem a conexão
+ociosa; cada conexão dura até NOTICIAS_AO_VIVO_DURACAO segundos e o
+navegador reconecta sozinho (campo `retry`).
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+RETRY_MS = 3000
+CAMPOS = ("up", "down", "score")
+
+_assinantes = defaultdict(set)  # noticia_id -> {(loop, fila)}
+_lock = threading.Lock()
+
+
+def conexoes():
+    with _lock:
+        return sum(len(filas) for filas in _assinantes.values())
+
+
+def lotado():
+    return conexoes() >= getattr(settings, "NOTICIAS_AO_VIVO_MAX_CONEXOES", 500)
+
+
+def _entregar(fila, estado):
+    # roda no event loop: fica só o estado mais recente
+    if fila.full():
+        fila.get_nowait()
+    fila.put_nowait(estado)
+
+
+def publicar(noticia_id, estado):
+    """Envia os contadores da notícia a todos os leitores conectados a este processo."""
+    with _lock:
+        assinantes = list(_assinantes.get(noticia_id, ()))
+    if not assinantes:
+        return
+    estado = {campo: estado[campo] for campo in CAMPOS}
+    for loop, fila in assinantes:
+        try:
+            loop.call_soon_threadsafe(_entregar, fila, estado)
+        except RuntimeError:  # loop já encerrado; o finally da conexão remove a assinatura
+            pass
+
+
+def _evento(estado):
+    return f"event: contadores\ndata: {json.dumps(estado)}\n\n"
+
+
+async def eventos(noticia_id, inicial):
+    """Gerador assíncrono do corpo text/event-stream de uma conexão."""
+    loop = asyncio.get_running_loop()
+    assinatura = (loop, asyncio.Queue(maxsize=1))
+    with _lock:
+        _assinantes[noticia_id].add(assinatura)
+    heartbeat = getattr(settings, "NOTICIAS_AO_VIVO_HEARTBEAT", 15)
+    fim = loop.time() + getattr(settings, "NOTICIAS_AO_VIVO_DURACAO", 300)
+    try:
+        yield f"retry: {RETRY_MS}\n" + _evento({campo: inicial[campo] for campo in CAMPOS})
+        while (restante := fim - loop.time()) > 0:
+            try:
+                estado = await asyncio.wait_for(assinatura[1].get(), timeout=min(heartbeat, restante))
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield _evento(estado)
+    finally:
+        # também roda quando o cliente desconecta (a tarefa é cancelada)
+        with _lock:
+            _assinantes[noticia_id].discard(assinatura)
+            if not _assinantes[noticia_id]:
+                del _assinantes[noticia_id]
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class NoticiasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'noticias'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from Brasa import banco
+        from . import signals  # noqa: F401
+
+        connection_created.connect(banco.ajustar_sqlite, dispatch_uid="brasa_ajustar_sqlite")
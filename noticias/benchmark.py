@@ -0,0 +1,352 @@
+"""
+Massa sintética e medição de desempenho das telas do portal.
+
+`semear` gera usuários, assuntos, notícias, votos e salvos em volume (via
+bulk_create, em lotes) com distribuição enviesada como a real: poucas
+notícias concentram a maior parte dos votos (Zipf) e poucos usuários
+concentram a maior parte da atividade (Pareto). As datas se espalham pelos
+últimos `dias`, para que os filtros de período e o ranking tenham trabalho.
+
+`cenarios` descreve as requisições medidas (feed em todas as combinações
+de ordenação/filtro, detalhe, voto, salvo, minhas_salvas, busca e
+recomendações) e `medir` executa cada uma pelo Client de teste, colhendo
+latência (p50/p95) e número de consultas.
+
+`vazao_votos` mede a escrita concorrente: vários processos votando ao
+mesmo tempo nas mesmas notícias (o pico de uma notícia viral), com ou sem
+os ajustes de SQLite de Brasa/banco.py.
+
+Usado por `manage.py seed_benchmark`, `manage.py benchmark`,
+`manage.py benchmark_votos` e `manage.py explicar_consultas`.
+"""
+import bisect
+import multiprocessing
+import os
+import random
+import string
+import time
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import OperationalError, connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import busca, interacoes, paginacao, ranking, recomendacoes
+from .models import Assunto, Noticia, Salvo, Voto, VotoDiario, datas_manuais, hash_conteudo
+
+PALAVRAS = [
+    "economia", "saude", "educacao", "politica", "clima", "esporte", "cultura", "ciencia",
+    "tecnologia", "mercado", "eleicao", "energia", "agro", "cidades", "seguranca", "turismo",
+]
+
+
+@dataclass
+class Volumes:
+    usuarios: int = 1000
+    assuntos: int = 12
+    noticias: int = 20000
+    votos_por_usuario: int = 50   # média; a distribuição tem cauda longa
+    salvos_por_usuario: int = 5
+    dias: int = 90
+
+
+def _campos(modelo, *nomes):
+    return [modelo._meta.get_field(nome) for nome in nomes]
+
+
+def _atividade(rnd, media, maximo):
+    """Quantidade de interações de um usuário: Pareto(1.5), com média ~`media`."""
+    return max(1, min(maximo, round(rnd.paretovariate(1.5) * media / 3)))
+
+
+def semear(volumes=None, semente=42, prefixo="bench", lote=5000, log=None):
+    """
+    Grava a massa sintética e devolve os totais criados. Os nomes de usuário
+    e slugs usam `prefixo`, então rodar de novo com outro prefixo acumula.
+    """
+    volumes = volumes or Volumes()
+    rnd = random.Random(semente)
+    log = log or (lambda msg: None)
+    agora = timezone.now()
+    inicio = agora - timedelta(days=volumes.dias)
+
+    # usuários: senha inutilizável, o benchmark entra com force_login
+    User = get_user_model()
+    senha = make_password(None)
+    User.objects.bulk_create(
+        [User(username=f"{prefixo}_{i}", password=senha) for i in range(volumes.usuarios)], batch_size=lote,
+    )
+    usuarios = list(User.objects.filter(username__startswith=f"{prefixo}_").values_list("pk", flat=True))
+    log(f"{len(usuarios)} usuários")
+
+    nomes = [f"{prefixo} {PALAVRAS[i % len(PALAVRAS)]} {i}" for i in range(volumes.assuntos)]
+    Assunto.objects.bulk_create(
+        [Assunto(nome=nome, slug=nome.replace(" ", "-")) for nome in nomes], ignore_conflicts=True,
+    )
+    assuntos = list(Assunto.objects.filter(nome__in=nomes).values_list("pk", flat=True))
+
+    # notícias, com datas uniformes na janela e já indexadas na busca
+    datas = {}
+    Through = Noticia.assuntos.through
+    with datas_manuais(*_campos(Noticia, "criado_em", "atualizado_em")):
+        for base in range(0, volumes.noticias, lote):
+            objs = []
+            for _ in range(min(lote, volumes.noticias - base)):
+                criado = inicio + timedelta(seconds=rnd.uniform(0, volumes.dias * 86400))
+                titulo = f"{rnd.choice(PALAVRAS).capitalize()} {''.join(rnd.choices(string.ascii_lowercase, k=8))}"
+                conteudo = " ".join(rnd.choices(PALAVRAS, k=80))
+                objs.append(Noticia(
+                    titulo=titulo,
+                    conteudo=conteudo,
+                    hash_conteudo=hash_conteudo(titulo, conteudo),
+                    criado_em=criado,
+                    atualizado_em=criado,
+                ))
+            objs = Noticia.objects.bulk_create(objs)
+            Through.objects.bulk_create([
+                Through(noticia_id=n.pk, assunto_id=a)
+                for n in objs
+                for a in rnd.sample(assuntos, min(len(assuntos), rnd.randint(1, 3)))
+            ])
+            busca.indexar(objs)
+            datas.update((n.pk, n.criado_em) for n in objs)
+    noticias = list(datas)
+    log(f"{len(noticias)} notícias")
+
+    # popularidade Zipf sobre uma ordem aleatória das notícias
+    rnd.shuffle(noticias)
+    acumulado = list(accumulate(1 / (posicao ** 1.1) for posicao in range(1, len(noticias) + 1)))
+
+    def _sortear(k):
+        escolhidas = set()
+        for _ in range(k * 3):
+            escolhidas.add(noticias[bisect.bisect(acumulado, rnd.random() * acumulado[-1])])
+            if len(escolhidas) >= k:
+                break
+        return escolhidas
+
+    def _data_apos(nid):
+        criado = datas[nid]
+        return criado + (agora - criado) * rnd.random()
+
+    total_votos = total_salvos = 0
+    votos, salvos = [], []
+    with datas_manuais(*_campos(Voto, "criado_em", "atualizado_em"), *_campos(Salvo, "criado_em")):
+        for uid in usuarios:
+            for nid in _sortear(_atividade(rnd, volumes.votos_por_usuario, len(noticias))):
+                quando = _data_apos(nid)
+                votos.append(Voto(
+                    usuario_id=uid, noticia_id=nid, valor=1 if rnd.random() < 0.75 else -1,
+                    criado_em=quando, atualizado_em=quando,
+                ))
+            if volumes.salvos_por_usuario:
+                for nid in _sortear(_atividade(rnd, volumes.salvos_por_usuario, len(noticias))):
+                    salvos.append(Salvo(usuario_id=uid, noticia_id=nid, criado_em=_data_apos(nid)))
+
+            if len(votos) >= lote:
+                Voto.objects.bulk_create(votos)
+                total_votos += len(votos)
+                votos = []
+                log(f"{total_votos} votos")
+            if len(salvos) >= lote:
+                Salvo.objects.bulk_create(salvos)
+                total_salvos += len(salvos)
+                salvos = []
+        Voto.objects.bulk_create(votos)
+        Salvo.objects.bulk_create(salvos)
+    total_votos += len(votos)
+    total_salvos += len(salvos)
+
+    # contadores denormalizados e rollup diário a partir dos votos gravados
+    Noticia.recalcular_contadores()
+    Noticia.atualizar_scores_quentes()
+    VotoDiario.reconstruir()
+    log("contadores e rollup diário recalculados")
+
+    return {
+        "usuarios": len(usuarios),
+        "assuntos": len(assuntos),
+        "noticias": len(noticias),
+        "votos": total_votos,
+        "salvos": total_salvos,
+    }
+
+
+# ==============================================
+# CENÁRIOS E MEDIÇÃO
+# ==============================================
+@contextmanager
+def cache_desligado():
+    """Aponta o cache do app para um DummyCache: mede o caminho frio."""
+    caches = {**settings.CACHES, "benchmark": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+    with override_settings(CACHES=caches, NOTICIAS_CACHE="benchmark"):
+        yield
+
+
+def usuario_tipico():
+    """O usuário com votos de menor pk (ou None se não houver votos)."""
+    return get_user_model().objects.filter(voto__isnull=False).order_by("pk").first()
+
+
+def cenarios(user):
+    """Lista [(nome, executar)]; `executar()` faz uma requisição e devolve a resposta."""
+    logado, anonimo = Client(), Client()
+    logado.force_login(user)
+    ajax = {"HTTP_X_REQUESTED_WITH": "XMLHttpRequest"}
+
+    noticia = Noticia.objects.order_by("-score_quente", "-id").first()
+    assunto = Assunto.objects.order_by("pk").first()
+    termo = noticia.titulo.split()[0] if noticia and noticia.titulo.split() else "noticia"
+    cursor = paginacao.paginar_keyset(Noticia.objects.all(), ["criado_em", "id"], tamanho=20).cursor_proximo
+
+    index = reverse("noticias:index")
+    lista = []
+    slugs = ("", assunto.slug) if assunto else ("",)
+    for sort in ("recentes", "populares"):
+        for periodo in ("", "24h", "7d", "30d"):
+            for slug in slugs:
+                params = {"sort": sort, "periodo": periodo, "assunto": slug}
+                nome = " ".join(filter(None, ["index", sort, periodo, slug and "assunto"]))
+                params = {k: v for k, v in params.items() if v}
+                lista.append((nome, lambda p=params: logado.get(index, p)))
+    lista += [
+        ("index página 2", lambda: logado.get(index, {"cursor": cursor} if cursor else {})),
+        ("index anônimo", lambda: anonimo.get(index)),
+    ]
+    if noticia is not None:
+        detalhe = reverse("noticias:noticia_detalhe", args=[noticia.pk])
+        lista += [
+            ("detalhe logado", lambda: logado.get(detalhe)),
+            ("detalhe anônimo", lambda: anonimo.get(detalhe)),
+            ("votar", lambda: logado.post(reverse("noticias:votar", args=[noticia.pk]), {"valor": 1}, **ajax)),
+            ("toggle_salvo", lambda: logado.post(reverse("noticias:toggle_salvo", args=[noticia.pk]), **ajax)),
+        ]
+    lista += [
+        ("minhas_salvas", lambda: logado.get(reverse("noticias:salvos"))),
+        ("busca", lambda: logado.get(reverse("noticias:busca"), {"q": termo})),
+        ("recomendações", lambda: recomendacoes.calcular(user)),
+        ("ranking 7d", lambda: ranking.top("7d")),
+    ]
+    return lista
+
+
+def _percentil(amostras, p):
+    ordenadas = sorted(amostras)
+    posicao = max(0, min(len(ordenadas) - 1, round(p / 100 * len(ordenadas) + 0.5) - 1))
+    return ordenadas[posicao]
+
+
+def medir(lista, repeticoes=20, aquecimento=2):
+    """Executa cada cenário e devolve {nome: {p50_ms, p95_ms, media_ms, max_ms, consultas, status}}."""
+    resultados = {}
+    for nome, executar in lista:
+        for _ in range(aquecimento):
+            executar()
+        tempos, consultas, status = [], [], set()
+        for _ in range(repeticoes):
+            with CaptureQueriesContext(connection) as ctx:
+                inicio = time.perf_counter()
+                resposta = executar()
+                tempos.append((time.perf_counter() - inicio) * 1000)
+            consultas.append(len(ctx.captured_queries))
+            if hasattr(resposta, "status_code"):
+                status.add(resposta.status_code)
+        resultados[nome] = {
+            "p50_ms": round(_percentil(tempos, 50), 2),
+            "p95_ms": round(_percentil(tempos, 95), 2),
+            "media_ms": round(sum(tempos) / len(tempos), 2),
+            "max_ms": round(max(tempos), 2),
+            "consultas": max(consultas),
+            "status": sorted(status),
+        }
+    return resultados
+
+
+# ==============================================
+# VAZÃO DE VOTOS CONCORRENTES
+# ==============================================
+def _iniciar_processo(ajustes):
+    # processo filho (fork, sem conexão aberta): liga/desliga os ajustes antes da primeira conexão
+    os.environ["SQLITE_AJUSTES"] = "1" if ajustes else "0"
+    opcoes = connection.settings_dict.setdefault("OPTIONS", {})
+    if connection.vendor == "sqlite" and ajustes:
+        opcoes["transaction_mode"] = "IMMEDIATE"
+    else:
+        opcoes.pop("transaction_mode", None)
+
+
+def _votar(usuario_ids, noticia_ids, votos, semente):
+    """Roda no processo filho: `votos` cliques; devolve (latências em ms, erros, início, fim)."""
+    rnd = random.Random(semente)
+    usuarios = list(get_user_model().objects.filter(pk__in=usuario_ids))
+    tempos, erros = [], 0
+    comeco = time.time()
+    for _ in range(votos):
+        inicio = time.perf_counter()
+        try:
+            interacoes.alternar_voto(rnd.choice(usuarios), rnd.choice(noticia_ids), rnd.choice((1, -1)))
+        except OperationalError:  # "database is locked"
+            erros += 1
+            continue
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return tempos, erros, comeco, time.time()
+
+
+def preparar_vazao(processos, usuarios_por_processo=10, noticias=5, prefixo="vazao"):
+    """Usuários de cada processo e as notícias disputadas (as do topo de "populares")."""
+    User = get_user_model()
+    total = processos * usuarios_por_processo
+    senha = make_password(None)
+    User.objects.bulk_create(
+        [User(username=f"{prefixo}_{i}", password=senha) for i in range(total)], ignore_conflicts=True,
+    )
+    ids = list(
+        User.objects.filter(username__in=[f"{prefixo}_{i}" for i in range(total)])
+        .order_by("pk").values_list("pk", flat=True)
+    )
+    grupos = [ids[i::processos] for i in range(processos)]
+    alvos = list(Noticia.objects.order_by("-score_quente", "-id").values_list("pk", flat=True)[:noticias])
+    return grupos, alvos
+
+
+def vazao_votos(grupos, noticias, votos_por_processo=200, ajustes=True):
+    """
+    Um processo por grupo de usuários, todos votando nas mesmas `noticias`.
+    Devolve {votos, erros, segundos, votos_por_s, p50_ms, p95_ms}.
+    """
+    if connection.vendor == "sqlite" and not ajustes:
+        # o modo WAL fica gravado no arquivo: volta ao journal padrão para medir o "antes"
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode=DELETE")
+    connection.close()
+
+    # fork: os filhos herdam o Django já carregado (não disponível no Windows)
+    contexto = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(
+        max_workers=len(grupos), mp_context=contexto, initializer=_iniciar_processo, initargs=(ajustes,),
+    ) as pool:
+        resultados = list(pool.map(
+            _votar, grupos, [noticias] * len(grupos), [votos_por_processo] * len(grupos), range(len(grupos)),
+        ))
+
+    # janela do primeiro ao último voto (sem contar a subida dos processos)
+    segundos = max(r[3] for r in resultados) - min(r[2] for r in resultados)
+    tempos = [t for r in resultados for t in r[0]]
+    erros = sum(r[1] for r in resultados)
+    return {
+        "votos": len(tempos),
+        "erros": erros,
+        "segundos": round(segundos, 2),
+        "votos_por_s": round(len(tempos) / segundos, 1),
+        "p50_ms": round(_percentil(tempos, 50), 2) if tempos else None,
+        "p95_ms": round(_percentil(tempos, 95), 2) if tempos else None,
+    }
@@ -0,0 +1,285 @@
+"""
+Buffer de escrita (write-behind) para os votos.
+
+Em picos (uma notícia viral), cada clique em `votar` seria uma transação
+de escrita no SQLite, que serializa os escritores e devolve "database is
+locked". Com NOTICIAS_VOTOS_BUFFER ligado, `votar` chama `registrar`, que:
+
+  1. acrescenta o clique (usuário, notícia, valor) a um arquivo
+     append-only local (uma linha JSON, com flock e fsync);
+  2. responde na hora com contadores otimistas: os do banco somados a
+     deltas pendentes guardados no cache (o mesmo de noticias.cache).
+
+O banco só é escrito por `descarregar` (`manage.py descarregar_votos
+--loop`), em lotes:
+
+  1. renomeia o arquivo (quem chega depois começa um novo) e espera os
+     escritores que ainda estavam com o antigo aberto;
+  2. resolve os cliques contra o estado atual do banco: cada par
+     (usuário, notícia) tem seus cliques aplicados em ordem (sem voto ->
+     valor; mesmo valor -> remove; oposto -> inverte), restando um voto
+     final por par. O resultado vai para um arquivo `.alvo.json`;
+  3. aplica os votos finais numa transação com interacoes._aplicar_votos
+     (que leva cada voto ao estado final e ajusta contadores/rollup),
+     apaga o arquivo e só então desconta os deltas pendentes do cache.
+
+Recuperação: o que está no arquivo de cliques ainda não tocou o banco; o
+que está num `.alvo.json` é um estado final, e aplicá-lo de novo não muda
+nada no banco nem desconta os deltas duas vezes (eles só são descontados
+depois que o arquivo some); um lote de cliques que já tem `.alvo.json` é
+descartado (o alvo o substitui). Assim, se o processo morrer em qualquer
+ponto, a próxima chamada de `descarregar` termina o serviço sem perder nem
+duplicar votos; no pior caso (queda entre apagar o alvo e descontar), os
+contadores otimistas ficam acima do banco até os deltas expirarem.
+
+Enquanto um clique não é descarregado, o voto do usuário e os contadores
+lidos do banco (detalhe, feed) ficam defasados; só a resposta de `votar`
+já reflete o clique. Os deltas no cache expiram em TTL_PENDENTE.
+"""
+import json
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from . import cache as cache_noticias, interacoes, recomendacoes
+from .models import Noticia, Voto
+
+try:
+    import fcntl
+except ImportError:  # Windows: o buffer fica indisponível e os votos vão direto ao banco
+    fcntl = None
+
+ARQUIVO = "pendentes.ndjson"
+TTL_PENDENTE = 15 * 60
+LOTE_CONSULTA = 500
+
+
+def ativo():
+    return fcntl is not None and getattr(settings, "NOTICIAS_VOTOS_BUFFER", False)
+
+
+def diretorio():
+    caminho = Path(getattr(settings, "NOTICIAS_VOTOS_BUFFER_DIR", settings.BASE_DIR / "votos_pendentes"))
+    caminho.mkdir(parents=True, exist_ok=True)
+    return caminho
+
+
+def _chave_voto(usuario_id, noticia_id):
+    return f"votos_buffer:voto:{usuario_id}:{noticia_id}"
+
+
+def _chave_delta(noticia_id, campo):
+    return f"votos_buffer:{campo}:{noticia_id}"
+
+
+def _somar(cache, chave, valor):
+    if valor:
+        cache.add(chave, 0, TTL_PENDENTE)
+        try:
+            cache.incr(chave, valor)
+        except ValueError:  # expirou entre o add e o incr
+            cache.set(chave, valor, TTL_PENDENTE)
+
+
+def _gravar_sincronizado(caminho, dados):
+    """Grava `dados` em `caminho` de forma atômica (arquivo temporário + rename)."""
+    temporario = caminho.with_name(caminho.name + ".tmp")
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        json.dump(dados, arquivo)
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+    os.replace(temporario, caminho)
+
+
+# ==============================================
+# ESCRITA (requisição)
+# ==============================================
+def _anexar(linha):
+    caminho = diretorio() / ARQUIVO
+    dados = (json.dumps(linha) + "\n").encode("utf-8")
+    while True:
+        with open(caminho, "ab") as arquivo:
+            fcntl.flock(arquivo, fcntl.LOCK_EX)
+            # o descarregador pode ter renomeado o arquivo entre o open e o lock
+            try:
+                mesmo = os.fstat(arquivo.fileno()).st_ino == os.stat(caminho).st_ino
+            except FileNotFoundError:
+                mesmo = False
+            if not mesmo:
+                continue
+            arquivo.write(dados)
+            arquivo.flush()
+            if getattr(settings, "NOTICIAS_VOTOS_BUFFER_FSYNC", True):
+                os.fsync(arquivo.fileno())
+            return
+
+
+def registrar(user, noticia_id, valor):
+    """
+    Guarda o clique no buffer e devolve o estado otimista, no mesmo formato
+    de interacoes.alternar_voto: {"up", "down", "score", "voto_usuario"}.
+    """
+    cache = cache_noticias.backend()
+    # o voto pendente no cache já é o estado mais novo; o banco só é lido sem ele
+    anterior = cache.get(_chave_voto(user.pk, noticia_id))
+    if anterior is None:
+        anterior = Voto.objects.filter(usuario=user, noticia_id=noticia_id).values_list("valor", flat=True).first() or 0
+    atual = 0 if anterior == valor else valor
+    delta_up = int(atual == 1) - int(anterior == 1)
+    delta_down = int(atual == -1) - int(anterior == -1)
+
+    _anexar({"u": user.pk, "n": noticia_id, "v": valor, "du": delta_up, "dd": delta_down})
+
+    cache.set(_chave_voto(user.pk, noticia_id), atual, TTL_PENDENTE)
+    _somar(cache, _chave_delta(noticia_id, "up"), delta_up)
+    _somar(cache, _chave_delta(noticia_id, "down"), delta_down)
+
+    contadores = Noticia.objects.filter(pk=noticia_id).values("upvotes", "downvotes").get()
+    pendentes = cache.get_many([_chave_delta(noticia_id, "up"), _chave_delta(noticia_id, "down")])
+    up = contadores["upvotes"] + pendentes.get(_chave_delta(noticia_id, "up"), 0)
+    down = contadores["downvotes"] + pendentes.get(_chave_delta(noticia_id, "down"), 0)
+    return {"up": up, "down": down, "score": up - down, "voto_usuario": atual}
+
+
+# ==============================================
+# DESCARGA (worker)
+# ==============================================
+@contextmanager
+def _trava_descarga():
+    """Só um descarregador por vez; os demais saem sem fazer nada."""
+    with open(diretorio() / "descarregar.lock", "w") as trava:
+        try:
+            fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(trava, fcntl.LOCK_UN)
+
+
+def _rotacionar():
+    """Move os cliques acumulados para um lote-<ns>.ndjson e devolve o caminho (ou None)."""
+    pasta = diretorio()
+    caminho = pasta / ARQUIVO
+    if not caminho.exists() or caminho.stat().st_size == 0:
+        return None
+    destino = pasta / f"lote-{time.time_ns():020d}.ndjson"
+    os.rename(caminho, destino)
+    # espera quem já tinha o arquivo antigo aberto e travado terminar de escrever
+    with open(destino, "ab") as arquivo:
+        fcntl.flock(arquivo, fcntl.LOCK_EX)
+    return destino
+
+
+def _ler_cliques(caminho):
+    cliques = []
+    with open(caminho, encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            try:
+                cliques.append(json.loads(linha))
+            except json.JSONDecodeError:
+                # última linha incompleta (queda no meio do write): o clique não foi confirmado
+                continue
+    return cliques
+
+
+def _resolver(caminho):
+    """Cliques do lote -> votos finais por (usuário, notícia), gravados em <lote>.alvo.json."""
+    por_par = defaultdict(list)
+    deltas = defaultdict(lambda: [0, 0])
+    for clique in _ler_cliques(caminho):
+        por_par[(clique["u"], clique["n"])].append(clique["v"])
+        deltas[clique["n"]][0] += clique.get("du", 0)
+        deltas[clique["n"]][1] += clique.get("dd", 0)
+
+    usuarios = sorted({u for u, _ in por_par})
+    noticias = set(Noticia.objects.filter(pk__in=list({n for _, n in por_par})).values_list("pk", flat=True))
+    no_banco = {}
+    for i in range(0, len(usuarios), LOTE_CONSULTA):
+        trecho = usuarios[i:i + LOTE_CONSULTA]
+        for u, n, valor in Voto.objects.filter(usuario_id__in=trecho, noticia_id__in=noticias).values_list(
+            "usuario_id", "noticia_id", "valor"
+        ):
+            no_banco[(u, n)] = valor
+    existentes = set(get_user_model().objects.filter(pk__in=usuarios).values_list("pk", flat=True))
+
+    votos = []
+    for (u, n), valores in por_par.items():
+        if u not in existentes or n not in noticias:
+            continue
+        estado = no_banco.get((u, n), 0)
+        for valor in valores:
+            estado = 0 if estado == valor else valor
+        votos.append([u, n, estado])
+
+    alvo = caminho.with_suffix(".alvo.json")
+    _gravar_sincronizado(alvo, {"votos": votos, "deltas": deltas})
+    os.unlink(caminho)
+    return alvo
+
+
+def _aplicar_alvo(caminho):
+    """Aplica os votos finais de um .alvo.json (idempotente) e apaga o arquivo."""
+    with open(caminho, encoding="utf-8") as arquivo:
+        dados = json.load(arquivo)
+    por_usuario = defaultdict(dict)
+    for u, n, valor in dados["votos"]:
+        por_usuario[u][n] = valor
+
+    criados = dict(Noticia.objects.filter(pk__in={n for _, n, _ in dados["votos"]}).values_list("pk", "criado_em"))
+    with transaction.atomic():
+        for usuario_id, votos in por_usuario.items():
+            interacoes._aplicar_votos(usuario_id, votos, criados=criados)
+            recomendacoes.marcar_desatualizadas(usuario_id)
+    # o alvo some antes de os deltas serem descontados: uma queda entre os
+    # dois passos deixa deltas sobrando (até TTL_PENDENTE), mas reaplicar o
+    # alvo nunca os desconta duas vezes
+    os.unlink(caminho)
+    _depois_de_aplicar(dados)
+    return len(dados["votos"])
+
+
+def _depois_de_aplicar(dados):
+    cache = cache_noticias.backend()
+    for n, (up, down) in dados["deltas"].items():
+        _somar(cache, _chave_delta(n, "up"), -up)
+        _somar(cache, _chave_delta(n, "down"), -down)
+    for u, n, valor in dados["votos"]:
+        # só esquece o voto pendente se não houve clique novo depois da rotação
+        if cache.get(_chave_voto(u, n)) == valor:
+            cache.delete(_chave_voto(u, n))
+        cache_noticias.ao_votar(n, u)
+
+
+def descarregar():
+    """
+    Grava no banco tudo o que está no buffer, terminando antes o que uma
+    descarga interrompida deixou pela metade. Devolve quantos votos finais
+    (pares usuário/notícia) foram aplicados; 0 se outro processo já está
+    descarregando.
+    """
+    with _trava_descarga() as minha:
+        if not minha:
+            return 0
+        pasta = diretorio()
+        aplicados = 0
+        # ordem importa: um lote é resolvido contra o banco já com os anteriores aplicados
+        for alvo in sorted(pasta.glob("lote-*.alvo.json")):
+            # queda entre gravar o alvo e apagar os cliques: o alvo já os contém
+            alvo.with_name(alvo.name.replace(".alvo.json", ".ndjson")).unlink(missing_ok=True)
+            aplicados += _aplicar_alvo(alvo)
+        lotes = sorted(p for p in pasta.glob("lote-*.ndjson"))
+        novo = _rotacionar()
+        if novo is not None:
+            lotes.append(novo)
+        for lote in lotes:
+            aplicados += _aplicar_alvo(_resolver(lote))
+        return aplicados
@@ -0,0 +1,153 @@
+"""
+Busca textual em Noticia com índice invertido persistente.
+
+  - SQLite:   tabela virtual FTS5 `noticias_busca` (rowid = id da notícia),
+              ranqueada por bm25. O FTS5 não tem stemmer de português, então
+              o texto é normalizado aqui (minúsculas, sem acentos, radical
+              leve) antes de indexar e de consultar.
+  - Postgres: tabela `noticias_busca` com coluna tsvector e índice GIN,
+              config 'portuguese' (stemming do próprio Postgres) sobre o texto
+              já sem acentos; ranqueada por ts_rank_cd.
+  - Outros:   fallback em icontains (sem índice).
+
+A tabela é criada pela migração 0010. O índice é mantido pelos sinais de
+Noticia (ver noticias.signals) e pode ser reconstruído com
+`manage.py reindexar_busca`. Título pesa mais que conteúdo.
+"""
+import re
+import unicodedata
+
+from django.db import connection
+
+from .models import Noticia
+
+TABELA = "noticias_busca"
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# (sufixo, substituição) para reduzir plurais; aplicada a primeira que casar
+_PLURAIS = (
+    ("oes", "ao"), ("aes", "ao"), ("ais", "al"), ("eis", "el"), ("ois", "ol"),
+    ("ns", "m"), ("res", "r"), ("zes", "z"), ("ses", "s"), ("s", ""),
+)
+_VOGAIS_FINAIS = ("a", "e", "o")
+
+
+def sem_acentos(texto):
+    decomposto = unicodedata.normalize("NFKD", texto or "")
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def radical(palavra):
+    """Stemmer leve de português: plural e vogal temática final."""
+    if len(palavra) <= 3 or palavra.isdigit():
+        return palavra
+    for sufixo, troca in _PLURAIS:
+        if palavra.endswith(sufixo) and len(palavra) - len(sufixo) >= 3:
+            palavra = palavra[: -len(sufixo)] + troca
+            break
+    if len(palavra) > 4 and palavra.endswith(_VOGAIS_FINAIS):
+        palavra = palavra[:-1]
+    return palavra
+
+
+def termos(texto):
+    return [radical(t) for t in _TOKEN.findall(sem_acentos(texto).lower())]
+
+
+def _documento(noticia):
+    return " ".join(termos(noticia.titulo)), " ".join(termos(noticia.conteudo))
+
+
+# ==============================================
+# Manutenção do índice
+# ==============================================
+def indexar(noticias):
+    """Insere/atualiza no índice as notícias informadas (instâncias de Noticia)."""
+    vendor = connection.vendor
+    with connection.cursor() as cursor:
+        for noticia in noticias:
+            titulo, conteudo = _documento(noticia)
+            if vendor == "sqlite":
+                cursor.execute(f"DELETE FROM {TABELA} WHERE rowid = %s", [noticia.pk])
+                cursor.execute(
+                    f"INSERT INTO {TABELA} (rowid, titulo, conteudo) VALUES (%s, %s, %s)",
+                    [noticia.pk, titulo, conteudo],
+                )
+            elif vendor == "postgresql":
+                cursor.execute(
+                    f"INSERT INTO {TABELA} (noticia_id, documento) VALUES (%s, "
+                    "setweight(to_tsvector('portuguese', %s), 'A') || "
+                    "setweight(to_tsvector('portuguese', %s), 'B')) "
+                    "ON CONFLICT (noticia_id) DO UPDATE SET documento = EXCLUDED.documento",
+                    [noticia.pk, sem_acentos(noticia.titulo), sem_acentos(noticia.conteudo)],
+                )
+
+
+def remover(noticia_ids):
+    vendor = connection.vendor
+    if vendor not in ("sqlite", "postgresql") or not noticia_ids:
+        return
+    coluna = "rowid" if vendor == "sqlite" else "noticia_id"
+    marcadores = ", ".join(["%s"] * len(noticia_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABELA} WHERE {coluna} IN ({marcadores})", list(noticia_ids))
+
+
+def reindexar_tudo(chunk_size=1000):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABELA}")
+    total = 0
+    lote = []
+    for noticia in Noticia.objects.only("id", "titulo", "conteudo").iterator(chunk_size=chunk_size):
+        lote.append(noticia)
+        if len(lote) >= chunk_size:
+            indexar(lote)
+            total += len(lote)
+            lote = []
+    indexar(lote)
+    return total + len(lote)
+
+
+# ==============================================
+# Consulta
+# ==============================================
+def _expressao_fts5(q):
+    # cada termo vira um prefixo entre aspas ("polit"*), combinados com AND
+    return " ".join(f'"{t}"*' for t in termos(q))
+
+
+def buscar_ids(q, limite=20, offset=0):
+    """IDs das notícias que casam com `q`, do mais relevante ao menos."""
+    if not termos(q):
+        return []
+
+    vendor = connection.vendor
+    with connection.cursor() as cursor:
+        if vendor == "sqlite":
+            cursor.execute(
+                f"SELECT rowid FROM {TABELA} WHERE {TABELA} MATCH %s "
+                f"ORDER BY bm25({TABELA}, 5.0, 1.0) LIMIT %s OFFSET %s",
+                [_expressao_fts5(q), limite, offset],
+            )
+        elif vendor == "postgresql":
+            cursor.execute(
+                f"SELECT noticia_id FROM {TABELA}, plainto_tsquery('portuguese', %s) consulta "
+                "WHERE documento @@ consulta "
+                "ORDER BY ts_rank_cd(documento, consulta) DESC, noticia_id DESC LIMIT %s OFFSET %s",
+                [sem_acentos(q), limite, offset],
+            )
+        else:
+            return list(
+                Noticia.objects.filter(titulo__icontains=q).union(
+                    Noticia.objects.filter(conteudo__icontains=q)
+                ).order_by("-id").values_list("id", flat=True)[offset:offset + limite]
+            )
+        return [linha[0] for linha in cursor.fetchall()]
+
+
+def buscar(q, limite=20, offset=0):
+    """Notícias que casam com `q`, na ordem de relevância."""
+    ids = buscar_ids(q, limite, offset)
+    por_id = Noticia.objects.prefetch_related("assuntos").in_bulk(ids)
+    return [por_id[pk] for pk in ids if pk in por_id]
@@ -0,0 +1,281 @@
+"""
+Camada de cache do app noticias.
+
+Todas as chaves usadas pelo portal passam por aqui, com nomes estáveis:
+  - feed:          páginas do feed (itens + cursores) por filtros/cursor
+  - ranking:       top K por janela (noticias.ranking)
+  - detalhe:       a notícia com seus contadores, para a página de detalhe
+  - recomendacoes: os cards "Para você" de um usuário
+  - pagina:        respostas renderizadas para anônimos (`cache_pagina_anonima`)
+e os ganchos de invalidação (`ao_votar`, `ao_salvar`, `ao_alterar_noticia`)
+são chamados pelas views e pelo admin após cada escrita.
+
+Famílias inteiras (feed, ranking) são invalidadas por geração: a geração
+faz parte da chave, e incrementá-la torna as entradas antigas inalcançáveis
+sem precisar varrer o backend. O backend é o alias NOTICIAS_CACHE
+(padrão "default"), que deve ser compartilhado entre workers (ver settings).
+"""
+import hashlib
+import re
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.middleware.csrf import _unmask_cipher_token, get_token
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+PREFIXO = "noticias"
+
+TTL_FEED = 60
+TTL_RANKING = 60
+TTL_DETALHE = 300
+TTL_RECOMENDACOES = 600
+
+# página anônima: depois do TTL (ou de uma invalidação) a cópia ainda vale
+# como "velha" por mais PAGINA_SOBREVIDA segundos, servida enquanto um
+# único worker recalcula
+PAGINA_SOBREVIDA = 300
+PAGINA_LOCK_TTL = 30
+# votos invalidam feed "populares", ranking e páginas no máximo uma vez por
+# esta janela (segundos), por mais votos que cheguem nela
+VOTOS_COALESCER = 10
+CABECALHOS_PAGINA = ("Content-Type", "ETag", "Last-Modified", "Cache-Control", "Vary")
+
+# o token CSRF de quem gerou a página não vai para o cache: é guardado como
+# este marcador e trocado pelo token de cada visitante na saída
+MARCADOR_CSRF = b"__noticias_csrf_token__"
+_TOKEN_CSRF = re.compile(rb"(?<![A-Za-z0-9])[A-Za-z0-9]{64}(?![A-Za-z0-9])")
+
+
+def backend():
+    return caches[getattr(settings, "NOTICIAS_CACHE", "default")]
+
+
+# ==============================================
+# Gerações
+# ==============================================
+def _chave_geracao(familia):
+    return f"{PREFIXO}:geracao:{familia}"
+
+
+def geracao(familia):
+    c = backend()
+    valor = c.get(_chave_geracao(familia))
+    if valor is None:
+        c.add(_chave_geracao(familia), 1, None)
+        valor = c.get(_chave_geracao(familia), 1)
+    return valor
+
+
+def _geracoes(*familias):
+    """Várias gerações numa ida só ao backend."""
+    c = backend()
+    chaves = [_chave_geracao(f) for f in familias]
+    valores = c.get_many(chaves)
+    for chave in chaves:
+        if chave not in valores:
+            c.add(chave, 1, None)
+            valores[chave] = c.get(chave, 1)
+    return tuple(valores[chave] for chave in chaves)
+
+
+def _avancar_geracao(familia):
+    c = backend()
+    try:
+        c.incr(_chave_geracao(familia))
+    except ValueError:
+        c.set(_chave_geracao(familia), 2, None)
+
+
+# ==============================================
+# Chaves nomeadas
+# ==============================================
+def _resumo(*partes):
+    return hashlib.sha1(repr(partes).encode()).hexdigest()[:16]
+
+
+def chave_feed(sort, periodo, assuntos, cursor):
+    familia = "feed_populares" if sort == "populares" else "feed_recentes"
+    filtros = _resumo(sort, periodo or "", sorted(assuntos), cursor or "")
+    return f"{PREFIXO}:feed:{geracao(familia)}:{filtros}"
+
+
+def chave_ranking(janela, limite):
+    return f"{PREFIXO}:ranking:{geracao('ranking')}:{janela}:{limite}"
+
+
+def chave_detalhe(noticia_id):
+    return f"{PREFIXO}:detalhe:{noticia_id}"
+
+
+def chave_recomendacoes(usuario_id):
+    return f"{PREFIXO}:recomendacoes:{geracao('recomendacoes')}:{usuario_id}"
+
+
+def obter_ou_calcular(chave, calcular, ttl):
+    c = backend()
+    valor = c.get(chave)
+    if valor is None:
+        valor = calcular()
+        c.set(chave, valor, ttl)
+    return valor
+
+
+# ==============================================
+# Cache de página para anônimos
+# ==============================================
+def _familia_pagina(path):
+    return f"pagina:{_resumo(path)}"
+
+
+def chave_pagina(request):
+    # inclui a querystring inteira (assunto/periodo/sort/cursor), normalizada
+    params = sorted((k, v) for k in request.GET for v in request.GET.getlist(k))
+    return f"{PREFIXO}:pagina:{_resumo(request.path, params)}"
+
+
+def geracao_pagina(request):
+    """Geração global das páginas + a da URL (ver `invalidar_pagina`)."""
+    return _geracoes("paginas", _familia_pagina(request.path))
+
+
+def _sem_token_csrf(request, conteudo):
+    """Troca o token CSRF renderizado para `request` por MARCADOR_CSRF."""
+    segredo = request.META.get("CSRF_COOKIE")
+    if not segredo:
+        return conteudo
+    for candidato in _TOKEN_CSRF.findall(conteudo):
+        # o template renderiza um único token (mascarado) por resposta
+        if _unmask_cipher_token(candidato.decode()) == segredo:
+            return conteudo.replace(candidato, MARCADOR_CSRF)
+    return conteudo
+
+
+def _empacotar(request, resposta, ttl, versao):
+    return {
+        "versao": versao,
+        "expira": time.time() + ttl,
+        "status": resposta.status_code,
+        "conteudo": _sem_token_csrf(request, resposta.content),
+        "cabecalhos": {h: resposta[h] for h in CABECALHOS_PAGINA if resposta.has_header(h)},
+    }
+
+
+def _desempacotar(request, entrada):
+    cabecalhos = entrada["cabecalhos"]
+    ultima = parse_http_date_safe(cabecalhos["Last-Modified"]) if "Last-Modified" in cabecalhos else None
+    resposta = get_conditional_response(request, etag=cabecalhos.get("ETag"), last_modified=ultima)
+    if resposta is None:
+        conteudo = entrada["conteudo"]
+        if MARCADOR_CSRF in conteudo:
+            # get_token também faz o CsrfViewMiddleware enviar o cookie
+            conteudo = conteudo.replace(MARCADOR_CSRF, get_token(request).encode())
+        resposta = HttpResponse(conteudo, status=entrada["status"])
+    for nome, valor in cabecalhos.items():
+        resposta[nome] = valor
+    return resposta
+
+
+def cache_pagina_anonima(ttl=None):
+    """
+    Cacheia a resposta renderizada da view para usuários não autenticados,
+    por URL completa. Usuários logados sempre recebem render personalizado.
+
+    A chave não muda com as invalidações: a entrada guarda a geração com que
+    foi gerada (`geracao_pagina`) e, se ela ficou para trás, vale como cópia
+    velha, igual a uma entrada expirada.
+
+    O token CSRF embutido na página é de cada visitante: a cópia guarda um
+    marcador no lugar dele, preenchido com `get_token` a cada resposta.
+
+    Proteção contra stampede: com a cópia velha, só o worker que conseguir
+    o lock (cache.add) recalcula; os demais a servem sem esperar. Sem cópia
+    nenhuma (primeiro acesso ou sobrevida esgotada), renderizam na hora.
+    """
+    def decorador(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD") or request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+
+            duracao = ttl or getattr(settings, "NOTICIAS_CACHE_PAGINA_TTL", 30)
+            c = backend()
+            chave = chave_pagina(request)
+            versao = geracao_pagina(request)
+            entrada = c.get(chave)
+            if entrada is not None and entrada.get("versao") == versao and entrada["expira"] > time.time():
+                return _desempacotar(request, entrada)
+
+            lock = f"{chave}:lock"
+            if not c.add(lock, 1, PAGINA_LOCK_TTL):
+                if entrada is not None:
+                    return _desempacotar(request, entrada)
+                return view(request, *args, **kwargs)
+
+            try:
+                resposta = view(request, *args, **kwargs)
+                if resposta.status_code == 200 and not getattr(resposta, "streaming", False):
+                    c.set(chave, _empacotar(request, resposta, duracao, versao), duracao + PAGINA_SOBREVIDA)
+                return resposta
+            finally:
+                c.delete(lock)
+
+        return wrapper
+
+    return decorador
+
+
+# ==============================================
+# Invalidação
+# ==============================================
+def invalidar_recomendacoes(usuario_id):
+    backend().delete(chave_recomendacoes(usuario_id))
+
+
+def invalidar_pagina(path):
+    """Torna velhas as páginas anônimas cacheadas de `path` (qualquer querystring)."""
+    _avancar_geracao(_familia_pagina(path))
+
+
+def ao_votar(noticia_id, usuario_id):
+    """
+    Os contadores da notícia mudaram: invalida o detalhe (dados e página).
+
+    A ordem de "populares", o top K e as páginas do feed também dependem
+    dos votos, mas invalidá-los a cada voto (numa notícia viral) zeraria o
+    cache a todo instante: o primeiro voto de cada janela de VOTOS_COALESCER
+    segundos os invalida e os demais votos dela esperam o próximo. Um voto
+    leva no máximo TTL_FEED/TTL_RANKING segundos para aparecer neles, e bem
+    menos enquanto continuarem chegando votos.
+    """
+    c = backend()
+    c.delete(chave_detalhe(noticia_id))
+    invalidar_pagina(reverse("noticias:noticia_detalhe", args=[noticia_id]))
+    invalidar_recomendacoes(usuario_id)
+    janela = getattr(settings, "NOTICIAS_VOTOS_COALESCER", VOTOS_COALESCER)
+    if c.add(f"{PREFIXO}:votos:coalescer", 1, janela):
+        for familia in ("feed_populares", "ranking", "paginas"):
+            _avancar_geracao(familia)
+
+
+def ao_salvar(noticia_id, usuario_id):
+    """Só o estado "salvo" do próprio usuário mudou."""
+    invalidar_recomendacoes(usuario_id)
+
+
+def ao_decair_scores():
+    """score_quente recalculado em lote: só a ordem de "populares" mudou."""
+    _avancar_geracao("feed_populares")
+    _avancar_geracao("paginas")
+
+
+def ao_alterar_noticia(noticia_id=None):
+    """Notícia criada, editada ou removida (admin, resumo, importação)."""
+    if noticia_id is not None:
+        backend().delete(chave_detalhe(noticia_id))
+    for familia in ("feed_recentes", "feed_populares", "ranking", "recomendacoes", "paginas"):
+        _avancar_geracao(familia)
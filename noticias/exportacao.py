@@ -0,0 +1,162 @@
+"""
+Exportação de dados para análise (NDJSON ou CSV), em streaming.
+
+Três conjuntos:
+  - noticias: a notícia com assuntos (slugs), contadores de votos e total
+    de salvos, filtrada por `atualizado_em` (que muda a cada voto);
+  - votos:    eventos de Voto (valor atual), filtrados por `atualizado_em`;
+  - salvos:   eventos de Salvo, filtrados por `criado_em`.
+
+As linhas saem de `.iterator(chunk_size=...)` (cursor do lado do servidor no
+PostgreSQL), então a memória não cresce com o volume. Para exportações
+incrementais, guarde o `inicio` devolvido por `exportar` e passe-o como
+`desde` na próxima (linhas alteradas durante a exportação podem sair nas
+duas; o consumidor deduplica por id). Votos e salvos removidos não
+aparecem (não há registro de exclusão).
+
+Usado pela view `exportar` (staff) e por `manage.py exportar_dados`.
+"""
+import csv
+import json
+from datetime import datetime, time
+
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Noticia, Salvo, Voto
+
+FORMATOS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+CAMPOS = {
+    "noticias": ["id", "titulo", "criado_em", "atualizado_em", "score", "upvotes", "downvotes", "salvos", "assuntos"],
+    "votos": ["id", "noticia_id", "usuario_id", "valor", "criado_em", "atualizado_em"],
+    "salvos": ["id", "noticia_id", "usuario_id", "criado_em"],
+}
+
+CHUNK_SIZE = 2000
+# linhas são agrupadas em blocos deste tamanho antes de ir para a resposta
+TAMANHO_BLOCO = 64 * 1024
+
+
+class ExportacaoInvalida(ValueError):
+    pass
+
+
+def interpretar_desde(valor):
+    """Converte "2025-01-31" ou "2025-01-31T12:00[:00][+03:00]" em datetime aware."""
+    if not valor:
+        return None
+    try:
+        # formato certo com data impossível (mês 13, 30/02, 25h) levanta ValueError
+        momento = parse_datetime(valor)
+        dia = parse_date(valor) if momento is None else None
+    except ValueError:
+        raise ExportacaoInvalida(f"Data inválida: {valor!r}")
+    if momento is None:
+        if dia is None:
+            raise ExportacaoInvalida(f"Data inválida: {valor!r}")
+        momento = datetime.combine(dia, time.min)
+    if timezone.is_naive(momento):
+        momento = timezone.make_aware(momento)
+    return momento
+
+
+def _noticias(desde, chunk_size):
+    salvos = (
+        Salvo.objects.filter(noticia=OuterRef("pk")).order_by()
+        .values("noticia").annotate(n=Count("id")).values("n")
+    )
+    qs = (
+        Noticia.objects.only("id", "titulo", "criado_em", "atualizado_em", "score", "upvotes", "downvotes")
+        .annotate(total_salvos=Coalesce(Subquery(salvos, output_field=IntegerField()), 0))
+        .prefetch_related("assuntos")
+        .order_by("pk")
+    )
+    if desde:
+        qs = qs.filter(atualizado_em__gte=desde)
+    for n in qs.iterator(chunk_size=chunk_size):
+        yield {
+            "id": n.pk,
+            "titulo": n.titulo,
+            "criado_em": n.criado_em,
+            "atualizado_em": n.atualizado_em,
+            "score": n.score,
+            "upvotes": n.upvotes,
+            "downvotes": n.downvotes,
+            "salvos": n.total_salvos,
+            "assuntos": [a.slug for a in n.assuntos.all()],
+        }
+
+
+def _eventos(modelo, campo_data, desde, chunk_size, campos):
+    qs = modelo.objects.order_by("pk").values(*campos)
+    if desde:
+        qs = qs.filter(**{f"{campo_data}__gte": desde})
+    return qs.iterator(chunk_size=chunk_size)
+
+
+def linhas(tipo, desde=None, chunk_size=CHUNK_SIZE):
+    """Gerador de dicts do conjunto `tipo`."""
+    if tipo == "noticias":
+        return _noticias(desde, chunk_size)
+    if tipo == "votos":
+        return _eventos(Voto, "atualizado_em", desde, chunk_size, CAMPOS["votos"])
+    if tipo == "salvos":
+        return _eventos(Salvo, "criado_em", desde, chunk_size, CAMPOS["salvos"])
+    raise ExportacaoInvalida(f"Tipo desconhecido: {tipo!r} (use {', '.join(CAMPOS)})")
+
+
+def _valor(v):
+    if hasattr(v, "isoformat"):
+        return v.isoformat()
+    return v
+
+
+class _Eco:
+    """Arquivo falso para o csv.writer: devolve a linha em vez de gravar."""
+
+    def write(self, valor):
+        return valor
+
+
+def para_ndjson(registros):
+    for registro in registros:
+        yield json.dumps({k: _valor(v) for k, v in registro.items()}, ensure_ascii=False) + "\n"
+
+
+def para_csv(registros, campos):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(campos)
+    for registro in registros:
+        yield escritor.writerow([
+            "|".join(v) if isinstance(v, list) else _valor(v) for v in (registro[c] for c in campos)
+        ])
+
+
+def _em_blocos(pedacos, tamanho=TAMANHO_BLOCO):
+    bloco, total = [], 0
+    for pedaco in pedacos:
+        bloco.append(pedaco)
+        total += len(pedaco)
+        if total >= tamanho:
+            yield "".join(bloco)
+            bloco, total = [], 0
+    if bloco:
+        yield "".join(bloco)
+
+
+def exportar(tipo, formato="ndjson", desde=None, chunk_size=CHUNK_SIZE):
+    """
+    Devolve (inicio, pedaços): `inicio` é o instante a usar como `desde` na
+    próxima exportação incremental; `pedaços` é um gerador de str (blocos
+    de ~TAMANHO_BLOCO com linhas inteiras).
+    """
+    if formato not in FORMATOS:
+        raise ExportacaoInvalida(f"Formato desconhecido: {formato!r} (use {', '.join(FORMATOS)})")
+    inicio = timezone.now()
+    registros = linhas(tipo, desde, chunk_size)
+    if formato == "csv":
+        return inicio, _em_blocos(para_csv(registros, CAMPOS[tipo]))
+    return inicio, _em_blocos(para_ndjson(registros))
@@ -0,0 +1,113 @@
+"""
+Variantes redimensionadas das imagens das notícias.
+
+Os cards do feed mostram a imagem com 72px e a capa do detalhe com até
+350px, mas o upload original costuma ter milhares de pixels. Para cada
+imagem geramos, ao lado do arquivo original, versões WebP e JPEG nas
+larguras menores que a da original (nunca ampliamos):
+
+    noticias/foto.jpg  ->  noticias/foto.jpg.160w.webp, noticias/foto.jpg.160w.jpg, ...
+
+A extensão original fica no nome para foto.jpg e foto.png não dividirem
+as mesmas variantes.
+
+O que foi gerado fica registrado em `Noticia.imagem_variantes`
+({"origem": nome, "largura": largura da original, "larguras": [...]}),
+então o template (tag `imagem_noticia`, em templatetags/imagens.py) monta o
+srcset, com a própria original na maior largura, sem consultar o storage.
+Registros sem "largura" são do esquema de nomes antigo (foto.160w.webp):
+o template os ignora e o comando abaixo os regera. A geração acontece no post_save da notícia (ver signals) e, para
+imagens antigas, em `manage.py gerar_variantes_imagens`.
+"""
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+LARGURAS = (160, 320, 720)
+FORMATOS = {"webp": ("WEBP", 78), "jpg": ("JPEG", 80)}
+
+
+def nome_variante(nome, largura, extensao):
+    return f"{nome}.{largura}w.{extensao}"
+
+
+def _nome_variante_antigo(nome, largura, extensao):
+    raiz, _ = os.path.splitext(nome)
+    return f"{raiz}.{largura}w.{extensao}"
+
+
+def em_dia(variantes, nome):
+    """True se `variantes` (Noticia.imagem_variantes) descreve o arquivo `nome` no esquema atual."""
+    variantes = variantes or {}
+    return bool(nome) and variantes.get("origem") == nome and "largura" in variantes
+
+
+def nomes_variantes(variantes):
+    """Todos os arquivos descritos por um valor de Noticia.imagem_variantes."""
+    origem = (variantes or {}).get("origem")
+    if not origem:
+        return []
+    nomear = nome_variante if "largura" in variantes else _nome_variante_antigo
+    return [
+        nomear(origem, largura, extensao)
+        for largura in variantes.get("larguras", [])
+        for extensao in FORMATOS
+    ]
+
+
+def gerar_variantes(nome, storage=None):
+    """
+    Gera as variantes do arquivo `nome` e devolve o valor para
+    Noticia.imagem_variantes. Só gera as larguras menores que a original
+    (uma imagem estreita pode não ter nenhuma). Não toca no banco: pode
+    rodar em outro processo.
+    """
+    storage = storage or default_storage
+    with storage.open(nome, "rb") as arquivo:
+        original = ImageOps.exif_transpose(Image.open(arquivo))
+        original.load()
+
+    larguras = [l for l in LARGURAS if l < original.width]
+    for largura in larguras:
+        altura = max(1, round(original.height * largura / original.width))
+        reduzida = original.resize((largura, altura), Image.LANCZOS)
+        for extensao, (formato, qualidade) in FORMATOS.items():
+            imagem = reduzida.convert("RGBA" if formato == "WEBP" and "A" in reduzida.getbands() else "RGB")
+            buffer = io.BytesIO()
+            imagem.save(buffer, formato, quality=qualidade, optimize=True)
+            destino = nome_variante(nome, largura, extensao)
+            if storage.exists(destino):
+                storage.delete(destino)
+            storage.save(destino, ContentFile(buffer.getvalue()))
+
+    return {"origem": nome, "largura": original.width, "larguras": larguras}
+
+
+def remover_variantes(variantes, storage=None):
+    storage = storage or default_storage
+    for nome in nomes_variantes(variantes):
+        if storage.exists(nome):
+            storage.delete(nome)
+
+
+def atualizar_noticia(noticia):
+    """
+    Regera as variantes se a imagem da notícia mudou desde a última geração
+    (e apaga as da imagem anterior). Devolve True se algo mudou.
+    """
+    from .models import Noticia
+
+    atuais = noticia.imagem_variantes or {}
+    nome = noticia.imagem.name if noticia.imagem else ""
+    if em_dia(atuais, nome) or (not nome and not atuais):
+        return False
+
+    remover_variantes(atuais)
+    novas = gerar_variantes(nome) if nome else {}
+    Noticia.objects.filter(pk=noticia.pk).update(imagem_variantes=novas, atualizado_em=timezone.now())
+    noticia.imagem_variantes = novas
+    return True
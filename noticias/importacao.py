@@ -0,0 +1,264 @@
+"""
+Importação em lote de notícias (NDJSON, CSV ou RSS/Atom em disco).
+
+O arquivo é lido em streaming (linha a linha, ou com iterparse no XML) e
+gravado em lotes: cada lote é uma transação com
+  1. uma consulta pelos hashes já existentes (deduplicação por
+     Noticia.hash_conteudo, também dentro do próprio arquivo);
+  2. bulk_create dos assuntos novos (cache slug -> id em memória);
+  3. bulk_create das notícias e das linhas da tabela M2M de assuntos;
+  4. indexação na busca textual (bulk_create não dispara os signals).
+
+Campos aceitos por registro: titulo, conteudo (obrigatórios), resumo,
+legenda, criado_em (ISO ou data RSS; padrão: agora) e assuntos (lista de
+slugs/nomes, ou texto "a|b|c"). Um criado_em que não é texto (ex.: número)
+invalida o registro; um texto que não é data válida vira "agora".
+
+Usado por `manage.py importar_noticias`.
+"""
+import csv
+import json
+import os
+import xml.etree.ElementTree as ET
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.html import strip_tags
+from django.utils.text import slugify
+
+from . import busca, cache as cache_noticias
+from .models import Assunto, Noticia, datas_manuais, hash_conteudo
+
+FORMATOS = ("ndjson", "csv", "rss")
+EXTENSOES = {".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv", ".xml": "rss", ".rss": "rss", ".atom": "rss"}
+TAMANHO_LOTE = 1000
+TITULO_MAX = Noticia._meta.get_field("titulo").max_length
+
+
+class ImportacaoInvalida(ValueError):
+    pass
+
+
+@dataclass
+class Resultado:
+    lidas: int = 0
+    importadas: int = 0
+    duplicadas: int = 0
+    invalidas: int = 0
+    assuntos_criados: int = 0
+
+
+# ==============================================
+# LEITORES (streaming)
+# ==============================================
+def _ler_ndjson(arquivo):
+    for linha in arquivo:
+        if linha.strip():
+            try:
+                yield json.loads(linha)
+            except json.JSONDecodeError:
+                yield None
+
+
+def _ler_csv(arquivo):
+    for linha in csv.DictReader(arquivo):
+        linha["assuntos"] = _lista_assuntos(linha.get("assuntos"))
+        yield linha
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _ler_rss(arquivo):
+    """Itens de RSS 2.0 (<item>) ou Atom (<entry>), liberando cada elemento após o uso."""
+    for _, elem in ET.iterparse(arquivo, events=("end",)):
+        if _local(elem.tag) not in ("item", "entry"):
+            continue
+        campos = {"assuntos": []}
+        for filho in elem:
+            nome, texto = _local(filho.tag), (filho.text or "").strip()
+            if nome == "title":
+                campos["titulo"] = texto
+            elif nome in ("encoded", "content") or (nome in ("description", "summary") and "conteudo" not in campos):
+                campos["conteudo"] = strip_tags(texto)
+            elif nome == "category":
+                campos["assuntos"].append(filho.get("term") or texto)
+            elif nome in ("pubDate", "published") or (nome == "updated" and "criado_em" not in campos):
+                campos["criado_em"] = texto
+        elem.clear()
+        yield campos
+
+
+LEITORES = {"ndjson": _ler_ndjson, "csv": _ler_csv, "rss": _ler_rss}
+
+
+def detectar_formato(caminho):
+    formato = EXTENSOES.get(os.path.splitext(caminho)[1].lower())
+    if formato is None:
+        raise ImportacaoInvalida(f"Não sei o formato de {caminho!r}; use --formato ({', '.join(FORMATOS)}).")
+    return formato
+
+
+# ==============================================
+# NORMALIZAÇÃO
+# ==============================================
+def _data(valor, agora):
+    """criado_em do registro -> datetime (no máximo `agora`); ImportacaoInvalida se não for texto."""
+    if valor is None or valor == "":
+        return agora
+    if not isinstance(valor, str):
+        raise ImportacaoInvalida(f"criado_em deve ser texto, não {type(valor).__name__}")
+    try:
+        # parse_datetime levanta ValueError para datas bem formadas mas impossíveis (mês 13)
+        momento = parse_datetime(valor) or parsedate_to_datetime(valor)
+    except (TypeError, ValueError):
+        return agora
+    if timezone.is_naive(momento):
+        momento = timezone.make_aware(momento)
+    return min(momento, agora)
+
+
+def _lista_assuntos(valor):
+    """Lista de assuntos do registro; um texto vira "a|b|c" (ou um assunto só)."""
+    if not valor:
+        return []
+    if isinstance(valor, str):
+        return [a for a in valor.split("|") if a.strip()]
+    if isinstance(valor, dict):
+        return [valor]
+    if isinstance(valor, (list, tuple)):
+        return list(valor)
+    return [valor]
+
+
+def _normalizar(registro, agora):
+    """Dict do arquivo -> (Noticia não salva, [(slug, nome)]) ou None se inválido."""
+    if not isinstance(registro, dict):
+        return None
+    titulo = " ".join(str(registro.get("titulo") or "").split())[:TITULO_MAX]
+    conteudo = str(registro.get("conteudo") or "").strip()
+    if not titulo or not conteudo:
+        return None
+
+    assuntos = []
+    for item in _lista_assuntos(registro.get("assuntos")):
+        nome = (item.get("nome") or item.get("slug")) if isinstance(item, dict) else str(item)
+        nome = " ".join((nome or "").split())
+        slug = slugify(item.get("slug") if isinstance(item, dict) and item.get("slug") else nome)
+        if slug:
+            assuntos.append((slug, nome or slug))
+
+    try:
+        criado_em = _data(registro.get("criado_em"), agora)
+    except ImportacaoInvalida:
+        return None
+    noticia = Noticia(
+        titulo=titulo,
+        conteudo=conteudo,
+        resumo=registro.get("resumo") or None,
+        legenda=registro.get("legenda") or None,
+        hash_conteudo=hash_conteudo(titulo, conteudo),
+        criado_em=criado_em,
+        atualizado_em=agora,
+    )
+    return noticia, assuntos
+
+
+# ==============================================
+# GRAVAÇÃO EM LOTES
+# ==============================================
+class Importador:
+    def __init__(self, tamanho_lote=TAMANHO_LOTE):
+        self.tamanho_lote = tamanho_lote
+        self.assuntos = {}  # slug -> id
+        self.resultado = Resultado()
+
+    def _ids_assuntos(self, pares):
+        """Resolve (slug, nome) em ids, criando os assuntos que faltam."""
+        faltando = {slug: nome for slug, nome in pares if slug not in self.assuntos}
+        if faltando:
+            self.assuntos.update(Assunto.objects.filter(slug__in=faltando).values_list("slug", "id"))
+            novos = [Assunto(slug=slug, nome=nome[:80]) for slug, nome in faltando.items() if slug not in self.assuntos]
+            if novos:
+                # nomes são únicos também: um nome já usado por outro slug ganha o slug como nome
+                usados = set(Assunto.objects.filter(nome__in=[a.nome for a in novos]).values_list("nome", flat=True))
+                for a in novos:
+                    if a.nome in usados:
+                        a.nome = a.slug[:80]
+                Assunto.objects.bulk_create(novos, ignore_conflicts=True)
+                criados = dict(Assunto.objects.filter(slug__in=[a.slug for a in novos]).values_list("slug", "id"))
+                self.resultado.assuntos_criados += len(criados)
+                self.assuntos.update(criados)
+        return [self.assuntos[slug] for slug, _ in pares if slug in self.assuntos]
+
+    def _gravar(self, lote):
+        hashes = {noticia.hash_conteudo for noticia, _ in lote}
+        existentes = set(Noticia.objects.filter(hash_conteudo__in=hashes).values_list("hash_conteudo", flat=True))
+
+        novos = []
+        for noticia, assuntos in lote:
+            if noticia.hash_conteudo in existentes:
+                self.resultado.duplicadas += 1
+                continue
+            existentes.add(noticia.hash_conteudo)
+            novos.append((noticia, assuntos))
+        if not novos:
+            return
+
+        with transaction.atomic():
+            ids_assuntos = [self._ids_assuntos(assuntos) for _, assuntos in novos]
+            noticias = [noticia for noticia, _ in novos]
+            with datas_manuais(*(Noticia._meta.get_field(c) for c in ("criado_em", "atualizado_em"))):
+                # a restrição única em hash_conteudo descarta o que outra importação
+                # gravou depois da checagem acima, em vez de duplicar
+                Noticia.objects.bulk_create(noticias, ignore_conflicts=True)
+            # com ignore_conflicts o bulk_create não devolve os ids
+            ids = dict(
+                Noticia.objects.filter(hash_conteudo__in=[n.hash_conteudo for n in noticias])
+                .values_list("hash_conteudo", "pk")
+            )
+            for noticia in noticias:
+                noticia.pk = ids[noticia.hash_conteudo]
+            Through = Noticia.assuntos.through
+            Through.objects.bulk_create(
+                [
+                    Through(noticia_id=noticia.pk, assunto_id=assunto_id)
+                    for noticia, ids in zip(noticias, ids_assuntos)
+                    for assunto_id in dict.fromkeys(ids)
+                ],
+                ignore_conflicts=True,
+            )
+            busca.indexar(noticias)
+        self.resultado.importadas += len(noticias)
+
+    def importar(self, registros):
+        agora = timezone.now()
+        lote = []
+        for registro in registros:
+            self.resultado.lidas += 1
+            normalizado = _normalizar(registro, agora)
+            if normalizado is None:
+                self.resultado.invalidas += 1
+                continue
+            lote.append(normalizado)
+            if len(lote) >= self.tamanho_lote:
+                self._gravar(lote)
+                lote = []
+        if lote:
+            self._gravar(lote)
+        if self.resultado.importadas:
+            cache_noticias.ao_alterar_noticia()
+        return self.resultado
+
+
+def importar_arquivo(caminho, formato=None, tamanho_lote=TAMANHO_LOTE):
+    formato = formato or detectar_formato(caminho)
+    if formato not in LEITORES:
+        raise ImportacaoInvalida(f"Formato desconhecido: {formato!r} (use {', '.join(FORMATOS)})")
+    modo = {"rss": "rb"}.get(formato, "r")
+    with open(caminho, modo, **({} if modo == "rb" else {"encoding": "utf-8-sig", "newline": ""})) as arquivo:
+        return Importador(tamanho_lote).importar(LEITORES[formato](arquivo))
@@ -0,0 +1,217 @@
+"""
+Escrita de votos e salvos: o voto individual (`alternar_voto`, usado por
+`votar`) e a aplicação em lote da API de interações.
+
+Voto individual
+---------------
+Cada clique alterna o voto do usuário: sem voto -> valor; mesmo valor ->
+remove; valor oposto -> inverte. Para cliques duplos e requisições
+concorrentes do mesmo usuário, a transição é feita assim:
+
+  1. tenta INSERT do voto (num savepoint). Se entrou, a transição é 0 -> valor;
+  2. se bateu na unique_user_vote_per_news, trava a linha existente com
+     select_for_update e decide a partir do valor travado;
+  3. se a linha sumiu entre 1 e 2 (outro clique removeu), tenta de novo.
+
+A primeira instrução da transação é sempre uma escrita, então no SQLite
+ela pega o lock de escrita logo de cara (sem o deadlock leitura->escrita
+que gera "database is locked"); no Postgres o UPDATE dos contadores trava a
+linha da notícia até o commit. Os contadores devolvidos são lidos dentro da
+mesma transação, logo refletem exatamente esta escrita.
+
+Lote
+----
+
+Os clientes móveis guardam as interações offline e as reenviam juntas.
+Cada operação descreve o estado final desejado, não um clique, para que
+reenviar o mesmo lote seja inofensivo:
+
+    {"tipo": "voto",  "noticia": 12, "valor": 1}     # 1, -1 ou 0 (sem voto)
+    {"tipo": "salvo", "noticia": 12, "salvo": true}
+
+Dentro de um lote vale a última operação de cada (tipo, notícia). Tudo é
+gravado numa única transação com bulk_create/delete, e os contadores são
+ajustados por Noticia.aplicar_voto como no voto individual.
+"""
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import cache as cache_noticias, recomendacoes
+from .models import Noticia, Salvo, Voto
+
+MAX_OPERACOES = 500
+MAX_TENTATIVAS_VOTO = 5
+
+
+class LoteInvalido(ValueError):
+    pass
+
+
+def _validar(operacoes):
+    if not isinstance(operacoes, list):
+        raise LoteInvalido("'operacoes' deve ser uma lista.")
+    if len(operacoes) > MAX_OPERACOES:
+        raise LoteInvalido(f"Máximo de {MAX_OPERACOES} operações por lote.")
+
+    votos, salvos = {}, {}
+    for i, op in enumerate(operacoes):
+        if not isinstance(op, dict):
+            raise LoteInvalido(f"Operação {i}: formato inválido.")
+        noticia = op.get("noticia")
+        if not isinstance(noticia, int) or isinstance(noticia, bool):
+            raise LoteInvalido(f"Operação {i}: 'noticia' deve ser um id inteiro.")
+        if op.get("tipo") == "voto":
+            if op.get("valor") not in (1, -1, 0) or isinstance(op.get("valor"), bool):
+                raise LoteInvalido(f"Operação {i}: 'valor' deve ser 1, -1 ou 0.")
+            votos[noticia] = op["valor"]
+        elif op.get("tipo") == "salvo":
+            if not isinstance(op.get("salvo"), bool):
+                raise LoteInvalido(f"Operação {i}: 'salvo' deve ser booleano.")
+            salvos[noticia] = op["salvo"]
+        else:
+            raise LoteInvalido(f"Operação {i}: 'tipo' deve ser 'voto' ou 'salvo'.")
+    return votos, salvos
+
+
+def _aplicar_votos(usuario_id, votos, criados=None):
+    """
+    Leva os votos do usuário ao estado final {noticia_id: valor}; reaplicar não muda nada.
+    `criados` ({noticia_id: criado_em}) evita uma consulta quando o chamador já tem as datas.
+    """
+    if criados is None:
+        criados = dict(Noticia.objects.filter(pk__in=votos).values_list("pk", "criado_em"))
+    atuais = {
+        v.noticia_id: v
+        for v in Voto.objects.select_for_update().filter(usuario_id=usuario_id, noticia_id__in=votos)
+    }
+    gravar = [
+        Voto(noticia_id=nid, usuario_id=usuario_id, valor=valor)
+        for nid, valor in votos.items()
+        if valor and (nid not in atuais or atuais[nid].valor != valor)
+    ]
+    remover = [nid for nid, valor in votos.items() if not valor and nid in atuais]
+
+    if gravar:
+        Voto.objects.bulk_create(
+            gravar,
+            update_conflicts=True,
+            unique_fields=["noticia", "usuario"],
+            update_fields=["valor", "atualizado_em"],
+        )
+    if remover:
+        Voto.objects.filter(usuario_id=usuario_id, noticia_id__in=remover).delete()
+
+    hoje = timezone.localdate()
+    for nid, valor in votos.items():
+        voto = atuais.get(nid)
+        anterior = voto.valor if voto else 0
+        dia = timezone.localdate(voto.criado_em) if voto else hoje
+        Noticia.aplicar_voto(nid, anterior, valor, dia=dia, criado_em=criados.get(nid))
+
+
+def _transicao_voto(user, noticia_id, valor):
+    """Executa a transição do voto dentro da transação atual. Retorna (anterior, atual, dia)."""
+    try:
+        with transaction.atomic():
+            voto = Voto.objects.create(noticia_id=noticia_id, usuario=user, valor=valor)
+        return 0, valor, timezone.localdate(voto.criado_em)
+    except IntegrityError:
+        pass
+
+    voto = Voto.objects.select_for_update().filter(noticia_id=noticia_id, usuario=user).first()
+    if voto is None:
+        return None
+    anterior = voto.valor
+    if anterior == valor:
+        voto.delete()
+        atual = 0
+    else:
+        voto.valor = valor
+        voto.save(update_fields=["valor", "atualizado_em"])
+        atual = valor
+    return anterior, atual, timezone.localdate(voto.criado_em)
+
+
+def alternar_voto(user, noticia_id, valor, criado_em=None):
+    """
+    Alterna o voto de `user` na notícia e devolve o estado resultante:
+    {"up", "down", "score", "voto_usuario"}. `criado_em` é o da notícia,
+    se o chamador já o tem (ver Noticia.aplicar_voto).
+    """
+    for _ in range(MAX_TENTATIVAS_VOTO):
+        with transaction.atomic():
+            transicao = _transicao_voto(user, noticia_id, valor)
+            if transicao is None:
+                continue
+            anterior, atual, dia = transicao
+            Noticia.aplicar_voto(noticia_id, anterior, atual, dia=dia, criado_em=criado_em)
+            contadores = Noticia.objects.filter(pk=noticia_id).values("upvotes", "downvotes", "score").get()
+
+            recomendacoes.marcar_desatualizadas(user.pk)
+            transaction.on_commit(lambda: cache_noticias.ao_votar(noticia_id, user.pk))
+        return {
+            "up": contadores["upvotes"],
+            "down": contadores["downvotes"],
+            "score": contadores["score"],
+            "voto_usuario": atual,
+        }
+    raise RuntimeError(f"Não foi possível registrar o voto na notícia {noticia_id}.")
+
+
+def _aplicar_salvos(user, salvos):
+    salvar = [nid for nid, salvo in salvos.items() if salvo]
+    if salvar:
+        Salvo.objects.bulk_create(
+            [Salvo(usuario=user, noticia_id=nid) for nid in salvar],
+            ignore_conflicts=True,
+        )
+    retirar = [nid for nid, salvo in salvos.items() if not salvo]
+    if retirar:
+        Salvo.objects.filter(usuario=user, noticia_id__in=retirar).delete()
+
+
+def aplicar_lote(user, operacoes):
+    """
+    Aplica as operações e devolve {"noticias": {id: estado}, "ignoradas": [ids]},
+    onde estado traz up/down/score, o voto e o salvo do usuário.
+    Lança LoteInvalido se o payload estiver malformado.
+    """
+    votos, salvos = _validar(operacoes)
+    ids = set(votos) | set(salvos)
+    existentes = dict(Noticia.objects.filter(pk__in=ids).values_list("pk", "criado_em"))
+    ignoradas = sorted(ids - existentes.keys())
+    votos = {nid: v for nid, v in votos.items() if nid in existentes}
+    salvos = {nid: s for nid, s in salvos.items() if nid in existentes}
+
+    with transaction.atomic():
+        if votos:
+            _aplicar_votos(user.pk, votos, criados=existentes)
+        if salvos:
+            _aplicar_salvos(user, salvos)
+
+        if votos or salvos:
+            recomendacoes.marcar_desatualizadas(user.pk)
+            transaction.on_commit(lambda: _invalidar(user, votos, salvos))
+
+        estados = {
+            n["id"]: {"up": n["upvotes"], "down": n["downvotes"], "score": n["score"]}
+            for n in Noticia.objects.filter(pk__in=existentes).values("id", "upvotes", "downvotes", "score")
+        }
+        meus_votos = dict(
+            Voto.objects.filter(usuario=user, noticia_id__in=existentes).values_list("noticia_id", "valor")
+        )
+        meus_salvos = set(
+            Salvo.objects.filter(usuario=user, noticia_id__in=existentes).values_list("noticia_id", flat=True)
+        )
+
+    for nid, estado in estados.items():
+        estado["voto_usuario"] = meus_votos.get(nid, 0)
+        estado["salvo"] = nid in meus_salvos
+    return {"noticias": {str(nid): estado for nid, estado in estados.items()}, "ignoradas": ignoradas}
+
+
+def _invalidar(user, votos, salvos):
+    for nid in votos:
+        cache_noticias.ao_votar(nid, user.pk)
+    for nid in salvos:
+        cache_noticias.ao_salvar(nid, user.pk)
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from noticias import cache as cache_noticias
+from noticias.models import Noticia
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula o score_quente (ordem do feed “populares”) com a idade atual das notícias. "
+        "Rode periodicamente (cron a cada poucos minutos ou --loop)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Continua rodando a cada --intervalo.")
+        parser.add_argument("--intervalo", type=float, default=300.0, help="Segundos entre recálculos (com --loop).")
+        parser.add_argument("--lote", type=int, default=1000, help="Notícias gravadas por bulk_update.")
+
+    def handle(self, *args, **options):
+        while True:
+            total = Noticia.atualizar_scores_quentes(lote=options["lote"])
+            if total:
+                cache_noticias.ao_decair_scores()
+            self.stdout.write(f"score_quente recalculado para {total} notícia(s).")
+            if not options["loop"]:
+                break
+            time.sleep(options["intervalo"])
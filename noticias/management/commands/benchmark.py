@@ -0,0 +1,92 @@
+import json
+from datetime import datetime
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from noticias import benchmark
+from noticias.models import Noticia, Salvo, Voto
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede p50/p95 e número de consultas das telas principais pelo Client de teste "
+        "e grava o resultado em JSON (gere a massa antes com seed_benchmark)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeticoes", type=int, default=20)
+        parser.add_argument("--aquecimento", type=int, default=2, help="Execuções descartadas por cenário.")
+        parser.add_argument(
+            "--com-cache", action="store_true",
+            help="Mede com o cache do app ligado (padrão: desligado, caminho frio).",
+        )
+        parser.add_argument("--usuario", help="Username usado nos cenários logados (padrão: o primeiro com votos).")
+        parser.add_argument("--filtro", help="Só roda cenários cujo nome contém este texto.")
+        parser.add_argument(
+            "--saida", help="Arquivo JSON de saída (padrão: benchmarks/<data-hora>.json na raiz do projeto).",
+        )
+        parser.add_argument("--comparar", help="JSON de uma execução anterior para mostrar a variação.")
+
+    def handle(self, *args, **options):
+        user = self._usuario(options["usuario"])
+        cenarios = benchmark.cenarios(user)
+        if options["filtro"]:
+            cenarios = [(nome, f) for nome, f in cenarios if options["filtro"] in nome]
+
+        if options["com_cache"]:
+            resultados = benchmark.medir(cenarios, options["repeticoes"], options["aquecimento"])
+        else:
+            with benchmark.cache_desligado():
+                resultados = benchmark.medir(cenarios, options["repeticoes"], options["aquecimento"])
+
+        relatorio = {
+            "executado_em": datetime.now().isoformat(timespec="seconds"),
+            "banco": connection.vendor,
+            "django": django.get_version(),
+            "repeticoes": options["repeticoes"],
+            "com_cache": options["com_cache"],
+            "volumes": {
+                "noticias": Noticia.objects.count(),
+                "votos": Voto.objects.count(),
+                "salvos": Salvo.objects.count(),
+            },
+            "cenarios": resultados,
+        }
+
+        anteriores = {}
+        if options["comparar"]:
+            anteriores = json.loads(Path(options["comparar"]).read_text())["cenarios"]
+        self._imprimir(resultados, anteriores)
+
+        saida = Path(options["saida"] or Path(settings.BASE_DIR) / "benchmarks" / (
+            datetime.now().strftime("%Y%m%d-%H%M%S") + ".json"
+        ))
+        saida.parent.mkdir(parents=True, exist_ok=True)
+        saida.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False))
+        self.stdout.write(self.style.SUCCESS(f"Resultado gravado em {saida}"))
+
+    def _usuario(self, username):
+        if username:
+            try:
+                return get_user_model().objects.get(username=username)
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Usuário {username!r} não existe.")
+        user = benchmark.usuario_tipico()
+        if user is None or not Noticia.objects.exists():
+            raise CommandError("Banco sem massa de dados; rode `manage.py seed_benchmark` antes.")
+        return user
+
+    def _imprimir(self, resultados, anteriores):
+        self.stdout.write(f"{'cenário':<32} {'p50 ms':>9} {'p95 ms':>9} {'consultas':>9}")
+        for nome, r in resultados.items():
+            linha = f"{nome:<32} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['consultas']:>9}"
+            antes = anteriores.get(nome)
+            if antes and antes["p50_ms"]:
+                variacao = (r["p50_ms"] - antes["p50_ms"]) / antes["p50_ms"] * 100
+                linha += f"   p50 {variacao:+.0f}% (antes {antes['p50_ms']:.2f}, {antes['consultas']} consultas)"
+            self.stdout.write(linha)
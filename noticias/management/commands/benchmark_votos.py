@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from noticias import benchmark
+
+MODOS = {"original": False, "ajustado": True}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede a vazão de votos concorrentes (vários processos votando nas mesmas notícias), "
+        "sem e com os ajustes de SQLite de Brasa/banco.py. Grava votos: use num banco de benchmark."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processos", type=int, default=8)
+        parser.add_argument("--votos", type=int, default=200, help="Votos por processo.")
+        parser.add_argument("--noticias", type=int, default=5, help="Quantas notícias disputadas.")
+        parser.add_argument("--modos", nargs="+", choices=list(MODOS), default=list(MODOS))
+
+    def handle(self, *args, **options):
+        grupos, noticias = benchmark.preparar_vazao(options["processos"], noticias=options["noticias"])
+        if not noticias:
+            raise CommandError("Nenhuma notícia no banco; rode `manage.py seed_benchmark` antes.")
+
+        self.stdout.write(f"{'modo':<10} {'votos/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'erros':>6}")
+        for modo in options["modos"]:
+            r = benchmark.vazao_votos(grupos, noticias, options["votos"], ajustes=MODOS[modo])
+            self.stdout.write(
+                f"{modo:<10} {r['votos_por_s']:>9} {r['p50_ms'] or '-':>8} {r['p95_ms'] or '-':>8} {r['erros']:>6}"
+            )
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from noticias import buffer_votos
+
+
+class Command(BaseCommand):
+    help = "Grava no banco os votos acumulados no buffer de escrita (NOTICIAS_VOTOS_BUFFER)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="Continua rodando e descarregando a cada --intervalo (padrão: descarrega uma vez e sai).",
+        )
+        parser.add_argument("--intervalo", type=float, default=1.0, help="Segundos entre descargas (com --loop).")
+
+    def handle(self, *args, **options):
+        while True:
+            aplicados = buffer_votos.descarregar()
+            if aplicados:
+                self.stdout.write(f"{aplicados} voto(s) aplicado(s).")
+            if not options["loop"]:
+                break
+            time.sleep(options["intervalo"])
@@ -0,0 +1,154 @@
+"""
+Roda as consultas das telas principais com EXPLAIN e aponta varreduras
+completas (full scans) nas tabelas grandes.
+
+Os cenários são os do benchmark (noticias.benchmark.cenarios), executados
+pelo Client de teste com o cache do app desligado; todas as consultas
+emitidas passam por EXPLAIN QUERY PLAN (SQLite) ou EXPLAIN (PostgreSQL).
+
+Com --semear N, uma massa sintética de N notícias (com usuários, votos e
+salvos, ver noticias.benchmark.semear) é criada numa transação que é
+desfeita no fim, então o comando pode rodar numa cópia do banco de
+produção ou num banco vazio:
+
+    python manage.py explicar_consultas --semear 20000 --estrito
+"""
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from noticias import benchmark
+from noticias.models import Noticia, Recomendacao, Salvo, Voto, VotoDiario
+
+# tabelas que crescem com o uso; varrer as demais (ex.: assuntos) é aceitável
+TABELAS_GRANDES = {
+    Noticia._meta.db_table,
+    Noticia.assuntos.through._meta.db_table,
+    Voto._meta.db_table,
+    VotoDiario._meta.db_table,
+    Salvo._meta.db_table,
+    Recomendacao._meta.db_table,
+}
+
+def _capturar(executar):
+    """Executa `executar()` e devolve as consultas [(sql, params)] emitidas."""
+    consultas = []
+
+    def wrapper(execute, sql, params, many, context):
+        if not many:
+            consultas.append((sql, params))
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(wrapper):
+        executar()
+    return consultas
+
+
+def _explicavel(sql):
+    return sql.lstrip().split(None, 1)[0].upper() in {"SELECT", "UPDATE", "DELETE"}
+
+
+def explicar(sql, params):
+    """Plano da consulta como lista de linhas de texto."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            return [linha[-1] for linha in cursor.fetchall()]
+        if connection.vendor == "postgresql":
+            cursor.execute("EXPLAIN " + sql, params)
+            return [linha[0] for linha in cursor.fetchall()]
+    raise CommandError(f"EXPLAIN não suportado para o banco {connection.vendor!r}.")
+
+
+def varreduras(plano):
+    """Tabelas grandes lidas por inteiro segundo o plano."""
+    encontradas = []
+    for linha in plano:
+        if connection.vendor == "sqlite":
+            m = re.match(r"\s*SCAN (\S+)(.*)", linha)
+            if m and "USING" not in m.group(2) and "VIRTUAL TABLE" not in m.group(2):
+                encontradas.append(m.group(1))
+        else:
+            m = re.search(r"Seq Scan on (\w+)", linha)
+            if m:
+                encontradas.append(m.group(1))
+    return [t for t in encontradas if t in TABELAS_GRANDES]
+
+
+class Command(BaseCommand):
+    help = "Executa as consultas das views com EXPLAIN e aponta full scans nas tabelas grandes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--semear", type=int, default=0, metavar="N",
+            help="Cria N notícias sintéticas (desfeitas ao final) antes de analisar.",
+        )
+        parser.add_argument("--usuarios", type=int, default=500, help="Usuários sintéticos (com --semear).")
+        parser.add_argument(
+            "--votos-por-usuario", type=int, default=40, help="Votos por usuário sintético (com --semear).",
+        )
+        parser.add_argument(
+            "--estrito", action="store_true",
+            help="Falha (código de saída 1) se alguma varredura completa for encontrada.",
+        )
+
+    def handle(self, *args, **options):
+        self.verbosity = options["verbosity"]
+        with transaction.atomic():
+            if options["semear"]:
+                volumes = benchmark.Volumes(
+                    noticias=options["semear"],
+                    usuarios=options["usuarios"],
+                    votos_por_usuario=options["votos_por_usuario"],
+                )
+                totais = benchmark.semear(volumes, prefixo="_explicar")
+                self.stdout.write("Massa sintética: " + ", ".join(f"{v} {k}" for k, v in totais.items()) + ".")
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+
+            with benchmark.cache_desligado():
+                problemas = self._analisar_cenarios()
+            transaction.set_rollback(True)
+
+        if problemas:
+            msg = f"{problemas} consulta(s) com varredura completa."
+            if options["estrito"]:
+                raise CommandError(msg)
+            self.stdout.write(self.style.WARNING(msg))
+        else:
+            self.stdout.write(self.style.SUCCESS("Nenhuma varredura completa nas tabelas grandes."))
+
+    # ------------------------------------------------------------------
+    def _cenarios(self):
+        if not Noticia.objects.exists():
+            raise CommandError("Não há notícias; use --semear N.")
+        user = benchmark.usuario_tipico() or get_user_model().objects.create_user("_explicar_consultas")
+        return benchmark.cenarios(user)
+
+    def _analisar_cenarios(self):
+        problemas = 0
+        for nome, executar in self._cenarios():
+            consultas = [(sql, params) for sql, params in _capturar(executar) if _explicavel(sql)]
+            achados = []
+            for sql, params in consultas:
+                plano = explicar(sql, params)
+                tabelas = varreduras(plano)
+                if tabelas:
+                    achados.append((sql, plano, tabelas))
+                if self.verbosity >= 2:
+                    self.stdout.write(f"  {sql}")
+                    for linha in plano:
+                        self.stdout.write(f"      {linha}")
+
+            if achados:
+                problemas += len(achados)
+                self.stdout.write(self.style.ERROR(f"{nome}: {len(consultas)} consulta(s), {len(achados)} com full scan"))
+                for sql, plano, tabelas in achados:
+                    self.stdout.write(f"  [{', '.join(sorted(set(tabelas)))}] {sql}")
+                    for linha in plano:
+                        self.stdout.write(f"      {linha}")
+            else:
+                self.stdout.write(f"{nome}: {len(consultas)} consulta(s), ok")
+        return problemas
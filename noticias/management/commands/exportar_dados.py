@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from noticias import exportacao
+
+
+class Command(BaseCommand):
+    help = "Exporta notícias, votos ou salvos em NDJSON/CSV, em streaming (memória constante)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("tipo", choices=list(exportacao.CAMPOS))
+        parser.add_argument("--formato", choices=list(exportacao.FORMATOS), default="ndjson")
+        parser.add_argument(
+            "--desde", help="Só linhas alteradas a partir desta data/hora ISO (exportação incremental).",
+        )
+        parser.add_argument("--saida", help="Arquivo de saída (padrão: stdout).")
+        parser.add_argument("--chunk-size", type=int, default=exportacao.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            desde = exportacao.interpretar_desde(options["desde"])
+            inicio, pedacos = exportacao.exportar(
+                options["tipo"], options["formato"], desde, chunk_size=options["chunk_size"],
+            )
+        except exportacao.ExportacaoInvalida as e:
+            raise CommandError(str(e))
+
+        if options["saida"]:
+            with open(options["saida"], "w", encoding="utf-8", newline="") as arquivo:
+                for pedaco in pedacos:
+                    arquivo.write(pedaco)
+        else:
+            for pedaco in pedacos:
+                self.stdout.write(pedaco, ending="")
+        # vai para stderr para não misturar com os dados em stdout
+        self.stderr.write(f"Próxima exportação incremental: --desde {inicio.isoformat()}")
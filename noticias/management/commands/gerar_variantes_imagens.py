@@ -0,0 +1,60 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from noticias import cache as cache_noticias, imagens
+from noticias.models import Noticia
+
+
+def _gerar(pk, nome, anteriores):
+    # roda no processo filho: só lê/grava arquivos, o banco fica com o pai
+    if not imagens.em_dia(anteriores, nome):
+        imagens.remover_variantes(anteriores)
+    return pk, imagens.gerar_variantes(nome)
+
+
+class Command(BaseCommand):
+    help = "Gera as variantes redimensionadas (WebP/JPEG) das imagens das notícias que ainda não as têm."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processos", type=int, default=None, help="Processos em paralelo (padrão: nº de CPUs).")
+        parser.add_argument("--forcar", action="store_true", help="Regera mesmo as que já estão atualizadas.")
+        parser.add_argument("--lote", type=int, default=200, help="Notícias gravadas por bulk_update.")
+
+    def handle(self, *args, **options):
+        pendentes = [
+            (n.pk, n.imagem.name, n.imagem_variantes or {})
+            for n in Noticia.objects.exclude(imagem="").exclude(imagem__isnull=True).only("pk", "imagem", "imagem_variantes")
+            if options["forcar"] or not imagens.em_dia(n.imagem_variantes, n.imagem.name)
+        ]
+        if not pendentes:
+            self.stdout.write("Nenhuma imagem pendente.")
+            return
+
+        # os filhos não usam o banco (só arquivos); django.setup serve às
+        # plataformas sem fork, em que o processo filho começa do zero
+        prontas, falhas = [], 0
+        with ProcessPoolExecutor(max_workers=options["processos"], initializer=django.setup) as pool:
+            futuros = {pool.submit(_gerar, *pendente): pendente[0] for pendente in pendentes}
+            for futuro in as_completed(futuros):
+                try:
+                    prontas.append(futuro.result())
+                except Exception as e:
+                    falhas += 1
+                    self.stderr.write(f"Notícia {futuros[futuro]}: {e}")
+                if len(prontas) >= options["lote"]:
+                    self._gravar(prontas)
+                    prontas = []
+        self._gravar(prontas)
+        cache_noticias.ao_alterar_noticia()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Variantes geradas para {len(pendentes) - falhas} notícia(s); {falhas} falha(s)."
+        ))
+
+    def _gravar(self, prontas):
+        agora = timezone.now()
+        objs = [Noticia(pk=pk, imagem_variantes=variantes, atualizado_em=agora) for pk, variantes in prontas]
+        Noticia.objects.bulk_update(objs, ["imagem_variantes", "atualizado_em"])
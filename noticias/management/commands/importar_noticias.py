@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from noticias import importacao
+
+
+class Command(BaseCommand):
+    help = "Importa notícias de um arquivo NDJSON, CSV ou RSS/Atom, em lotes e sem duplicar conteúdo."
+
+    def add_arguments(self, parser):
+        parser.add_argument("arquivo")
+        parser.add_argument(
+            "--formato", choices=importacao.FORMATOS, help="Padrão: deduzido pela extensão do arquivo.",
+        )
+        parser.add_argument("--lote", type=int, default=importacao.TAMANHO_LOTE)
+
+    def handle(self, *args, **options):
+        try:
+            resultado = importacao.importar_arquivo(options["arquivo"], options["formato"], options["lote"])
+        except importacao.ImportacaoInvalida as e:
+            raise CommandError(str(e))
+        except OSError as e:
+            raise CommandError(f"Não foi possível ler {options['arquivo']}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado.importadas} importadas, {resultado.duplicadas} duplicadas, "
+            f"{resultado.invalidas} inválidas (de {resultado.lidas} lidas); "
+            f"{resultado.assuntos_criados} assuntos novos."
+        ))
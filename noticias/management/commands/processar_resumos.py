@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from noticias import resumo
+
+
+class Command(BaseCommand):
+    help = "Worker da fila de resumos: processa as TarefaResumo pendentes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="Continua rodando e consultando a fila (padrão: esvazia a fila e sai).",
+        )
+        parser.add_argument(
+            "--intervalo", type=float, default=2.0,
+            help="Segundos de espera entre consultas quando a fila está vazia (com --loop).",
+        )
+        parser.add_argument("--maximo", type=int, default=None, help="Processa no máximo N tarefas por rodada.")
+
+    def handle(self, *args, **options):
+        resumidor = resumo.obter_resumidor()
+        while True:
+            if options["loop"]:
+                # sem batimento, as views processam os resumos na requisição
+                resumo.registrar_worker(max(resumo.WORKER_TTL, options["intervalo"] * 3))
+            feitas = resumo.processar_pendentes(options["maximo"], resumidor)
+            if feitas:
+                self.stdout.write(f"{feitas} resumo(s) processado(s).")
+            if not options["loop"]:
+                break
+            if not feitas:
+                time.sleep(options["intervalo"])
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from noticias.models import Noticia, VotoDiario
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstrói os contadores de votos (score/upvotes/downvotes/score_quente) e o rollup "
+        "diário VotoDiario a partir da tabela Voto."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "ids", nargs="*", type=int,
+            help="IDs das notícias a recalcular (padrão: todas).",
+        )
+
+    def handle(self, *args, **options):
+        qs = Noticia.objects.all()
+        if options["ids"]:
+            qs = qs.filter(pk__in=options["ids"])
+
+        total = Noticia.recalcular_contadores(qs)
+        Noticia.atualizar_scores_quentes(qs)
+        VotoDiario.reconstruir(options["ids"] or None)
+        self.stdout.write(self.style.SUCCESS(f"Contadores recalculados para {total} notícia(s)."))
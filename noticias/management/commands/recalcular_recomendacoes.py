@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from noticias import recomendacoes
+
+
+class Command(BaseCommand):
+    help = "Recalcula as recomendações \"Para você\" armazenadas em Recomendacao."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--usuarios", nargs="*", type=int, default=None,
+            help="IDs dos usuários a recalcular (padrão: todos os ativos).",
+        )
+        parser.add_argument(
+            "--limite", type=int, default=None,
+            help="Quantidade de recomendações guardadas por usuário.",
+        )
+
+    def handle(self, *args, **options):
+        usuarios = get_user_model().objects.filter(is_active=True).only("pk")
+        if options["usuarios"]:
+            usuarios = usuarios.filter(pk__in=options["usuarios"])
+
+        total = linhas = 0
+        for user in usuarios.iterator(chunk_size=500):
+            linhas += recomendacoes.atualizar_para_usuario(user, options["limite"])
+            total += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{linhas} recomendação(ões) calculada(s) para {total} usuário(s)."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from noticias import busca
+
+
+class Command(BaseCommand):
+    help = "Reconstrói o índice de busca textual (FTS5/tsvector) de todas as notícias."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        total = busca.reindexar_tudo(chunk_size=options["chunk_size"])
+        self.stdout.write(self.style.SUCCESS(f"{total} notícia(s) indexada(s)."))
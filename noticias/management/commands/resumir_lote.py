@@ -0,0 +1,116 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from noticias import cache as cache_noticias, resumo
+from noticias.models import Noticia
+
+
+class LimitadorTaxa:
+    """Garante no máximo `por_segundo` chamadas por segundo entre todas as threads."""
+
+    def __init__(self, por_segundo):
+        self.intervalo = 1.0 / por_segundo if por_segundo else 0.0
+        self._proxima = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        if not self.intervalo:
+            return
+        with self._lock:
+            agora = time.monotonic()
+            espera = self._proxima - agora
+            self._proxima = max(agora, self._proxima) + self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera resumos em lote para notícias sem resumo ou com resumo desatualizado, "
+        "com concorrência limitada, limite de taxa e novas tentativas."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concorrencia", type=int, default=4, help="Threads chamando o resumidor.")
+        parser.add_argument("--por-segundo", type=float, default=2.0, help="Chamadas por segundo (0 = sem limite).")
+        parser.add_argument("--tentativas", type=int, default=3, help="Tentativas por notícia.")
+        parser.add_argument("--espera-base", type=float, default=1.0, help="Espera inicial entre tentativas (dobra a cada falha).")
+        parser.add_argument("--lote", type=int, default=100, help="Tamanho dos lotes de leitura e de bulk_update.")
+        parser.add_argument("--limite", type=int, default=None, help="Resume no máximo N notícias.")
+        parser.add_argument(
+            "--resumidor", default=None,
+            help="Caminho da classe resumidora (padrão: settings.NOTICIAS_RESUMIDOR).",
+        )
+
+    def handle(self, *args, **options):
+        resumidor = import_string(options["resumidor"])() if options["resumidor"] else resumo.obter_resumidor()
+        limitador = LimitadorTaxa(options["por_segundo"])
+        tentativas = max(options["tentativas"], 1)
+        espera_base = options["espera_base"]
+        tamanho_lote = options["lote"]
+
+        def resumir(noticia):
+            for tentativa in range(tentativas):
+                limitador.aguardar()
+                try:
+                    texto = (resumidor.resumir(noticia) or "").strip()
+                    if not texto:
+                        raise resumo.ResumoIndisponivel("Resumidor devolveu um texto vazio")
+                    return texto
+                except Exception as e:
+                    if tentativa == tentativas - 1:
+                        self.stderr.write(f"Notícia {noticia.pk}: desistindo após {tentativas} tentativa(s) ({e}).")
+                        return None
+                    time.sleep(espera_base * 2 ** tentativa)
+
+        prontas, falhas, total = [], 0, 0
+
+        def gravar():
+            Noticia.objects.bulk_update(prontas, ["resumo", "resumo_hash", "atualizado_em"], batch_size=tamanho_lote)
+            for noticia in prontas:
+                cache_noticias.ao_alterar_noticia(noticia.pk)
+            prontas.clear()
+
+        def colher(futuros):
+            nonlocal falhas, total
+            for futuro in futuros:
+                noticia, assinatura = emandamento.pop(futuro)
+                texto = futuro.result()
+                if texto is None:
+                    falhas += 1
+                    continue
+                noticia.resumo, noticia.resumo_hash = texto, assinatura
+                noticia.atualizado_em = timezone.now()
+                prontas.append(noticia)
+                total += 1
+            if len(prontas) >= tamanho_lote:
+                gravar()
+
+        candidatas = resumo.desatualizadas(
+            Noticia.objects.only("id", "titulo", "conteudo", "resumo", "resumo_hash", "atualizado_em")
+        ).order_by("pk")
+
+        emandamento = {}
+        enviadas = 0
+        with ThreadPoolExecutor(max_workers=options["concorrencia"]) as pool:
+            for noticia in candidatas.iterator(chunk_size=tamanho_lote):
+                if options["limite"] is not None and enviadas >= options["limite"]:
+                    break
+                # mantém a fila do pool limitada: no máximo 2x a concorrência em voo
+                while len(emandamento) >= 2 * options["concorrencia"]:
+                    feitos, _ = wait(emandamento, return_when=FIRST_COMPLETED)
+                    colher(feitos)
+                emandamento[pool.submit(resumir, noticia)] = (noticia, resumo.hash_resumo(noticia))
+                enviadas += 1
+
+            while emandamento:
+                feitos, _ = wait(emandamento, return_when=FIRST_COMPLETED)
+                colher(feitos)
+        gravar()
+
+        self.stdout.write(self.style.SUCCESS(f"{total} resumo(s) gerado(s), {falhas} falha(s)."))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from noticias import benchmark
+
+
+class Command(BaseCommand):
+    help = "Gera massa sintética (usuários, assuntos, notícias, votos, salvos) para o benchmark."
+
+    def add_arguments(self, parser):
+        padrao = benchmark.Volumes()
+        parser.add_argument("--usuarios", type=int, default=padrao.usuarios)
+        parser.add_argument("--assuntos", type=int, default=padrao.assuntos)
+        parser.add_argument("--noticias", type=int, default=padrao.noticias)
+        parser.add_argument(
+            "--votos-por-usuario", type=int, default=padrao.votos_por_usuario,
+            help="Média de votos por usuário (usuários × média ≈ total de votos).",
+        )
+        parser.add_argument("--salvos-por-usuario", type=int, default=padrao.salvos_por_usuario)
+        parser.add_argument("--dias", type=int, default=padrao.dias, help="Janela de datas das notícias e votos.")
+        parser.add_argument("--semente", type=int, default=42, help="Semente do gerador (massa reprodutível).")
+        parser.add_argument(
+            "--prefixo", default="bench",
+            help="Prefixo dos usuários e assuntos gerados; use outro para acumular mais massa.",
+        )
+        parser.add_argument("--lote", type=int, default=5000, help="Tamanho dos lotes de bulk_create.")
+
+    def handle(self, *args, **options):
+        volumes = benchmark.Volumes(
+            usuarios=options["usuarios"],
+            assuntos=options["assuntos"],
+            noticias=options["noticias"],
+            votos_por_usuario=options["votos_por_usuario"],
+            salvos_por_usuario=options["salvos_por_usuario"],
+            dias=options["dias"],
+        )
+        log = self.stdout.write if options["verbosity"] >= 2 else None
+        with transaction.atomic():
+            totais = benchmark.semear(
+                volumes, semente=options["semente"], prefixo=options["prefixo"], lote=options["lote"], log=log,
+            )
+        self.stdout.write(self.style.SUCCESS(
+            "Criados: " + ", ".join(f"{total} {nome}" for nome, total in totais.items()) + "."
+        ))
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:13
+
+from django.db import migrations, models
+from django.db.models import Case, OuterRef, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+
+
+def preencher_contadores(apps, schema_editor):
+    Noticia = apps.get_model('noticias', 'Noticia')
+    Voto = apps.get_model('noticias', 'Voto')
+    votos = Voto.objects.filter(noticia=OuterRef('pk')).values('noticia')
+
+    def soma(expr):
+        sub = votos.annotate(total=Sum(expr)).values('total')
+        return Coalesce(Subquery(sub, output_field=models.IntegerField()), 0)
+
+    Noticia.objects.update(
+        score=soma('valor'),
+        upvotes=soma(Case(When(valor=1, then=1), default=0)),
+        downvotes=soma(Case(When(valor=-1, then=1), default=0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('noticias', '0006_noticia_resumo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='noticia',
+            name='downvotes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='noticia',
+            name='score',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='noticia',
+            name='upvotes',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:16
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('noticias', '0007_noticia_contadores_votos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recomendacao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posicao', models.PositiveSmallIntegerField()),
+                ('afinidade', models.PositiveIntegerField(default=0)),
+                ('calculado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('noticia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recomendacoes', to='noticias.noticia')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recomendacoes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['usuario', 'posicao'],
+                'indexes': [models.Index(fields=['usuario', 'posicao'], name='recomendacao_usuario_pos_idx')],
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'noticia'), name='unique_recomendacao_por_usuario')],
+            },
+        ),
+    ]
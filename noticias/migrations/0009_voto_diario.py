@@ -0,0 +1,43 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+
+def preencher_rollup(apps, schema_editor):
+    Voto = apps.get_model('noticias', 'Voto')
+    VotoDiario = apps.get_model('noticias', 'VotoDiario')
+    linhas = (
+        Voto.objects.annotate(dia=TruncDate('criado_em'))
+        .values('noticia_id', 'dia')
+        .annotate(ups=Count('id', filter=Q(valor=1)), downs=Count('id', filter=Q(valor=-1)))
+        .order_by()
+    )
+    VotoDiario.objects.bulk_create((VotoDiario(**linha) for linha in linhas.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('noticias', '0008_recomendacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VotoDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField()),
+                ('ups', models.PositiveIntegerField(default=0)),
+                ('downs', models.PositiveIntegerField(default=0)),
+                ('noticia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='votos_diarios', to='noticias.noticia')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dia'], name='voto_diario_dia_idx')],
+                'constraints': [models.UniqueConstraint(fields=('noticia', 'dia'), name='unique_voto_diario_por_noticia')],
+            },
+        ),
+        migrations.RunPython(preencher_rollup, migrations.RunPython.noop),
+    ]
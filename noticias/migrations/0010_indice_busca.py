@@ -0,0 +1,92 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+# Cópia congelada do DDL e da normalização de noticias.busca na época desta
+# migração: mudanças futuras no módulo não podem alterar o que ela faz.
+TABELA = 'noticias_busca'
+
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+_PLURAIS = (
+    ('oes', 'ao'), ('aes', 'ao'), ('ais', 'al'), ('eis', 'el'), ('ois', 'ol'),
+    ('ns', 'm'), ('res', 'r'), ('zes', 'z'), ('ses', 's'), ('s', ''),
+)
+_VOGAIS_FINAIS = ('a', 'e', 'o')
+
+
+def _sem_acentos(texto):
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def _radical(palavra):
+    if len(palavra) <= 3 or palavra.isdigit():
+        return palavra
+    for sufixo, troca in _PLURAIS:
+        if palavra.endswith(sufixo) and len(palavra) - len(sufixo) >= 3:
+            palavra = palavra[: -len(sufixo)] + troca
+            break
+    if len(palavra) > 4 and palavra.endswith(_VOGAIS_FINAIS):
+        palavra = palavra[:-1]
+    return palavra
+
+
+def _termos(texto):
+    return ' '.join(_radical(t) for t in _TOKEN.findall(_sem_acentos(texto).lower()))
+
+
+def criar_indice(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA} USING fts5("
+            "titulo, conteudo, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {TABELA} ("
+            "noticia_id bigint PRIMARY KEY REFERENCES noticias_noticia (id) "
+            "ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "documento tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {TABELA}_documento_gin ON {TABELA} USING GIN (documento)"
+        )
+    else:
+        return
+
+    Noticia = apps.get_model('noticias', 'Noticia')
+    noticias = Noticia.objects.using(schema_editor.connection.alias).only('id', 'titulo', 'conteudo')
+    with schema_editor.connection.cursor() as cursor:
+        for noticia in noticias.iterator(chunk_size=1000):
+            if vendor == 'sqlite':
+                cursor.execute(f"DELETE FROM {TABELA} WHERE rowid = %s", [noticia.pk])
+                cursor.execute(
+                    f"INSERT INTO {TABELA} (rowid, titulo, conteudo) VALUES (%s, %s, %s)",
+                    [noticia.pk, _termos(noticia.titulo), _termos(noticia.conteudo)],
+                )
+            else:
+                cursor.execute(
+                    f"INSERT INTO {TABELA} (noticia_id, documento) VALUES (%s, "
+                    "setweight(to_tsvector('portuguese', %s), 'A') || "
+                    "setweight(to_tsvector('portuguese', %s), 'B')) "
+                    "ON CONFLICT (noticia_id) DO NOTHING",
+                    [noticia.pk, _sem_acentos(noticia.titulo), _sem_acentos(noticia.conteudo)],
+                )
+
+
+def remover_indice(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABELA}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('noticias', '0009_voto_diario'),
+    ]
+
+    operations = [
+        migrations.RunPython(criar_indice, remover_indice),
+    ]
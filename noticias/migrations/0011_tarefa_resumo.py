@@ -0,0 +1,30 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('noticias', '0010_indice_busca'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TarefaResumo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pendente', 'Pendente'), ('processando', 'Processando'), ('concluida', 'Concluída'), ('falhou', 'Falhou')], default='pendente', max_length=12)),
+                ('resumo', models.TextField(blank=True)),
+                ('erro', models.TextField(blank=True)),
+                ('tentativas', models.PositiveSmallIntegerField(default=0)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('noticia', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tarefas_resumo', to='noticias.noticia')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'criado_em'], name='tarefa_resumo_fila_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('noticias', '0011_tarefa_resumo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='noticia',
+            name='resumo_hash',
+            field=models.CharField(blank=True, default='', max_length=80),
+        ),
+        migrations.AddField(
+            model_name='tarefaresumo',
+            name='forcar',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('noticias', '0012_resumo_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='noticia',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
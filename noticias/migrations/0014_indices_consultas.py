@@ -0,0 +1,27 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('noticias', '0013_noticia_atualizado_em'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='noticia',
+            index=models.Index(fields=['-criado_em', '-id'], name='noticia_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salvo',
+            index=models.Index(fields=['usuario', '-criado_em'], name='salvo_usuario_criado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voto',
+            index=models.Index(fields=['usuario', 'valor', 'noticia'], name='voto_usuario_valor_idx'),
+        ),
+    ]
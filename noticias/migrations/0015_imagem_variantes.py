@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('noticias', '0014_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='noticia',
+            name='imagem_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.1 on 2026-10-18 13:52
+
+import hashlib
+
+from django.db import migrations, models
+
+
+# Cópia congelada de noticias.models.hash_conteudo na época desta migração:
+# mudanças futuras na normalização não podem alterar o que ela grava.
+def hash_conteudo(titulo, conteudo):
+    normalizado = "\n".join(" ".join((texto or "").split()).casefold() for texto in (titulo, conteudo))
+    return hashlib.sha256(normalizado.encode()).hexdigest()
+
+
+def preencher_hash(apps, schema_editor):
+    Noticia = apps.get_model('noticias', 'Noticia')
+    lote = []
+    for noticia in Noticia.objects.only('id', 'titulo', 'conteudo').iterator(chunk_size=1000):
+        noticia.hash_conteudo = hash_conteudo(noticia.titulo, noticia.conteudo)
+        lote.append(noticia)
+        if len(lote) >= 1000:
+            Noticia.objects.bulk_update(lote, ['hash_conteudo'])
+            lote = []
+    Noticia.objects.bulk_update(lote, ['hash_conteudo'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('noticias', '0015_imagem_variantes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='noticia',
+            name='hash_conteudo',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=64),
+        ),
+        migrations.RunPython(preencher_hash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.1 on 2026-10-18 14:08
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def preencher_score_quente(apps, schema_editor):
+    # fórmula de noticias.models.score_quente na época desta migração (gravidade 1.8)
+    Noticia = apps.get_model('noticias', 'Noticia')
+    agora = timezone.now()
+    lote = []
+    for noticia in Noticia.objects.exclude(score=0).only('id', 'score', 'criado_em').iterator(chunk_size=1000):
+        horas = max(0.0, (agora - noticia.criado_em).total_seconds() / 3600)
+        noticia.score_quente = noticia.score / (horas + 2) ** 1.8
+        lote.append(noticia)
+        if len(lote) >= 1000:
+            Noticia.objects.bulk_update(lote, ['score_quente'])
+            lote = []
+    Noticia.objects.bulk_update(lote, ['score_quente'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('noticias', '0016_hash_conteudo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='noticia',
+            name='score_quente',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='noticia',
+            index=models.Index(fields=['-score_quente', '-id'], name='noticia_quente_idx'),
+        ),
+        migrations.RunPython(preencher_score_quente, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.1 on 2026-10-18 14:47
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def liberar_duplicadas(apps, schema_editor):
+    # Notícias repetidas de antes da restrição continuam no banco (têm votos,
+    # salvos...): a mais antiga de cada grupo fica com o hash e as demais
+    # ficam com hash vazio, que a restrição não cobre.
+    Noticia = apps.get_model('noticias', 'Noticia')
+    repetidas = (
+        Noticia.objects.exclude(hash_conteudo='').values('hash_conteudo')
+        .annotate(n=Count('id'), primeira=Min('id')).filter(n__gt=1)
+    )
+    for grupo in repetidas.iterator():
+        Noticia.objects.filter(hash_conteudo=grupo['hash_conteudo']).exclude(
+            pk=grupo['primeira']
+        ).update(hash_conteudo='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('noticias', '0017_score_quente'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(liberar_duplicadas, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='noticia',
+            constraint=models.UniqueConstraint(condition=models.Q(('hash_conteudo', ''), _negated=True), fields=('hash_conteudo',), name='noticia_hash_conteudo_unico'),
+        ),
+    ]
@@ -1,8 +1,46 @@
-from django.db import models
+import hashlib
+from contextlib import contextmanager
+
+from django.core.exceptions import ValidationError
+from django.db import models, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, Sum, When
+from django.db.models.functions import Coalesce, TruncDate
 from django.contrib.auth.models import User
 from django.conf import settings
 from django.utils import timezone
 
+def hash_conteudo(titulo, conteudo):
+    """Hash de título + conteúdo normalizados (caixa e espaços), usado para deduplicar."""
+    normalizado = "\n".join(" ".join((texto or "").split()).casefold() for texto in (titulo, conteudo))
+    return hashlib.sha256(normalizado.encode()).hexdigest()
+
+
+# expoente do decaimento do score "quente": quanto maior, mais rápido notícias antigas descem
+GRAVIDADE_QUENTE = 1.8
+
+
+def score_quente(score, criado_em, agora=None):
+    """Score ao estilo Hacker News: score / (idade em horas + 2) ** GRAVIDADE_QUENTE."""
+    horas = max(0.0, ((agora or timezone.now()) - criado_em).total_seconds() / 3600)
+    return score / (horas + 2) ** GRAVIDADE_QUENTE
+
+
+@contextmanager
+def datas_manuais(*campos):
+    """
+    Desliga auto_now/auto_now_add de `campos` para gravar datas explícitas
+    (bulk_create de importações e massas sintéticas). Uso em comandos, não em views.
+    """
+    originais = [(campo, campo.auto_now, campo.auto_now_add) for campo in campos]
+    for campo in campos:
+        campo.auto_now = campo.auto_now_add = False
+    try:
+        yield
+    finally:
+        for campo, auto_now, auto_now_add in originais:
+            campo.auto_now, campo.auto_now_add = auto_now, auto_now_add
+
+
 class Assunto(models.Model):
     nome = models.CharField(max_length=80, unique=True)
     slug = models.SlugField(max_length=80, unique=True)
@@ -18,9 +56,28 @@ class Noticia(models.Model):
     titulo = models.CharField(max_length=200)
     conteudo = models.TextField()
     resumo = models.TextField(blank=True, null=True)
+    # hash de título + conteúdo + versão do prompt do resumo atual
+    # (ver noticias.resumo.hash_resumo): se bate, o resumo não está velho
+    resumo_hash = models.CharField(max_length=80, blank=True, default="")
+    # hash de título + conteúdo (ver hash_conteudo): deduplicação na importação;
+    # único quando preenchido (restrição noticia_hash_conteudo_unico)
+    hash_conteudo = models.CharField(max_length=64, blank=True, default="", editable=False, db_index=True)
     criado_em = models.DateTimeField(auto_now_add=True)
+    # mudanças de conteúdo, resumo ou contadores (Last-Modified do detalhe)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    # Contadores denormalizados de votos (mantidos por aplicar_voto; ver
+    # `manage.py recalcular_contadores` para corrigir divergências).
+    score = models.IntegerField(default=0)
+    upvotes = models.PositiveIntegerField(default=0)
+    downvotes = models.PositiveIntegerField(default=0)
+    # ordem do feed "populares": score com decaimento pela idade (ver score_quente);
+    # ajustado a cada voto e recalculado por `manage.py atualizar_score_quente`
+    score_quente = models.FloatField(default=0, editable=False)
 
     imagem = models.ImageField(upload_to="noticias/", null=True, blank=True)
+    # variantes redimensionadas já geradas (ver noticias.imagens)
+    imagem_variantes = models.JSONField(default=dict, blank=True, editable=False)
     legenda = models.CharField(max_length=255, null=True, blank=True)
 
     assuntos = models.ManyToManyField(Assunto, related_name="noticias", blank=True)
@@ -32,6 +89,19 @@ class Noticia(models.Model):
         blank=True,
     )
 
+    class Meta:
+        indexes = [
+            # feed "recentes" e "populares" (keyset em noticias.paginacao); não há
+            # índice por score: ele muda a cada voto e nenhuma consulta ordena só por ele
+            models.Index(fields=["-criado_em", "-id"], name="noticia_criado_idx"),
+            models.Index(fields=["-score_quente", "-id"], name="noticia_quente_idx"),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["hash_conteudo"], condition=~Q(hash_conteudo=""), name="noticia_hash_conteudo_unico",
+            ),
+        ]
+
     @property
     def votos(self):
         """
@@ -48,14 +118,85 @@ class Noticia(models.Model):
     def salvos_count(self):
         return self.salvos.count()
 
-    def score(self):
-        return sum(v.valor for v in self.votos.all())
+    @classmethod
+    def aplicar_voto(cls, pk, anterior, atual, dia=None, criado_em=None):
+        """
+        Ajusta os contadores da notícia `pk` quando o voto de um usuário passa
+        de `anterior` para `atual` (valores em -1, 0, 1; 0 = sem voto).
+        `dia` é a data de criação do Voto, usada no rollup VotoDiario.
+        `criado_em` é o da notícia (para o score_quente); quem já o tem deve
+        passá-lo, senão custa uma consulta a mais.
+        Usa F-expressions: deve ser chamado na mesma transação da escrita do Voto.
+        """
+        if anterior == atual:
+            return
+        VotoDiario.registrar(pk, dia or timezone.localdate(), anterior, atual)
+        if criado_em is None:
+            criado_em = cls.objects.filter(pk=pk).values_list("criado_em", flat=True).first()
+        agora = timezone.now()
+        cls.objects.filter(pk=pk).update(
+            score=F("score") + (atual - anterior),
+            score_quente=(F("score") + (atual - anterior)) * score_quente(1, criado_em or agora, agora),
+            upvotes=F("upvotes") + int(atual == 1) - int(anterior == 1),
+            downvotes=F("downvotes") + int(atual == -1) - int(anterior == -1),
+            atualizado_em=agora,
+        )
+
+    @classmethod
+    def recalcular_contadores(cls, queryset=None):
+        """
+        Reconstrói score/upvotes/downvotes a partir da tabela Voto
+        (um único UPDATE com subqueries). Retorna o número de notícias afetadas.
+        """
+        qs = queryset if queryset is not None else cls.objects.all()
+        votos = Voto.objects.filter(noticia=OuterRef("pk")).values("noticia")
 
-    def upvotes(self):
-        return self.votos.filter(valor=1).count()
+        def _soma(expr):
+            sub = votos.annotate(total=Sum(expr)).values("total")
+            return Coalesce(Subquery(sub, output_field=models.IntegerField()), 0)
 
-    def downvotes(self):
-        return self.votos.filter(valor=-1).count()
+        return qs.update(
+            atualizado_em=timezone.now(),
+            score=_soma("valor"),
+            upvotes=_soma(Case(When(valor=1, then=1), default=0)),
+            downvotes=_soma(Case(When(valor=-1, then=1), default=0)),
+        )
+
+    @classmethod
+    def atualizar_scores_quentes(cls, queryset=None, lote=1000):
+        """
+        Recalcula score_quente com a idade atual (o decaimento não acontece
+        sozinho). Notícias sem votos ficam em 0 e são puladas. Retorna o
+        número de notícias atualizadas.
+        """
+        qs = queryset if queryset is not None else cls.objects.all()
+        agora = timezone.now()
+        total, pendentes = 0, []
+        for noticia in qs.exclude(score=0, score_quente=0).only("id", "score", "criado_em").iterator(chunk_size=lote):
+            noticia.score_quente = score_quente(noticia.score, noticia.criado_em, agora)
+            pendentes.append(noticia)
+            if len(pendentes) >= lote:
+                cls.objects.bulk_update(pendentes, ["score_quente"])
+                total += len(pendentes)
+                pendentes = []
+        cls.objects.bulk_update(pendentes, ["score_quente"])
+        return total + len(pendentes)
+
+    def clean(self):
+        # hash_conteudo não é editável, então o ModelForm não valida a
+        # restrição única sozinho: sem isto o admin daria IntegrityError
+        super().clean()
+        repetida = Noticia.objects.filter(hash_conteudo=hash_conteudo(self.titulo, self.conteudo)).exclude(pk=self.pk)
+        if repetida.exists():
+            raise ValidationError("Já existe uma notícia com este título e conteúdo.")
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or {"titulo", "conteudo"} & set(update_fields):
+            self.hash_conteudo = hash_conteudo(self.titulo, self.conteudo)
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "hash_conteudo"}
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.titulo
@@ -73,11 +214,73 @@ class Voto(models.Model):
         constraints = [
             models.UniqueConstraint(fields=["noticia", "usuario"], name="unique_user_vote_per_news")
         ]
+        indexes = [
+            # sinais de recomendação: votos (positivos) de um usuário
+            models.Index(fields=["usuario", "valor", "noticia"], name="voto_usuario_valor_idx"),
+        ]
 
     def __str__(self):
         return f'{self.usuario} -> {self.valor} em {self.noticia}'
 
 
+class VotoDiario(models.Model):
+    """
+    Rollup diário dos votos de uma notícia, agrupados pelo dia de criação do
+    Voto (no fuso do projeto). Alimenta os rankings por período sem varrer
+    a tabela Voto (ver noticias.ranking).
+    """
+    noticia = models.ForeignKey(Noticia, on_delete=models.CASCADE, related_name="votos_diarios")
+    dia = models.DateField()
+    ups = models.PositiveIntegerField(default=0)
+    downs = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["noticia", "dia"], name="unique_voto_diario_por_noticia"),
+        ]
+        indexes = [
+            models.Index(fields=["dia"], name="voto_diario_dia_idx"),
+        ]
+
+    @classmethod
+    def registrar(cls, noticia_id, dia, anterior, atual):
+        """Aplica a transição anterior -> atual ao balde (noticia, dia)."""
+        if anterior == atual:
+            return
+        cls.objects.bulk_create([cls(noticia_id=noticia_id, dia=dia)], ignore_conflicts=True)
+        cls.objects.filter(noticia_id=noticia_id, dia=dia).update(
+            ups=F("ups") + int(atual == 1) - int(anterior == 1),
+            downs=F("downs") + int(atual == -1) - int(anterior == -1),
+        )
+
+    @classmethod
+    def reconstruir(cls, noticia_ids=None):
+        """Refaz os baldes a partir da tabela Voto (todas as notícias ou só `noticia_ids`)."""
+        votos = Voto.objects.all()
+        baldes = cls.objects.all()
+        if noticia_ids is not None:
+            votos = votos.filter(noticia_id__in=noticia_ids)
+            baldes = baldes.filter(noticia_id__in=noticia_ids)
+
+        linhas = (
+            votos.annotate(dia=TruncDate("criado_em"))
+            .values("noticia_id", "dia")
+            .annotate(
+                ups=Count("id", filter=Q(valor=1)),
+                downs=Count("id", filter=Q(valor=-1)),
+            )
+            .order_by()
+        )
+        with transaction.atomic():
+            baldes.delete()
+            cls.objects.bulk_create(
+                (cls(**linha) for linha in linhas.iterator()), batch_size=1000
+            )
+
+    def __str__(self):
+        return f"{self.noticia} em {self.dia}: +{self.ups} -{self.downs}"
+
+
 class Salvo(models.Model):
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     noticia = models.ForeignKey(Noticia, on_delete=models.CASCADE)
@@ -85,6 +288,61 @@ class Salvo(models.Model):
 
     class Meta:
         unique_together = ('usuario', 'noticia')
+        indexes = [
+            # minhas_salvas: salvos do usuário, mais recentes primeiro
+            models.Index(fields=["usuario", "-criado_em"], name="salvo_usuario_criado_idx"),
+        ]
 
     def __str__(self):
         return f"{self.usuario} salvou {self.noticia}"
+
+
+class Recomendacao(models.Model):
+    """
+    Recomendações pré-calculadas por usuário (ver noticias.recomendacoes).
+    A home só lê as primeiras linhas por `posicao`.
+    """
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="recomendacoes")
+    noticia = models.ForeignKey(Noticia, on_delete=models.CASCADE, related_name="recomendacoes")
+    posicao = models.PositiveSmallIntegerField()
+    afinidade = models.PositiveIntegerField(default=0)
+    calculado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["usuario", "posicao"]
+        constraints = [
+            models.UniqueConstraint(fields=["usuario", "noticia"], name="unique_recomendacao_por_usuario"),
+        ]
+        indexes = [
+            models.Index(fields=["usuario", "posicao"], name="recomendacao_usuario_pos_idx"),
+        ]
+
+    def __str__(self):
+        return f"#{self.posicao} {self.noticia} para {self.usuario}"
+
+
+class TarefaResumo(models.Model):
+    """Pedido de resumo de uma notícia, consumido por `manage.py processar_resumos`."""
+
+    class Status(models.TextChoices):
+        PENDENTE = "pendente", "Pendente"
+        PROCESSANDO = "processando", "Processando"
+        CONCLUIDA = "concluida", "Concluída"
+        FALHOU = "falhou", "Falhou"
+
+    noticia = models.ForeignKey(Noticia, on_delete=models.CASCADE, related_name="tarefas_resumo")
+    status = models.CharField(max_length=12, choices=Status.choices, default=Status.PENDENTE)
+    forcar = models.BooleanField(default=False)
+    resumo = models.TextField(blank=True)
+    erro = models.TextField(blank=True)
+    tentativas = models.PositiveSmallIntegerField(default=0)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "criado_em"], name="tarefa_resumo_fila_idx"),
+        ]
+
+    def __str__(self):
+        return f"Resumo de {self.noticia} ({self.status})"
@@ -0,0 +1,139 @@
+"""
+Paginação por cursor (keyset) para o feed.
+
+Em vez de OFFSET, cada página é buscada a partir da chave da última (ou da
+primeira) notícia exibida, então o custo de uma página não cresce com a
+profundidade no arquivo. Os cursores são opacos para o cliente: base64 de
+um JSON com a direção e os valores da chave.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from django.db import models
+from django.db.models import Q
+
+
+@dataclass
+class Pagina:
+    itens: list = field(default_factory=list)
+    cursor_proximo: str | None = None
+    cursor_anterior: str | None = None
+
+
+def _serializar(valor):
+    return valor.isoformat() if isinstance(valor, datetime) else valor
+
+
+def codificar_cursor(direcao, valores):
+    payload = json.dumps({"d": direcao, "v": [_serializar(v) for v in valores]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _data(valor):
+    if not isinstance(valor, str):
+        raise ValueError(valor)
+    momento = datetime.fromisoformat(valor)
+    if momento.tzinfo is None:
+        raise ValueError(valor)
+    return momento
+
+
+def _inteiro(valor):
+    if isinstance(valor, bool) or not isinstance(valor, int):
+        raise ValueError(valor)
+    return valor
+
+
+def _numero(valor):
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        raise ValueError(valor)
+    return valor
+
+
+def _conversor(model, chave):
+    """Valida o valor do cursor conforme o tipo do campo `chave` de `model`."""
+    campo = model._meta.get_field(chave)
+    if isinstance(campo, models.DateTimeField):
+        return _data
+    if isinstance(campo, models.FloatField):
+        return _numero
+    if isinstance(campo, (models.IntegerField, models.AutoField)):
+        return _inteiro
+    raise ValueError(f"Chave de cursor sem tipo conhecido: {chave!r}")
+
+
+def decodificar_cursor(cursor, model, chaves):
+    """
+    Retorna (direcao, valores) ou None se o cursor for inválido, inclusive
+    quando um valor não tem o tipo do campo da chave correspondente.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        direcao, valores = data["d"], data["v"]
+        if direcao not in ("prox", "ant") or not isinstance(valores, list) or len(valores) != len(chaves):
+            return None
+        return direcao, [_conversor(model, chave)(v) for chave, v in zip(chaves, valores)]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        return None
+
+
+def _filtro_apos(chaves, valores, descendente):
+    """
+    Monta (k1 < v1) OR (k1 = v1 AND k2 < v2) OR ... para ordem descendente
+    (ou com > para ascendente).
+    """
+    op = "lt" if descendente else "gt"
+    filtro = Q()
+    for i, chave in enumerate(chaves):
+        cond = Q(**{f"{chave}__{op}": valores[i]})
+        for anterior, valor in zip(chaves[:i], valores[:i]):
+            cond &= Q(**{anterior: valor})
+        filtro |= cond
+    return filtro
+
+
+def paginar_keyset(queryset, chaves, cursor=None, tamanho=20):
+    """
+    Pagina `queryset` em ordem descendente pelas `chaves` (ex.: ["criado_em", "id"]).
+    A última chave deve ser única (normalmente "id") para desempate.
+    """
+    decodificado = decodificar_cursor(cursor, queryset.model, chaves)
+    direcao, valores = decodificado if decodificado else ("prox", None)
+
+    ordem_desc = [f"-{c}" for c in chaves]
+    if direcao == "prox":
+        qs = queryset.order_by(*ordem_desc)
+        if valores is not None:
+            qs = qs.filter(_filtro_apos(chaves, valores, descendente=True))
+    else:
+        qs = queryset.order_by(*chaves).filter(_filtro_apos(chaves, valores, descendente=False))
+
+    itens = list(qs[: tamanho + 1])
+    tem_mais = len(itens) > tamanho
+    itens = itens[:tamanho]
+    if direcao == "ant":
+        itens.reverse()
+
+    pagina = Pagina(itens=itens)
+    if not itens:
+        return pagina
+
+    def _chave(obj):
+        return [getattr(obj, c) for c in chaves]
+
+    if direcao == "prox":
+        if tem_mais:
+            pagina.cursor_proximo = codificar_cursor("prox", _chave(itens[-1]))
+        if valores is not None:
+            pagina.cursor_anterior = codificar_cursor("ant", _chave(itens[0]))
+    else:
+        pagina.cursor_proximo = codificar_cursor("prox", _chave(itens[-1]))
+        if tem_mais:
+            pagina.cursor_anterior = codificar_cursor("ant", _chave(itens[0]))
+    return pagina
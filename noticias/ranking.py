@@ -0,0 +1,47 @@
+"""
+Rankings de notícias por janela de tempo ("top K das últimas 24h/7d/30d").
+
+Os totais vêm do rollup diário VotoDiario, mantido a cada voto, então o
+custo depende do número de notícias votadas na janela e não do volume de
+votos. A granularidade é o dia: a janela começa à meia-noite de N dias atrás
+(ex.: "24h" considera os baldes de ontem e de hoje).
+"""
+from datetime import timedelta
+
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import Noticia
+
+JANELAS = {"24h": 1, "7d": 7, "30d": 30}
+
+TITULOS = {
+    "24h": "das últimas 24h",
+    "7d": "da semana",
+    "30d": "do mês",
+}
+
+
+def inicio_da_janela(janela):
+    return timezone.localdate() - timedelta(days=JANELAS[janela])
+
+
+def top(janela="7d", limite=3):
+    """
+    Lista as `limite` notícias com maior score na janela, anotadas com
+    score_periodo, ups_periodo e downs_periodo.
+    """
+    if janela not in JANELAS:
+        raise ValueError(f"Janela desconhecida: {janela!r}")
+
+    qs = (
+        Noticia.objects.filter(votos_diarios__dia__gte=inicio_da_janela(janela))
+        .annotate(
+            ups_periodo=Sum("votos_diarios__ups"),
+            downs_periodo=Sum("votos_diarios__downs"),
+        )
+        .annotate(score_periodo=F("ups_periodo") - F("downs_periodo"))
+        .filter(Q(ups_periodo__gt=0) | Q(downs_periodo__gt=0))
+        .order_by("-score_periodo", "-ups_periodo", "-criado_em")
+    )
+    return list(qs[:limite])
@@ -0,0 +1,126 @@
+"""
+Cálculo e armazenamento das recomendações "Para você".
+
+O cálculo por afinidade de assuntos é caro (vários agregados sobre o
+histórico do usuário), então ele roda fora do caminho de leitura:
+  - em lote, via `manage.py recalcular_recomendacoes`;
+  - por usuário, na próxima leitura da home depois de um voto ou salvo:
+    a escrita só marca o usuário (`marcar_desatualizadas`, uma chave no
+    cache) e a home recalcula quando encontra a marca.
+A home apenas lê as linhas de `Recomendacao`. Vários votos seguidos custam
+um único recálculo; se a marca se perder (cache limpo), as recomendações
+ficam como estavam até o próximo recálculo em lote.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from . import cache as cache_noticias
+from .models import Noticia, Recomendacao, Salvo, Voto
+
+
+def _limite_padrao():
+    return getattr(settings, "NOTICIAS_RECOMENDACOES_LIMITE", 20)
+
+
+def calcular(user, limite=None):
+    """Retorna [(noticia_id, afinidade), ...] na ordem de recomendação."""
+    limite = limite or _limite_padrao()
+
+    # vistos (votados ou salvos) para evitar recomendar o mesmo
+    # (duas subconsultas por índice; um OR entre os dois JOINs varreria Noticia)
+    votadas_ids = Voto.objects.filter(usuario=user).values("noticia_id")
+    salvas_ids = Salvo.objects.filter(usuario=user).values("noticia_id")
+
+    # sinais (assuntos curtidos/salvos)
+    assuntos_ids = set(
+        Voto.objects.filter(usuario=user, valor=1, noticia__assuntos__isnull=False)
+        .values_list("noticia__assuntos", flat=True)
+    ) | set(
+        Salvo.objects.filter(usuario=user, noticia__assuntos__isnull=False)
+        .values_list("noticia__assuntos", flat=True)
+    )
+
+    # (A) afinidade por assuntos
+    if assuntos_ids:
+        qs = (
+            Noticia.objects.exclude(id__in=votadas_ids).exclude(id__in=salvas_ids)
+            .filter(assuntos__in=assuntos_ids)
+            .annotate(
+                match_count=Count("assuntos", filter=Q(assuntos__in=assuntos_ids), distinct=True),
+            )
+            .order_by("-match_count", "-score", "-criado_em")
+            .values_list("id", "match_count")[:limite]
+        )
+        resultado = list(qs)
+        if resultado:
+            return resultado
+
+    # (B) fallback: populares recentes
+    semana = timezone.now() - timedelta(days=7)
+    resultado = list(
+        Noticia.objects.exclude(id__in=votadas_ids).exclude(id__in=salvas_ids)
+        .filter(criado_em__gte=semana)
+        .order_by("-score", "-criado_em")
+        .values_list("id", flat=True)[:limite]
+    )
+    if not resultado:
+        # (C) fallback final: últimas
+        resultado = list(
+            Noticia.objects.exclude(id__in=votadas_ids).exclude(id__in=salvas_ids)
+            .order_by("-criado_em")
+            .values_list("id", flat=True)[:limite]
+        )
+    return [(pk, 0) for pk in resultado]
+
+
+def _chave_desatualizadas(usuario_id):
+    return f"{cache_noticias.PREFIXO}:recomendacoes:desatualizadas:{usuario_id}"
+
+
+def marcar_desatualizadas(usuario_id):
+    """Marca as recomendações do usuário para recálculo, depois que a transação atual confirmar."""
+    transaction.on_commit(lambda: cache_noticias.backend().set(_chave_desatualizadas(usuario_id), True, None))
+
+
+def desatualizadas(usuario_id):
+    return bool(cache_noticias.backend().get(_chave_desatualizadas(usuario_id)))
+
+
+def atualizar_para_usuario(user, limite=None):
+    """Recalcula e substitui as recomendações armazenadas de `user`."""
+    # desmarca antes de calcular: um voto durante o cálculo marca de novo
+    cache_noticias.backend().delete(_chave_desatualizadas(user.pk))
+    agora = timezone.now()
+    linhas = [
+        Recomendacao(usuario_id=user.pk, noticia_id=pk, posicao=i, afinidade=afinidade, calculado_em=agora)
+        for i, (pk, afinidade) in enumerate(calcular(user, limite))
+    ]
+    with transaction.atomic():
+        # Trava o usuário: dois recálculos concorrentes (votos em paralelo)
+        # não podem intercalar delete/insert e violar a unicidade. No SQLite
+        # não há FOR UPDATE e um SELECT aqui só atrapalharia: o DELETE abaixo
+        # já pega o lock de escrita do banco inteiro.
+        if connection.features.has_select_for_update:
+            get_user_model().objects.select_for_update().filter(pk=user.pk).first()
+        Recomendacao.objects.filter(usuario_id=user.pk).delete()
+        Recomendacao.objects.bulk_create(linhas)
+    cache_noticias.invalidar_recomendacoes(user.pk)
+    return len(linhas)
+
+
+def recomendadas(user, limite=8):
+    """QuerySet das notícias recomendadas a `user`, lido da tabela pré-calculada."""
+    if not user.is_authenticated:
+        return Noticia.objects.none()
+
+    qs = (
+        Noticia.objects.filter(recomendacoes__usuario=user)
+        .annotate(match_count=F("recomendacoes__afinidade"))
+        .order_by("recomendacoes__posicao")[:limite]
+    )
+    return qs
@@ -0,0 +1,230 @@
+"""
+Geração de resumos de notícias.
+
+Os resumos não são mais gerados dentro da requisição: `resumir_noticia`
+enfileira uma TarefaResumo e um worker (`manage.py processar_resumos`)
+chama o resumidor. O resumidor é plugável via settings.NOTICIAS_RESUMIDOR
+(caminho pontilhado de uma classe com `resumir(noticia) -> str`):
+
+  - ResumidorGemini: usa o Gemini (exige GEMINI_API_KEY); sem chave, com
+    erro na chamada ou com resposta vazia levanta ResumoIndisponivel;
+  - ResumidorLocal: só o texto local, sem rede (testes e desenvolvimento).
+
+Uma falha do resumidor deixa a tarefa como "falhou" e a notícia sem
+resumo_hash: o próximo pedido (ou `manage.py resumir_lote`) tenta de novo.
+
+O worker em --loop renova um batimento no cache a cada rodada
+(`registrar_worker`); sem batimento recente, `resumir_noticia` processa a
+fila na própria requisição, para a tarefa não ficar parada para sempre.
+"""
+import logging
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, F, Q, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import cache as cache_noticias
+from .models import Noticia, TarefaResumo, hash_conteudo
+
+logger = logging.getLogger(__name__)
+
+FALLBACK_RESUMO = (
+    "Resumo gerado automaticamente para testes E2E BRASA. "
+    "Este texto é usado apenas para validação de interface e integração."
+)
+
+# incremente ao mudar o PROMPT: invalida os resumos gerados com o anterior
+PROMPT_VERSAO = 1
+
+PROMPT = """
+Você é um assistente de jornalismo. Resuma a notícia abaixo de forma clara, objetiva e em português:
+<noticia>
+Título: {titulo}
+Conteúdo: {conteudo}
+</noticia>
+"""
+
+# tarefas "processando" há mais que isso são consideradas abandonadas
+# (worker morreu no meio) e voltam para a fila
+TEMPO_MAXIMO_PROCESSANDO = timedelta(minutes=10)
+
+# batimento do worker: sem renovação por WORKER_TTL segundos ele é dado como parado
+CHAVE_WORKER = f"{cache_noticias.PREFIXO}:resumos:worker"
+WORKER_TTL = 120
+
+
+def _prefixo_hash():
+    return f"v{PROMPT_VERSAO}:"
+
+
+def hash_resumo(noticia):
+    """
+    Identifica o par (texto da notícia, prompt) que gerou um resumo: versão
+    do prompt + o mesmo hash de Noticia.hash_conteudo, o que permite achar
+    os resumos desatualizados em SQL (ver `desatualizadas`).
+    """
+    return _prefixo_hash() + hash_conteudo(noticia.titulo, noticia.conteudo)
+
+
+def resumo_atualizado(noticia):
+    """True se a notícia já tem um resumo gerado a partir do texto atual."""
+    return bool(noticia.resumo) and noticia.resumo_hash == hash_resumo(noticia)
+
+
+def desatualizadas(queryset=None):
+    """Notícias sem resumo ou com resumo de outra versão do texto/prompt (filtro no banco)."""
+    queryset = Noticia.objects.all() if queryset is None else queryset
+    return queryset.filter(
+        Q(resumo__isnull=True)
+        | Q(resumo="")
+        | ~Q(resumo_hash=Concat(Value(_prefixo_hash()), F("hash_conteudo"), output_field=CharField()))
+    )
+
+
+# ==============================================
+# Resumidores
+# ==============================================
+class ResumoIndisponivel(Exception):
+    """O resumidor não conseguiu gerar um resumo (a tarefa pode ser refeita)."""
+
+
+class ResumidorLocal:
+    def resumir(self, noticia):
+        return FALLBACK_RESUMO
+
+
+@lru_cache(maxsize=1)
+def _modelo_gemini(api_key):
+    # configura o cliente uma única vez por processo
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel("gemini-flash-latest")
+
+
+class ResumidorGemini:
+    def resumir(self, noticia):
+        api_key = getattr(settings, "GEMINI_API_KEY", None)
+        if not api_key:
+            raise ResumoIndisponivel("GEMINI_API_KEY não configurada")
+        try:
+            prompt = PROMPT.format(titulo=noticia.titulo, conteudo=noticia.conteudo)
+            response = _modelo_gemini(api_key).generate_content(prompt)
+        except Exception as e:
+            raise ResumoIndisponivel(f"Falha no Gemini: {e}") from e
+        resumo = (getattr(response, "text", "") or "").strip()
+        if len(resumo) <= 30:
+            raise ResumoIndisponivel("Resposta vazia ou curta demais do Gemini")
+        return resumo
+
+
+def obter_resumidor():
+    caminho = getattr(settings, "NOTICIAS_RESUMIDOR", "noticias.resumo.ResumidorGemini")
+    return import_string(caminho)()
+
+
+# ==============================================
+# Fila de tarefas
+# ==============================================
+def enfileirar(noticia, forcar=False):
+    """
+    Cria a tarefa de resumo de `noticia` (ou reaproveita uma já em aberto).
+    `forcar` pede um resumo novo mesmo que o atual esteja em dia.
+    """
+    aberta = (
+        TarefaResumo.objects.filter(
+            noticia=noticia,
+            status__in=[TarefaResumo.Status.PENDENTE, TarefaResumo.Status.PROCESSANDO],
+        )
+        .order_by("-criado_em")
+        .first()
+    )
+    if aberta and (aberta.forcar or not forcar):
+        return aberta
+    return TarefaResumo.objects.create(noticia=noticia, forcar=forcar)
+
+
+def reservar_proxima():
+    """
+    Marca como "processando" a tarefa pendente mais antiga e a retorna
+    (ou None). A troca de status é um UPDATE condicional, então dois
+    workers nunca pegam a mesma tarefa.
+    """
+    limite = timezone.now() - TEMPO_MAXIMO_PROCESSANDO
+    candidatas = TarefaResumo.objects.filter(status=TarefaResumo.Status.PENDENTE) | TarefaResumo.objects.filter(
+        status=TarefaResumo.Status.PROCESSANDO, atualizado_em__lt=limite
+    )
+    for tarefa in candidatas.order_by("criado_em")[:10]:
+        reservada = TarefaResumo.objects.filter(
+            pk=tarefa.pk, status=tarefa.status, atualizado_em=tarefa.atualizado_em
+        ).update(
+            status=TarefaResumo.Status.PROCESSANDO,
+            tentativas=tarefa.tentativas + 1,
+            atualizado_em=timezone.now(),
+        )
+        if reservada:
+            tarefa.refresh_from_db()
+            return tarefa
+    return None
+
+
+def processar(tarefa, resumidor=None):
+    """Executa uma tarefa já reservada e grava o resumo na notícia."""
+    resumidor = resumidor or obter_resumidor()
+    noticia = tarefa.noticia
+
+    # outra tarefa pode ter resumido esta mesma versão do texto nesse meio tempo
+    if not tarefa.forcar and resumo_atualizado(noticia):
+        tarefa.status = TarefaResumo.Status.CONCLUIDA
+        tarefa.resumo = noticia.resumo
+        tarefa.save(update_fields=["status", "resumo", "atualizado_em"])
+        return tarefa
+
+    assinatura = hash_resumo(noticia)
+    try:
+        texto = (resumidor.resumir(noticia) or "").strip()
+        if not texto:
+            raise ResumoIndisponivel("Resumidor devolveu um texto vazio")
+    except Exception as e:
+        logger.exception("Falha ao resumir notícia %s", noticia.pk)
+        tarefa.status = TarefaResumo.Status.FALHOU
+        tarefa.erro = str(e)[:1000]
+        tarefa.save(update_fields=["status", "erro", "atualizado_em"])
+        return tarefa
+
+    with transaction.atomic():
+        noticia.resumo = texto
+        noticia.resumo_hash = assinatura
+        noticia.save(update_fields=["resumo", "resumo_hash", "atualizado_em"])
+        tarefa.status = TarefaResumo.Status.CONCLUIDA
+        tarefa.resumo = texto
+        tarefa.erro = ""
+        tarefa.save(update_fields=["status", "resumo", "erro", "atualizado_em"])
+    cache_noticias.ao_alterar_noticia(noticia.pk)
+    return tarefa
+
+
+def registrar_worker(ttl=WORKER_TTL):
+    cache_noticias.backend().set(CHAVE_WORKER, timezone.now().isoformat(), ttl)
+
+
+def worker_ativo():
+    return cache_noticias.backend().get(CHAVE_WORKER) is not None
+
+
+def processar_pendentes(maximo=None, resumidor=None):
+    """Processa tarefas até esvaziar a fila (ou atingir `maximo`). Retorna quantas."""
+    resumidor = resumidor or obter_resumidor()
+    feitas = 0
+    while maximo is None or feitas < maximo:
+        tarefa = reservar_proxima()
+        if tarefa is None:
+            break
+        processar(tarefa, resumidor)
+        feitas += 1
+    return feitas
@@ -0,0 +1,40 @@
+import logging
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import busca, imagens
+from .models import Noticia
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_INDEXADOS = {"titulo", "conteudo"}
+
+
+@receiver(post_save, sender=Noticia)
+def indexar_noticia(sender, instance, update_fields=None, **kwargs):
+    # saves parciais que não tocam texto (ex.: resumo) não reindexam
+    if update_fields is not None and not CAMPOS_INDEXADOS & set(update_fields):
+        return
+    busca.indexar([instance])
+
+
+@receiver(post_delete, sender=Noticia)
+def remover_noticia_do_indice(sender, instance, **kwargs):
+    busca.remover([instance.pk])
+
+
+@receiver(post_save, sender=Noticia)
+def gerar_variantes_da_imagem(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and "imagem" not in update_fields:
+        return
+    try:
+        imagens.atualizar_noticia(instance)
+    except Exception:
+        # imagem ilegível não impede salvar a notícia; o template usa a original
+        logger.exception("Falha ao gerar variantes da imagem da notícia %s", instance.pk)
+
+
+@receiver(post_delete, sender=Noticia)
+def remover_variantes_da_imagem(sender, instance, **kwargs):
+    imagens.remover_variantes(instance.imagem_variantes)
@@ -26,6 +26,26 @@
 
   let busy = false;
 
+  const POLL_INTERVALO_MS = 1500;
+  const POLL_MAX_TENTATIVAS = 60;
+
+  function esperar(ms) {
+    return new Promise((resolve) => setTimeout(resolve, ms));
+  }
+
+  // A view responde 202 com a URL de status da tarefa; consulta até concluir.
+  async function aguardarTarefa(data) {
+    for (let i = 0; i < POLL_MAX_TENTATIVAS; i++) {
+      if (data.status === 'concluida' || data.status === 'ok') return data;
+      if (data.status === 'falhou') throw new Error(data.erro || 'Falha ao gerar resumo');
+      await esperar(POLL_INTERVALO_MS);
+      const res = await fetch(data.status_url, { credentials: 'same-origin' });
+      if (!res.ok) throw new Error('Falha ao consultar resumo (' + res.status + ')');
+      data = await res.json();
+    }
+    throw new Error('Tempo esgotado aguardando o resumo');
+  }
+
   function setLoading(on) {
     busy = on;
     if (btn) btn.disabled = on;
@@ -85,7 +105,8 @@
         throw new Error('Falha ao gerar resumo (' + res.status + ')');
       }
 
-      const data = await res.json();
+      let data = await res.json();
+      if (res.status === 202) data = await aguardarTarefa(data);
       const summary = (data && (data.resumo || data.text || '')).trim();
 
       if (txt) {
@@ -18,6 +18,18 @@
   const loginUrl = group.dataset.loginUrl || '/accounts/login/';
   const feedback = document.getElementById('vote-feedback');
 
+  function setCounts(data) {
+    group.querySelector('[data-count="up"]').textContent = data.up;
+    group.querySelector('[data-count="down"]').textContent = data.down;
+  }
+
+  // Contadores ao vivo (votos de outros leitores) por SSE; o navegador
+  // reconecta sozinho. Sem suporte no servidor (204/503), fica sem atualizar.
+  if (window.EventSource && group.dataset.aoVivoUrl) {
+    const fonte = new EventSource(group.dataset.aoVivoUrl);
+    fonte.addEventListener('contadores', (e) => setCounts(JSON.parse(e.data)));
+  }
+
   function setActive(v) {
     const upBtn = group.querySelector('.vote-btn.up');
     const downBtn = group.querySelector('.vote-btn.down');
@@ -59,8 +71,7 @@
     const valor = parseInt(btn.dataset.valor, 10);
     try {
       const data = await enviarVoto(valor);
-      group.querySelector('[data-count="up"]').textContent = data.up;
-      group.querySelector('[data-count="down"]').textContent = data.down;
+      setCounts(data);
       setActive(data.voto_usuario);
       if (feedback) feedback.textContent = 'Voto atualizado.';
     } catch (err) {
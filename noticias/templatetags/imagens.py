@@ -0,0 +1,45 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from noticias import imagens
+
+register = template.Library()
+
+
+def _srcset(variantes, extensao):
+    # a original entra com a largura dela: acima da maior variante, vale mais que ampliá-la
+    candidatas = [
+        f"{default_storage.url(imagens.nome_variante(variantes['origem'], largura, extensao))} {largura}w"
+        for largura in variantes["larguras"]
+    ]
+    candidatas.append(f"{default_storage.url(variantes['origem'])} {variantes['largura']}w")
+    return ", ".join(candidatas)
+
+
+@register.simple_tag
+def imagem_noticia(noticia, tamanhos="100vw", alt="", classe="", largura_src=320):
+    """
+    <picture> com srcset WebP/JPEG das variantes de `noticia.imagem`.
+
+    `tamanhos` vai no atributo sizes (a largura exibida, ex.: "72px"), e o
+    navegador escolhe a menor variante suficiente. Sem variantes geradas,
+    cai no <img> com a imagem original (também quando ela é mais estreita
+    que a menor variante).
+    """
+    if not noticia.imagem:
+        return ""
+    variantes = noticia.imagem_variantes or {}
+    if not imagens.em_dia(variantes, noticia.imagem.name) or not variantes.get("larguras"):
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="lazy" decoding="async">', noticia.imagem.url, alt, classe,
+        )
+
+    src = next((l for l in variantes["larguras"] if l >= largura_src), None)
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="lazy" decoding="async"></picture>',
+        _srcset(variantes, "webp"), tamanhos,
+        default_storage.url(imagens.nome_variante(variantes["origem"], src, "jpg")) if src else noticia.imagem.url,
+        _srcset(variantes, "jpg"), tamanhos, alt, classe,
+    )
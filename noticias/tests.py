@@ -1,3 +1,1371 @@
-from django.test import TestCase
+import asyncio
+import base64
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, connections, transaction
+from django.test import Client, LiveServerTestCase, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from Brasa import banco, instrumentacao, replicas
+
+from . import ao_vivo, buffer_votos, busca, cache as cache_noticias, importacao, ranking, recomendacoes, resumo
+from .models import Assunto, Noticia, Recomendacao, Salvo, TarefaResumo, Voto, VotoDiario
+
+AJAX = {"HTTP_X_REQUESTED_WITH": "XMLHttpRequest"}
+# cache de cada processo de testes: nunca o .cache/ (nem o Redis) de desenvolvimento
+CACHE_TESTES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class ContadoresVotoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("aluno", password="12345678")
+        self.client.force_login(self.user)
+        self.noticia = Noticia.objects.create(titulo="Teste", conteudo="Conteúdo")
+        self.url = reverse("noticias:votar", args=[self.noticia.pk])
+
+    def votar(self, valor):
+        return self.client.post(self.url, {"valor": valor}, **AJAX).json()
+
+    def test_criar_inverter_e_remover_voto_atualiza_contadores(self):
+        data = self.votar(1)
+        self.assertEqual((data["up"], data["down"], data["score"], data["voto_usuario"]), (1, 0, 1, 1))
+
+        data = self.votar(-1)
+        self.assertEqual((data["up"], data["down"], data["score"], data["voto_usuario"]), (0, 1, -1, -1))
+
+        data = self.votar(-1)
+        self.assertEqual((data["up"], data["down"], data["score"], data["voto_usuario"]), (0, 0, 0, 0))
+        self.assertFalse(Voto.objects.exists())
+
+    def test_recalcular_contadores_corrige_divergencia(self):
+        outro = get_user_model().objects.create_user("outro", password="12345678")
+        Voto.objects.create(noticia=self.noticia, usuario=self.user, valor=1)
+        Voto.objects.create(noticia=self.noticia, usuario=outro, valor=-1)
+        Noticia.objects.filter(pk=self.noticia.pk).update(score=42, upvotes=7, downvotes=0)
+
+        call_command("recalcular_contadores", stdout=StringIO())
+
+        self.noticia.refresh_from_db()
+        self.assertEqual((self.noticia.score, self.noticia.upvotes, self.noticia.downvotes), (0, 1, 1))
+
+    def test_voto_atualiza_score_quente(self):
+        Noticia.objects.filter(pk=self.noticia.pk).update(criado_em=timezone.now() - timedelta(hours=10))
+        Noticia.aplicar_voto(self.noticia.pk, 0, 1)
+        self.noticia.refresh_from_db()
+        self.assertAlmostEqual(self.noticia.score_quente, 1 / 12 ** 1.8, places=4)
+
+        Noticia.objects.filter(pk=self.noticia.pk).update(criado_em=timezone.now() - timedelta(hours=100))
+        call_command("atualizar_score_quente", stdout=StringIO())
+        self.noticia.refresh_from_db()
+        self.assertAlmostEqual(self.noticia.score_quente, 1 / 102 ** 1.8, places=6)
+
+    def test_voto_nao_rele_a_noticia_e_admin_recalcula_score_quente(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.votar(1)
+        leituras = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith("SELECT") and "criado_em" in q["sql"]]
+        self.assertEqual(len([q for q in leituras if 'FROM "noticias_noticia"' in q]), 1)  # get_object_or_404
+
+        admin = get_user_model().objects.create_superuser("admin", password="12345678")
+        self.client.force_login(admin)
+        voto = Voto.objects.get()
+        self.client.post(reverse("admin:noticias_voto_delete", args=[voto.pk]), {"post": "yes"})
+        self.noticia.refresh_from_db()
+        self.assertEqual((self.noticia.score, self.noticia.score_quente), (0, 0))
+
+
+@override_settings(NOTICIAS_POR_PAGINA=3, CACHES=CACHE_TESTES)
+class PaginacaoFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.assunto = Assunto.objects.create(nome="Política", slug="politica")
+        base = timezone.now()
+        self.noticias = []
+        for i in range(8):
+            n = Noticia.objects.create(titulo=f"N{i}", conteudo="x", score=i % 3)
+            Noticia.objects.filter(pk=n.pk).update(criado_em=base - timedelta(hours=i))
+            if i % 2 == 0:
+                n.assuntos.add(self.assunto)
+            self.noticias.append(n)
+
+    def _percorrer(self, params):
+        vistos, qs = [], params
+        while True:
+            resp = self.client.get(reverse("noticias:index") + "?" + qs)
+            vistos.extend(n.pk for n in resp.context["noticias"])
+            qs = resp.context["pagina_proxima_qs"]
+            if not qs:
+                return vistos, resp
+
+    def test_recentes_percorre_todas_sem_repetir(self):
+        vistos, _ = self._percorrer("")
+        self.assertEqual(vistos, [n.pk for n in self.noticias])
+
+    def test_populares_ordena_por_score_quente(self):
+        Noticia.atualizar_scores_quentes()
+        vistos, _ = self._percorrer("sort=populares")
+        esperado = Noticia.objects.order_by("-score_quente", "-id").values_list("pk", flat=True)
+        self.assertEqual(vistos, list(esperado))
+        # score 2 há 2h, depois score 1 há 1h, à frente de score 2 há 5h (decaimento pela idade)
+        self.assertEqual(vistos[:3], [self.noticias[2].pk, self.noticias[1].pk, self.noticias[5].pk])
+
+    def test_cursor_preserva_filtros_e_volta_pagina(self):
+        resp = self.client.get(reverse("noticias:index"), {"assunto": "politica"})
+        primeira = [n.pk for n in resp.context["noticias"]]
+        self.assertIn("assunto=politica", resp.context["pagina_proxima_qs"])
+
+        resp = self.client.get(reverse("noticias:index") + "?" + resp.context["pagina_proxima_qs"])
+        self.assertEqual([n.pk for n in resp.context["noticias"]], [self.noticias[6].pk])
+
+        resp = self.client.get(reverse("noticias:index") + "?" + resp.context["pagina_anterior_qs"])
+        self.assertEqual([n.pk for n in resp.context["noticias"]], primeira)
+
+    def test_cursor_invalido_volta_para_primeira_pagina(self):
+        resp = self.client.get(reverse("noticias:index"), {"cursor": "lixo!!"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.context["noticias"]), 3)
+
+    def test_cursor_forjado_com_tipos_errados_e_ignorado(self):
+        def forjar(valores):
+            payload = json.dumps({"d": "prox", "v": valores}).encode()
+            return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+        primeira = [n.pk for n in self.noticias[:3]]
+        for sort, valores in [
+            ("recentes", [1, 2]),
+            ("recentes", ["2025-01-01T00:00:00", 2]),  # sem fuso
+            ("recentes", [self.noticias[0].criado_em.isoformat(), "2"]),
+            ("populares", [{"a": 1}, 2]),
+            ("populares", [1.5, True]),
+        ]:
+            resp = self.client.get(reverse("noticias:index"), {"sort": sort, "cursor": forjar(valores)})
+            self.assertEqual(resp.status_code, 200)
+            if sort == "recentes":
+                self.assertEqual([n.pk for n in resp.context["noticias"]], primeira)
+            else:
+                self.assertEqual(len(resp.context["noticias"]), 3)
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class ConsultasFeedTests(TestCase):
+    """O feed deve custar um número fixo de consultas, independente do volume."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("aluno", password="12345678")
+        self.assuntos = [
+            Assunto.objects.create(nome=f"Assunto {i}", slug=f"assunto-{i}") for i in range(3)
+        ]
+
+    def _criar_noticias(self, quantidade):
+        inicio = Noticia.objects.count()
+        for i in range(quantidade):
+            n = Noticia.objects.create(titulo=f"N{inicio + i}", conteudo="x")
+            n.assuntos.add(*self.assuntos[: 1 + i % 3])
+            if i % 2:
+                Salvo.objects.create(usuario=self.user, noticia=n)
+            if i % 3 == 0:
+                Voto.objects.create(usuario=self.user, noticia=n, valor=1)
+
+    def _contar_consultas(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            resp = self.client.get(url)
+        self.assertEqual(resp.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_index_numero_fixo_de_consultas(self):
+        url = reverse("noticias:index")
+        self.client.force_login(self.user)
+
+        self._criar_noticias(3)
+        self.client.get(url)  # primeira visita calcula as recomendações
+        poucas = self._contar_consultas(url)
+        self._criar_noticias(12)
+        muitas = self._contar_consultas(url)
+        self.assertEqual(poucas, muitas)
+
+        self.client.logout()
+        anonimo = self._contar_consultas(url)
+        self._criar_noticias(5)
+        self.assertEqual(anonimo, self._contar_consultas(url))
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class RecomendacaoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("aluno", password="12345678")
+        self.client.force_login(self.user)
+        self.esporte = Assunto.objects.create(nome="Esporte", slug="esporte")
+        self.economia = Assunto.objects.create(nome="Economia", slug="economia")
+        self.lida = Noticia.objects.create(titulo="Lida", conteudo="x")
+        self.lida.assuntos.add(self.esporte)
+        self.afim = Noticia.objects.create(titulo="Afim", conteudo="x")
+        self.afim.assuntos.add(self.esporte)
+        self.outra = Noticia.objects.create(titulo="Outra", conteudo="x")
+        self.outra.assuntos.add(self.economia)
+
+    def _para_voce(self):
+        resp = self.client.get(reverse("noticias:index"))
+        return [n.pk for n in resp.context["recomendadas"]]
+
+    def test_primeira_visita_calcula_e_armazena(self):
+        self.assertEqual(set(self._para_voce()), {self.lida.pk, self.afim.pk, self.outra.pk})
+        self.assertEqual(Recomendacao.objects.filter(usuario=self.user).count(), 3)
+
+    def test_voto_atualiza_recomendacoes_do_usuario(self):
+        self._para_voce()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("noticias:votar", args=[self.lida.pk]), {"valor": 1}, **AJAX)
+
+        self.assertEqual(self._para_voce(), [self.afim.pk])
+        self.assertEqual(self.client.get(reverse("noticias:index")).context["recomendadas"][0].match_count, 1)
+
+    def test_voto_nao_recalcula_no_caminho_da_escrita(self):
+        self._para_voce()
+        with mock.patch.object(recomendacoes, "atualizar_para_usuario") as atualizar:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(reverse("noticias:votar", args=[self.lida.pk]), {"valor": 1}, **AJAX)
+                self.client.post(reverse("noticias:votar", args=[self.afim.pk]), {"valor": 1}, **AJAX)
+        atualizar.assert_not_called()
+        self.assertTrue(recomendacoes.desatualizadas(self.user.pk))
+
+        # a próxima leitura da home recalcula uma vez só
+        self.assertEqual(self._para_voce(), [self.outra.pk])
+        self.assertFalse(recomendacoes.desatualizadas(self.user.pk))
+
+    def test_comando_recalcula_em_lote(self):
+        Salvo.objects.create(usuario=self.user, noticia=self.lida)
+        call_command("recalcular_recomendacoes", stdout=StringIO())
+        self.assertEqual(
+            list(Recomendacao.objects.filter(usuario=self.user).values_list("noticia", flat=True)),
+            [self.afim.pk],
+        )
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class RankingPeriodoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = [
+            get_user_model().objects.create_user(f"u{i}", password="12345678") for i in range(3)
+        ]
+        self.a = Noticia.objects.create(titulo="A", conteudo="x")
+        self.b = Noticia.objects.create(titulo="B", conteudo="x")
+
+    def votar(self, user, noticia, valor):
+        self.client.force_login(user)
+        self.client.post(reverse("noticias:votar", args=[noticia.pk]), {"valor": valor}, **AJAX)
+
+    def test_rollup_acompanha_criacao_inversao_e_remocao(self):
+        self.votar(self.users[0], self.a, 1)
+        self.votar(self.users[1], self.a, 1)
+        self.votar(self.users[1], self.a, -1)   # inverte
+        self.votar(self.users[2], self.b, 1)
+        self.votar(self.users[2], self.b, 1)    # remove
+
+        balde = VotoDiario.objects.get(noticia=self.a)
+        self.assertEqual((balde.ups, balde.downs), (1, 1))
+        self.assertEqual(VotoDiario.objects.get(noticia=self.b).ups, 0)
+
+        top = ranking.top("24h")
+        self.assertEqual([n.pk for n in top], [self.a.pk])
+        self.assertEqual((top[0].score_periodo, top[0].ups_periodo, top[0].downs_periodo), (0, 1, 1))
+
+    def test_janelas_usam_dia_do_voto(self):
+        antigo = timezone.now() - timedelta(days=10)
+        for user in self.users:
+            Voto.objects.create(noticia=self.b, usuario=user, valor=1)
+        Voto.objects.filter(noticia=self.b).update(criado_em=antigo)
+        Voto.objects.create(noticia=self.a, usuario=self.users[0], valor=1)
+        VotoDiario.reconstruir()
+
+        self.assertEqual([n.pk for n in ranking.top("7d")], [self.a.pk])
+        self.assertEqual([n.pk for n in ranking.top("30d")], [self.b.pk, self.a.pk])
+
+    def test_index_mostra_ranking_do_periodo(self):
+        self.votar(self.users[0], self.a, 1)
+        resp = self.client.get(reverse("noticias:index"), {"periodo": "30d"})
+        self.assertEqual([n.pk for n in resp.context["top3"]], [self.a.pk])
+        self.assertContains(resp, "Top 3 do mês")
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class InvalidacaoCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("aluno", password="12345678")
+        self.client.force_login(self.user)
+        self.noticia = Noticia.objects.create(titulo="Primeira", conteudo="x")
+
+    def test_votos_invalidam_ranking_uma_vez_por_janela(self):
+        detalhe = reverse("noticias:noticia_detalhe", args=[self.noticia.pk])
+        self.assertEqual(self.client.get(detalhe).context["up"], 0)
+        self.assertEqual(self.client.get(reverse("noticias:index")).context["top3"], [])
+        recentes = cache_noticias.geracao("feed_recentes")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("noticias:votar", args=[self.noticia.pk]), {"valor": 1}, **AJAX)
+
+        self.assertEqual(self.client.get(detalhe).context["up"], 1)
+        top3 = self.client.get(reverse("noticias:index")).context["top3"]
+        self.assertEqual([n.pk for n in top3], [self.noticia.pk])
+        self.assertEqual(cache_noticias.geracao("feed_recentes"), recentes)
+
+        # mais votos na mesma janela: só o detalhe é invalidado
+        geracoes = [cache_noticias.geracao(f) for f in ("ranking", "feed_populares", "paginas")]
+        outro = get_user_model().objects.create_user("outro", password="12345678")
+        self.client.force_login(outro)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("noticias:votar", args=[self.noticia.pk]), {"valor": 1}, **AJAX)
+        self.assertEqual(self.client.get(detalhe).context["up"], 2)
+        self.assertEqual([cache_noticias.geracao(f) for f in ("ranking", "feed_populares", "paginas")], geracoes)
+
+    def test_feed_cacheado_ate_alteracao_de_noticia(self):
+        self.client.get(reverse("noticias:index"))
+        nova = Noticia.objects.create(titulo="Segunda", conteudo="x")
+
+        with self.assertNumQueries(5):
+            # sessão, usuário, salvos do feed, salvos das recomendações e assuntos do filtro
+            resp = self.client.get(reverse("noticias:index"))
+        self.assertNotIn(nova.pk, [n.pk for n in resp.context["noticias"]])
+
+        cache_noticias.ao_alterar_noticia(nova.pk)
+        resp = self.client.get(reverse("noticias:index"))
+        self.assertEqual(resp.context["noticias"][0].pk, nova.pk)
+
+    def test_salvar_reflete_no_feed_cacheado(self):
+        self.client.get(reverse("noticias:index"))
+        self.client.post(reverse("noticias:toggle_salvo", args=[self.noticia.pk]), **AJAX)
+        resp = self.client.get(reverse("noticias:index"))
+        self.assertTrue(resp.context["noticias"][0].is_saved)
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class BuscaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.eleicoes = Noticia.objects.create(
+            titulo="Eleições municipais em Recife", conteudo="Candidatos debatem propostas."
+        )
+        self.economia = Noticia.objects.create(
+            titulo="Inflação recua", conteudo="Analistas comentam a eleição do novo presidente do banco."
+        )
+        self.esporte = Noticia.objects.create(titulo="Sport vence", conteudo="Jogo na Ilha do Retiro.")
+
+    def _buscar(self, q):
+        return [n.pk for n in self.client.get(reverse("noticias:busca"), {"q": q}).context["resultados"]]
+
+    def test_ignora_acentos_plural_e_prioriza_titulo(self):
+        self.assertEqual(self._buscar("eleicao"), [self.eleicoes.pk, self.economia.pk])
+        self.assertEqual(self._buscar("INFLAÇÕES"), [self.economia.pk])
+        self.assertEqual(self._buscar("xyzzy"), [])
+
+    def test_indice_acompanha_edicao_e_remocao(self):
+        self.esporte.titulo = "Sport vence clássico das eleições"
+        self.esporte.save()
+        self.assertIn(self.esporte.pk, self._buscar("eleições"))
+
+        self.eleicoes.delete()
+        self.assertNotIn(self.eleicoes.pk, self._buscar("eleições"))
+
+        busca.reindexar_tudo()
+        self.assertEqual(len(self._buscar("eleições")), 2)
+
+    def test_admin_usa_o_indice(self):
+        admin = get_user_model().objects.create_superuser("admin", password="12345678")
+        self.client.force_login(admin)
+        resp = self.client.get(reverse("admin:noticias_noticia_changelist"), {"q": "retiro"})
+        self.assertEqual([n.pk for n in resp.context["cl"].result_list], [self.esporte.pk])
+
+
+class ResumidorQuebrado:
+    def resumir(self, noticia):
+        raise RuntimeError("LLM indisponível")
+
+
+@override_settings(NOTICIAS_RESUMIDOR="noticias.resumo.ResumidorLocal", NOTICIAS_RESUMO_EAGER=False, CACHES=CACHE_TESTES)
+class FilaResumoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        resumo.registrar_worker()  # worker em --loop no ar
+        self.noticia = Noticia.objects.create(titulo="Teste", conteudo="Conteúdo")
+        self.url = reverse("noticias:resumir_noticia", args=[self.noticia.pk])
+
+    def test_post_enfileira_e_worker_processa(self):
+        resp = self.client.post(self.url)
+        self.assertEqual(resp.status_code, 202)
+        data = resp.json()
+        self.assertEqual(data["status"], "pendente")
+        # cliques repetidos reaproveitam a tarefa em aberto
+        self.assertEqual(self.client.post(self.url).json()["tarefa"], data["tarefa"])
+
+        call_command("processar_resumos", stdout=StringIO())
+
+        status = self.client.get(data["status_url"]).json()
+        self.assertEqual(status["status"], "concluida")
+        self.assertEqual(status["resumo"], resumo.FALLBACK_RESUMO)
+        self.noticia.refresh_from_db()
+        self.assertEqual(self.noticia.resumo, resumo.FALLBACK_RESUMO)
+
+    def test_tarefa_reservada_nao_e_pega_de_novo(self):
+        resumo.enfileirar(self.noticia)
+        self.assertIsNotNone(resumo.reservar_proxima())
+        self.assertIsNone(resumo.reservar_proxima())
+
+    def test_falha_do_resumidor_marca_tarefa(self):
+        tarefa = resumo.enfileirar(self.noticia)
+        resumo.processar_pendentes(resumidor=ResumidorQuebrado())
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, TarefaResumo.Status.FALHOU)
+        self.assertIn("erro", self.client.get(reverse("noticias:status_resumo", args=[tarefa.pk])).json())
+
+    @override_settings(GEMINI_API_KEY="chave")
+    def test_falha_do_gemini_nao_grava_resumo_e_permite_nova_tentativa(self):
+        modelo = mock.Mock()
+        modelo.generate_content.side_effect = RuntimeError("503")
+        with mock.patch.object(resumo, "_modelo_gemini", return_value=modelo):
+            tarefa = resumo.enfileirar(self.noticia)
+            resumo.processar_pendentes(resumidor=resumo.ResumidorGemini())
+        tarefa.refresh_from_db()
+        self.noticia.refresh_from_db()
+        self.assertEqual(tarefa.status, TarefaResumo.Status.FALHOU)
+        self.assertIsNone(self.noticia.resumo)
+        self.assertEqual(self.noticia.resumo_hash, "")
+        # a notícia continua sem resumo: um novo pedido volta à fila
+        self.assertEqual(self.client.post(self.url).status_code, 202)
+
+    @override_settings(NOTICIAS_RESUMO_EAGER=True)
+    def test_modo_eager_responde_com_resumo(self):
+        resp = self.client.post(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json(), {"status": "ok", "resumo": resumo.FALLBACK_RESUMO})
+
+    def test_sem_worker_processa_na_requisicao(self):
+        cache.delete(resumo.CHAVE_WORKER)
+        resp = self.client.post(self.url)
+        self.assertEqual(resp.json(), {"status": "ok", "resumo": resumo.FALLBACK_RESUMO})
+
+        # o worker em --loop renova o batimento e as tarefas voltam para a fila
+        with mock.patch("time.sleep", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command("processar_resumos", "--loop", stdout=StringIO())
+        self.assertTrue(resumo.worker_ativo())
+        outra = Noticia.objects.create(titulo="Outra", conteudo="Conteúdo")
+        self.assertEqual(self.client.post(reverse("noticias:resumir_noticia", args=[outra.pk])).status_code, 202)
+
+
+@override_settings(NOTICIAS_RESUMIDOR="noticias.resumo.ResumidorLocal", NOTICIAS_RESUMO_EAGER=False, CACHES=CACHE_TESTES)
+class CacheResumoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        resumo.registrar_worker()  # worker em --loop no ar
+        self.noticia = Noticia.objects.create(titulo="Teste", conteudo="Conteúdo")
+        self.url = reverse("noticias:resumir_noticia", args=[self.noticia.pk])
+        self.client.post(self.url)
+        resumo.processar_pendentes()
+
+    def test_texto_inalterado_devolve_resumo_guardado(self):
+        resp = self.client.post(self.url)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.json()["resumo"], resumo.FALLBACK_RESUMO)
+        self.assertEqual(TarefaResumo.objects.count(), 1)
+
+    def test_edicao_do_conteudo_gera_novo_resumo(self):
+        self.noticia.conteudo = "Conteúdo revisado"
+        self.noticia.save()
+        self.assertEqual(self.client.post(self.url).status_code, 202)
+
+    def test_forcar_so_vale_para_editores(self):
+        leitor = get_user_model().objects.create_user("leitor", password="12345678")
+        self.client.force_login(leitor)
+        self.assertEqual(self.client.post(self.url, {"forcar": "1"}).status_code, 200)
+
+        editor = get_user_model().objects.create_user("editor", password="12345678", is_staff=True)
+        self.client.force_login(editor)
+        resp = self.client.post(self.url, {"forcar": "1"})
+        self.assertEqual(resp.status_code, 202)
+        self.assertTrue(TarefaResumo.objects.get(pk=resp.json()["tarefa"]).forcar)
+
+
+class ResumidorInstavel:
+    """Falha na primeira chamada de cada notícia."""
+
+    def __init__(self):
+        self.chamadas = {}
+
+    def resumir(self, noticia):
+        self.chamadas[noticia.pk] = self.chamadas.get(noticia.pk, 0) + 1
+        if self.chamadas[noticia.pk] == 1:
+            raise RuntimeError("timeout")
+        return f"Resumo de {noticia.titulo}"
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class ResumirLoteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.noticias = [Noticia.objects.create(titulo=f"N{i}", conteudo="x") for i in range(5)]
+        em_dia = self.noticias[0]
+        em_dia.resumo = "Resumo antigo"
+        em_dia.resumo_hash = resumo.hash_resumo(em_dia)
+        em_dia.save()
+
+    def _rodar(self, *args):
+        call_command(
+            "resumir_lote", "--por-segundo", "0", "--espera-base", "0", "--lote", "2",
+            *args, stdout=StringIO(), stderr=StringIO(),
+        )
+
+    def test_resume_apenas_vazias_ou_desatualizadas(self):
+        self.noticias[1].resumo = "Resumo de outra versão"
+        self.noticias[1].save()
+        self._rodar("--resumidor", "noticias.resumo.ResumidorLocal")
+
+        atualizadas = {n.pk: n for n in Noticia.objects.all()}
+        self.assertEqual(atualizadas[self.noticias[0].pk].resumo, "Resumo antigo")
+        for n in self.noticias[1:]:
+            self.assertEqual(atualizadas[n.pk].resumo, resumo.FALLBACK_RESUMO)
+            self.assertTrue(resumo.resumo_atualizado(atualizadas[n.pk]))
+
+    def test_novas_tentativas_apos_falha(self):
+        instavel = ResumidorInstavel()
+        with mock.patch.object(resumo, "obter_resumidor", return_value=instavel):
+            self._rodar("--tentativas", "2")
+        self.assertEqual(Noticia.objects.get(pk=self.noticias[4].pk).resumo, "Resumo de N4")
+        self.assertEqual(set(instavel.chamadas.values()), {2})
+
+    @override_settings(GEMINI_API_KEY="chave")
+    def test_gemini_falha_e_depois_responde(self):
+        resposta = mock.Mock(text="Resumo gerado pelo Gemini depois de uma falha.")
+        modelo = mock.Mock()
+        modelo.generate_content.side_effect = [RuntimeError("503"), resposta] * 4
+        with mock.patch.object(resumo, "_modelo_gemini", return_value=modelo):
+            self._rodar("--resumidor", "noticias.resumo.ResumidorGemini", "--tentativas", "3", "--concorrencia", "1")
+        self.assertEqual(modelo.generate_content.call_count, 8)
+        self.assertFalse(resumo.desatualizadas().exists())
+        self.assertEqual(
+            set(Noticia.objects.exclude(pk=self.noticias[0].pk).values_list("resumo", flat=True)),
+            {resposta.text},
+        )
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class DetalheCondicionalTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("aluno", password="12345678")
+        self.noticia = Noticia.objects.create(titulo="Teste", conteudo="Conteúdo")
+        self.url = reverse("noticias:noticia_detalhe", args=[self.noticia.pk])
+
+    def test_logado_usa_uma_consulta_para_a_noticia(self):
+        Voto.objects.create(noticia=self.noticia, usuario=self.user, valor=-1)
+        Salvo.objects.create(noticia=self.noticia, usuario=self.user)
+        self.client.force_login(self.user)
+        with self.assertNumQueries(3):  # sessão, usuário, notícia anotada
+            resp = self.client.get(self.url)
+        self.assertEqual(resp.context["voto_usuario"], -1)
+        self.assertTrue(resp.context["is_saved"])
+
+    def test_anonimo_com_cache_quente_nao_consulta(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_etag_responde_304_ate_o_voto(self):
+        self.client.force_login(self.user)
+        resp = self.client.get(self.url)
+        etag = resp.headers["ETag"]
+        self.assertIn("Last-Modified", resp.headers)
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.client.post(reverse("noticias:votar", args=[self.noticia.pk]), {"valor": 1}, **AJAX)
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp.headers["ETag"], etag)
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class CachePaginaAnonimaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.noticia = Noticia.objects.create(titulo="Primeira", conteudo="x")
+        self.url = reverse("noticias:index") + "?sort=recentes"
+
+    def sem_csrf(self, conteudo):
+        # o token CSRF muda a cada resposta (mascarado), mesmo servida do cache
+        return cache_noticias._TOKEN_CSRF.sub(cache_noticias.MARCADOR_CSRF, conteudo)
+
+    def test_anonimo_recebe_copia_sem_consultas_ate_invalidar(self):
+        primeira = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            segunda = self.client.get(self.url)
+        self.assertEqual(self.sem_csrf(primeira.content), self.sem_csrf(segunda.content))
+
+        nova = Noticia.objects.create(titulo="Segunda manchete", conteudo="x")
+        self.assertNotContains(self.client.get(self.url), nova.titulo)
+        cache_noticias.ao_alterar_noticia(nova.pk)
+        self.assertContains(self.client.get(self.url), nova.titulo)
+
+    def test_filtros_fazem_parte_da_chave(self):
+        self.client.get(self.url)
+        resp = self.client.get(reverse("noticias:index") + "?sort=populares")
+        self.assertIsNotNone(resp.context)
+
+    def test_logado_nao_usa_cache(self):
+        self.client.get(self.url)
+        self.client.force_login(get_user_model().objects.create_user("aluno", password="12345678"))
+        self.assertIsNotNone(self.client.get(self.url).context)
+
+    def test_copia_expirada_e_servida_enquanto_outro_worker_recalcula(self):
+        self.client.get(self.url)
+        chave = cache_noticias.chave_pagina(RequestFactory().get(self.url))
+        entrada = cache.get(chave)
+        entrada["expira"] = 0
+        cache.set(chave, entrada)
+        cache.add(f"{chave}:lock", 1)  # outro worker está recalculando
+
+        with self.assertNumQueries(0):
+            resp = self.client.get(self.url)
+        self.assertEqual(self.sem_csrf(resp.content), entrada["conteudo"])
+
+    def test_votos_invalidam_o_feed_uma_vez_por_janela(self):
+        detalhe = reverse("noticias:noticia_detalhe", args=[self.noticia.pk])
+        self.client.get(self.url)
+        cache_noticias.ao_votar(self.noticia.pk, None)
+        self.assertIsNotNone(self.client.get(self.url).context)
+        antigo = self.sem_csrf(self.client.get(detalhe).content)
+
+        # outro voto na mesma janela: o feed fica, só o detalhe é invalidado
+        cache_noticias.ao_votar(self.noticia.pk, None)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+        # invalidada, a cópia velha é servida enquanto outro worker recalcula
+        cache.add(f"{cache_noticias.chave_pagina(RequestFactory().get(detalhe))}:lock", 1)
+        Noticia.objects.filter(pk=self.noticia.pk).update(upvotes=1, score=1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.sem_csrf(self.client.get(detalhe).content), antigo)
+
+        cache.delete("noticias:votos:coalescer")  # janela encerrada
+        cache_noticias.ao_votar(self.noticia.pk, None)
+        self.assertIsNotNone(self.client.get(self.url).context)
+
+    def test_token_csrf_e_de_cada_visitante(self):
+        detalhe = reverse("noticias:noticia_detalhe", args=[self.noticia.pk])
+        tokens = []
+        for _ in range(2):
+            cliente = Client(enforce_csrf_checks=True)
+            resp = cliente.get(detalhe)
+            token = re.search(r'name="csrf-token" content="(\w+)"', resp.content.decode()).group(1)
+            self.assertIn(settings.CSRF_COOKIE_NAME, resp.cookies)
+            # o token da página (cacheada ou não) vale com o cookie deste cliente
+            login = cliente.post(reverse("login"), {"username": "x", "password": "y", "csrfmiddlewaretoken": token})
+            self.assertEqual(login.status_code, 200)
+            tokens.append(token)
+        self.assertNotEqual(*tokens)
+        self.assertNotIn(tokens[0].encode(), cache.get(cache_noticias.chave_pagina(RequestFactory().get(detalhe)))["conteudo"])
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class InteracoesLoteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user("aluno", password="12345678")
+        self.client.force_login(self.user)
+        self.a = Noticia.objects.create(titulo="A", conteudo="x")
+        self.b = Noticia.objects.create(titulo="B", conteudo="x")
+        Voto.objects.create(noticia=self.b, usuario=self.user, valor=1)
+        call_command("recalcular_contadores", stdout=StringIO())
+        self.url = reverse("noticias:interacoes_lote")
+
+    def enviar(self, operacoes):
+        return self.client.post(self.url, json.dumps({"operacoes": operacoes}), content_type="application/json")
+
+    def test_aplica_lote_e_devolve_contadores(self):
+        resp = self.enviar([
+            {"tipo": "voto", "noticia": self.a.pk, "valor": 1},
+            {"tipo": "voto", "noticia": self.a.pk, "valor": -1},   # última vence
+            {"tipo": "voto", "noticia": self.b.pk, "valor": 0},
+            {"tipo": "salvo", "noticia": self.a.pk, "salvo": True},
+            {"tipo": "salvo", "noticia": 999999, "salvo": True},
+        ])
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertEqual(data["ignoradas"], [999999])
+        self.assertEqual(
+            data["noticias"][str(self.a.pk)],
+            {"up": 0, "down": 1, "score": -1, "voto_usuario": -1, "salvo": True},
+        )
+        self.assertEqual(data["noticias"][str(self.b.pk)]["up"], 0)
+        self.assertFalse(Voto.objects.filter(noticia=self.b).exists())
+
+    def test_reenviar_o_mesmo_lote_e_idempotente(self):
+        lote = [
+            {"tipo": "voto", "noticia": self.a.pk, "valor": 1},
+            {"tipo": "voto", "noticia": self.b.pk, "valor": -1},
+            {"tipo": "salvo", "noticia": self.b.pk, "salvo": True},
+        ]
+        primeira = self.enviar(lote).json()
+        self.assertEqual(self.enviar(lote).json(), primeira)
+        self.assertEqual(Salvo.objects.filter(usuario=self.user).count(), 1)
+        self.b.refresh_from_db()
+        self.assertEqual((self.b.upvotes, self.b.downvotes), (0, 1))
+
+    def test_payload_invalido(self):
+        self.assertEqual(self.enviar([{"tipo": "voto", "noticia": self.a.pk, "valor": 5}]).status_code, 400)
+        resp = self.client.post(self.url, "{", content_type="application/json")
+        self.assertEqual(resp.status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.enviar([]).status_code, 401)
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class VotoConcorrenteTests(LiveServerTestCase):
+    """Cliques simultâneos contra um servidor real (uma conexão por thread)."""
+
+    CSRF = "a" * 32
+
+    @classmethod
+    def setUpClass(cls):
+        # Em memória, o SQLite de testes é uma conexão só, repartida com o
+        # servidor: só esta classe passa para uma cópia em arquivo, para que
+        # cada thread do servidor tenha a própria conexão.
+        cls._memoria = connections["default"]
+        if cls._memoria.vendor == "sqlite" and cls._memoria.is_in_memory_db():
+            cls._pasta = tempfile.TemporaryDirectory()
+            arquivo = str(Path(cls._pasta.name) / "concorrencia.sqlite3")
+            cls._memoria.ensure_connection()
+            with sqlite3.connect(arquivo) as destino:
+                cls._memoria.connection.backup(destino)
+            destino.close()
+            cls._nome = cls._memoria.settings_dict["NAME"]
+            cls._memoria.settings_dict["NAME"] = arquivo
+            connections["default"] = connections.create_connection("default")
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if connections["default"] is not cls._memoria:
+            connections["default"].close()
+            cls._memoria.settings_dict["NAME"] = cls._nome
+            connections["default"] = cls._memoria
+            cls._pasta.cleanup()
+
+    def setUp(self):
+        cache.clear()
+        self.noticia = Noticia.objects.create(titulo="A", conteudo="x")
+        self.url = self.live_server_url + reverse("noticias:votar", args=[self.noticia.pk])
+
+    def cookie_de(self, user):
+        cliente = Client()
+        cliente.force_login(user)
+        return f"sessionid={cliente.cookies['sessionid'].value}; csrftoken={self.CSRF}"
+
+    def votar(self, cookie, valor):
+        req = urllib.request.Request(
+            self.url,
+            data=urllib.parse.urlencode({"valor": valor}).encode(),
+            headers={"Cookie": cookie, "X-CSRFToken": self.CSRF, "X-Requested-With": "XMLHttpRequest"},
+        )
+        try:
+            with urllib.request.urlopen(req, timeout=30) as resp:
+                return resp.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def assert_contadores_batem(self):
+        self.noticia.refresh_from_db()
+        esperado = (
+            Voto.objects.filter(noticia=self.noticia, valor=1).count(),
+            Voto.objects.filter(noticia=self.noticia, valor=-1).count(),
+        )
+        self.assertEqual((self.noticia.upvotes, self.noticia.downvotes), esperado)
+        self.assertEqual(self.noticia.score, esperado[0] - esperado[1])
+        return esperado
+
+    def test_usuarios_diferentes_em_paralelo(self):
+        User = get_user_model()
+        cookies = [self.cookie_de(User.objects.create_user(f"u{i}", password="x")) for i in range(12)]
+        valores = [1 if i % 3 else -1 for i in range(12)]
+        with ThreadPoolExecutor(max_workers=12) as pool:
+            status = list(pool.map(self.votar, cookies, valores))
+
+        self.assertEqual(status, [200] * 12)
+        self.assertEqual(self.assert_contadores_batem(), (8, 4))
+
+    def test_cliques_repetidos_do_mesmo_usuario(self):
+        cookie = self.cookie_de(get_user_model().objects.create_user("aluno", password="x"))
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            status = list(pool.map(lambda _: self.votar(cookie, 1), range(9)))
+
+        self.assertEqual(status, [200] * 9)
+        # Nove alternâncias a partir de "sem voto" terminam com o voto dado.
+        self.assertEqual(self.assert_contadores_batem(), (1, 0))
+        dia = VotoDiario.objects.get(noticia=self.noticia)
+        self.assertEqual((dia.ups, dia.downs), (1, 0))
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class ExplicarConsultasTests(TestCase):
+    def test_consultas_das_views_usam_indices(self):
+        out = StringIO()
+        call_command(
+            "explicar_consultas", "--semear", "500", "--usuarios", "30", "--votos-por-usuario", "15",
+            "--estrito", stdout=out,
+        )
+        self.assertIn("Nenhuma varredura completa", out.getvalue())
+        # a massa sintética é desfeita ao final
+        self.assertFalse(Noticia.objects.exists())
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_seed_e_benchmark_gravam_json(self):
+        call_command(
+            "seed_benchmark", "--usuarios", "15", "--noticias", "60", "--votos-por-usuario", "6",
+            stdout=StringIO(),
+        )
+        self.assertEqual(Noticia.objects.count(), 60)
+        # contadores e rollup batem com os votos gerados
+        n = Noticia.objects.order_by("-upvotes").first()
+        self.assertEqual(n.upvotes, Voto.objects.filter(noticia=n, valor=1).count())
+        self.assertEqual(
+            sum(VotoDiario.objects.values_list("ups", flat=True)), Voto.objects.filter(valor=1).count()
+        )
+
+        with tempfile.TemporaryDirectory() as tmp:
+            saida = Path(tmp) / "run.json"
+            call_command("benchmark", "--repeticoes", "2", "--aquecimento", "0", "--saida", str(saida), stdout=StringIO())
+            relatorio = json.loads(saida.read_text())
+
+        self.assertEqual(relatorio["volumes"]["noticias"], 60)
+        cenarios = relatorio["cenarios"]
+        self.assertIn("index populares 7d assunto", cenarios)
+        self.assertEqual(cenarios["detalhe logado"]["status"], [200])
+        self.assertLessEqual(cenarios["index recentes"]["p50_ms"], cenarios["index recentes"]["p95_ms"])
+        self.assertGreater(cenarios["minhas_salvas"]["consultas"], 0)
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class InstrumentacaoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        instrumentacao.histogramas.limpar()
+        Noticia.objects.create(titulo="A", conteudo="x")
+
+    def test_server_timing_e_histograma_por_view(self):
+        resp = self.client.get(reverse("noticias:index"))
+        timing = resp.headers["Server-Timing"]
+        self.assertRegex(timing, r'sql;dur=[\d.]+;desc="\d+ consultas"')
+        self.assertIn("tpl;dur=", timing)
+        self.assertIn("total;dur=", timing)
+
+        self.assertEqual(self.client.get(reverse("instrumentacao")).status_code, 302)  # só staff
+        staff = get_user_model().objects.create_user("staff", password="x", is_staff=True)
+        self.client.force_login(staff)
+        views = self.client.get(reverse("instrumentacao")).json()["views"]
+        self.assertEqual(views["noticias:index"]["requisicoes"], 1)
+        self.assertGreater(views["noticias:index"]["sql_media_consultas"], 0)
+        self.assertGreater(views["noticias:index"]["template_media_ms"], 0)
+
+    @override_settings(INSTRUMENTACAO_LIMITE_CONSULTAS=0)
+    def test_requisicao_acima_do_limite_gera_log(self):
+        with self.assertLogs("Brasa.instrumentacao", "WARNING") as logs:
+            self.client.get(reverse("noticias:index"))
+        dados = json.loads(logs.records[0].getMessage())
+        self.assertEqual(dados["evento"], "requisicao_lenta")
+        self.assertEqual(dados["view"], "noticias:index")
+        self.assertGreater(dados["sql_qtd"], 0)
+        self.assertTrue(dados["sql_mais_lenta"])
+
+
+def _png(largura=1600, altura=900):
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new("RGB", (largura, altura), (200, 30, 30)).save(buffer, "PNG")
+    return SimpleUploadedFile("foto.png", buffer.getvalue(), content_type="image/png")
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class VariantesImagemTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        override = override_settings(MEDIA_ROOT=self.media.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def arquivos(self):
+        return sorted(p.name for p in Path(self.media.name, "noticias").iterdir())
+
+    def test_upload_gera_variantes_e_feed_usa_srcset(self):
+        n = Noticia.objects.create(titulo="Com foto", conteudo="x", imagem=_png())
+        n.refresh_from_db()
+        self.assertEqual(n.imagem_variantes["larguras"], [160, 320, 720])
+        self.assertIn("foto.png.160w.webp", self.arquivos())
+        self.assertIn("foto.png.720w.jpg", self.arquivos())
+
+        html = self.client.get(reverse("noticias:index")).content.decode()
+        self.assertIn('type="image/webp"', html)
+        self.assertIn("foto.png.160w.webp 160w", html)
+        self.assertIn("/media/noticias/foto.png 1600w", html)
+        self.assertIn('sizes="72px"', html)
+        self.assertNotIn('src="/media/noticias/foto.png"', html)
+
+        # trocar a imagem remove as variantes da anterior
+        n.imagem = _png(200, 100)
+        n.save()
+        n.refresh_from_db()
+        self.assertEqual((n.imagem_variantes["largura"], n.imagem_variantes["larguras"]), (200, [160]))
+        self.assertNotIn("foto.png.720w.jpg", self.arquivos())
+
+    def test_nao_amplia_e_nao_mistura_extensoes(self):
+        icone = _png(100, 100)
+        icone.name = "icone.png"
+        pequena = Noticia.objects.create(titulo="Ícone", conteudo="x", imagem=icone)
+        pequena.refresh_from_db()
+        self.assertEqual(pequena.imagem_variantes["larguras"], [])
+        self.assertEqual([a for a in self.arquivos() if "w." in a], [])
+        html = self.client.get(reverse("noticias:noticia_detalhe", args=[pequena.pk])).content.decode()
+        self.assertIn(f'src="{pequena.imagem.url}"', html)
+
+        jpg = _png()
+        jpg.name = "foto.jpg"
+        Noticia.objects.create(titulo="JPEG", conteudo="x", imagem=jpg)
+        Noticia.objects.create(titulo="PNG", conteudo="x", imagem=_png())
+        self.assertIn("foto.jpg.160w.webp", self.arquivos())
+        self.assertIn("foto.png.160w.webp", self.arquivos())
+
+    def test_backfill_em_paralelo(self):
+        n = Noticia.objects.create(titulo="Antiga", conteudo="x", imagem=_png())
+        Noticia.objects.filter(pk=n.pk).update(imagem_variantes={})
+        for nome in self.arquivos():
+            if "w." in nome:
+                Path(self.media.name, "noticias", nome).unlink()
+
+        out = StringIO()
+        call_command("gerar_variantes_imagens", "--processos", "2", stdout=out)
+        self.assertIn("1 notícia(s); 0 falha(s)", out.getvalue())
+        n.refresh_from_db()
+        self.assertEqual(n.imagem_variantes["origem"], n.imagem.name)
+        self.assertEqual(len([a for a in self.arquivos() if "w." in a]), 6)
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class ExportacaoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = get_user_model().objects.create_user("staff", password="x", is_staff=True)
+        self.leitor = get_user_model().objects.create_user("leitor", password="x")
+        self.assunto = Assunto.objects.create(nome="Economia", slug="economia")
+        self.n = Noticia.objects.create(titulo="A, com vírgula", conteudo="x")
+        self.n.assuntos.add(self.assunto)
+        self.client.force_login(self.staff)
+        self.client.post(reverse("noticias:votar", args=[self.n.pk]), {"valor": 1})
+        Salvo.objects.create(usuario=self.leitor, noticia=self.n)
+
+    def baixar(self, tipo, **params):
+        resp = self.client.get(reverse("noticias:exportar", args=[tipo]), params)
+        self.assertTrue(resp.streaming)
+        return resp, b"".join(resp.streaming_content).decode()
+
+    def test_ndjson_de_noticias_com_contadores(self):
+        resp, corpo = self.baixar("noticias")
+        self.assertEqual(resp["Content-Type"], "application/x-ndjson; charset=utf-8")
+        linha = json.loads(corpo.splitlines()[0])
+        self.assertEqual(linha["id"], self.n.pk)
+        self.assertEqual((linha["upvotes"], linha["score"], linha["salvos"]), (1, 1, 1))
+        self.assertEqual(linha["assuntos"], ["economia"])
+
+    def test_csv_e_incremental(self):
+        resp, corpo = self.baixar("votos", formato="csv")
+        cabecalho, *linhas = corpo.splitlines()
+        self.assertEqual(cabecalho, "id,noticia_id,usuario_id,valor,criado_em,atualizado_em")
+        self.assertEqual(len(linhas), 1)
+
+        desde = resp["X-Exportacao-Inicio"]
+        self.assertEqual(self.baixar("salvos", desde=desde)[1], "")
+        Salvo.objects.create(usuario=self.staff, noticia=self.n)
+        novos = self.baixar("salvos", desde=desde)[1].splitlines()
+        self.assertEqual([json.loads(l)["usuario_id"] for l in novos], [self.staff.pk])
+
+        self.assertEqual(self.client.get(reverse("noticias:exportar", args=["x"])).status_code, 400)
+        self.client.force_login(self.leitor)
+        self.assertEqual(self.client.get(reverse("noticias:exportar", args=["votos"])).status_code, 302)
+
+    def test_comando(self):
+        out, err = StringIO(), StringIO()
+        call_command("exportar_dados", "noticias", "--formato", "csv", stdout=out, stderr=err)
+        self.assertIn('"A, com vírgula"', out.getvalue())
+        self.assertIn("--desde", err.getvalue())
+
+    def test_data_impossivel_e_rejeitada(self):
+        for desde in ("2025-13-01", "2025-02-30T10:00", "2025-01-01T25:00", "ontem"):
+            with self.subTest(desde=desde):
+                resp = self.client.get(reverse("noticias:exportar", args=["votos"]), {"desde": desde})
+                self.assertEqual(resp.status_code, 400)
+                with self.assertRaisesMessage(CommandError, "Data inválida"):
+                    call_command("exportar_dados", "votos", "--desde", desde, stdout=StringIO(), stderr=StringIO())
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class ImportacaoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(self.pasta.cleanup)
+        Assunto.objects.create(nome="Economia", slug="economia")
+
+    def arquivo(self, nome, conteudo):
+        caminho = Path(self.pasta.name) / nome
+        caminho.write_text(conteudo, encoding="utf-8")
+        return str(caminho)
+
+    def ndjson(self, n, **extra):
+        return "\n".join(
+            json.dumps({"titulo": f"Título {i}", "conteudo": f"texto {i}", "assuntos": ["economia", "Clima"], **extra})
+            for i in range(n)
+        )
+
+    def test_ndjson_deduplica_e_cria_assuntos(self):
+        Noticia.objects.create(titulo="Título 0", conteudo="texto 0")
+        linhas = self.ndjson(3) + "\n" + json.dumps({"titulo": "  título   1 ", "conteudo": "texto 1"}) + "\n{quebrado\n"
+        out = StringIO()
+        call_command("importar_noticias", self.arquivo("lote.ndjson", linhas), "--lote", "2", stdout=out)
+
+        self.assertIn("2 importadas, 2 duplicadas, 1 inválidas (de 5 lidas); 1 assuntos novos", out.getvalue())
+        self.assertEqual(Noticia.objects.count(), 3)
+        nova = Noticia.objects.get(titulo="Título 2")
+        self.assertEqual(sorted(nova.assuntos.values_list("slug", flat=True)), ["clima", "economia"])
+        self.assertIn(nova.pk, busca.buscar_ids("Título 2"))
+
+    def test_gravacao_concorrente_nao_duplica(self):
+        ids_assuntos = importacao.Importador._ids_assuntos
+
+        def outra_importacao_grava_antes(importador, pares):
+            # entre a checagem de duplicadas e o bulk_create
+            if not Noticia.objects.filter(titulo="Título 1").exists():
+                Noticia.objects.create(titulo="Título 1", conteudo="texto 1")
+            return ids_assuntos(importador, pares)
+
+        with mock.patch.object(importacao.Importador, "_ids_assuntos", outra_importacao_grava_antes):
+            importacao.Importador().importar(json.loads(linha) for linha in self.ndjson(2).splitlines())
+
+        self.assertEqual(Noticia.objects.filter(titulo="Título 1").count(), 1)
+        self.assertEqual(Noticia.objects.count(), 2)
+        self.assertIn(Noticia.objects.get(titulo="Título 0").pk, busca.buscar_ids("Título 0"))
+
+    def test_admin_recusa_noticia_repetida(self):
+        Noticia.objects.create(titulo="Título", conteudo="texto")
+        with self.assertRaisesMessage(ValidationError, "Já existe uma notícia"):
+            Noticia(titulo=" título ", conteudo="texto").full_clean()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Noticia.objects.create(titulo="Título", conteudo="texto")
+
+    def test_datas_e_assuntos_malformados_nao_abortam(self):
+        agora = timezone.now()
+        registros = [
+            {"titulo": "Data numérica", "conteudo": "a", "criado_em": 1700000000},
+            {"titulo": "Data impossível", "conteudo": "b", "criado_em": "2025-13-45T00:00"},
+            {"titulo": "Assunto em texto", "conteudo": "c", "assuntos": "Meio Ambiente"},
+            {"titulo": "Assuntos separados", "conteudo": "d", "assuntos": "economia|clima"},
+        ]
+        resultado = importacao.Importador().importar(registros)
+
+        self.assertEqual((resultado.importadas, resultado.invalidas), (3, 1))
+        self.assertGreaterEqual(Noticia.objects.get(titulo="Data impossível").criado_em, agora)
+        self.assertEqual(
+            list(Noticia.objects.get(titulo="Assunto em texto").assuntos.values_list("slug", flat=True)),
+            ["meio-ambiente"],
+        )
+        self.assertEqual(
+            sorted(Noticia.objects.get(titulo="Assuntos separados").assuntos.values_list("slug", flat=True)),
+            ["clima", "economia"],
+        )
+
+    def test_rss_e_csv(self):
+        rss = """<?xml version="1.0"?><rss><channel>
+            <item><title>Chuva no sul</title><description>&lt;p&gt;Alerta&lt;/p&gt;</description>
+            <category>Clima</category><pubDate>Mon, 06 Jan 2025 10:00:00 +0000</pubDate></item>
+        </channel></rss>"""
+        importacao.importar_arquivo(self.arquivo("feed.xml", rss))
+        n = Noticia.objects.get(titulo="Chuva no sul")
+        self.assertEqual((n.conteudo, n.criado_em.year), ("Alerta", 2025))
+
+        csv_ = "titulo,conteudo,assuntos\nPIB cresce,texto,economia|clima\n"
+        resultado = importacao.importar_arquivo(self.arquivo("lote.csv", csv_))
+        self.assertEqual((resultado.importadas, resultado.assuntos_criados), (1, 0))
+
+    def test_consultas_nao_crescem_com_o_lote(self):
+        def consultas(n, prefixo):
+            caminho = self.arquivo(f"{prefixo}.ndjson", self.ndjson(n).replace("Título", prefixo))
+            with CaptureQueriesContext(connection) as ctx:
+                importacao.importar_arquivo(caminho, tamanho_lote=1000)
+            return len([q for q in ctx.captured_queries if busca.TABELA not in q["sql"]])
+
+        consultas(1, "Z")  # cria o assunto "clima"
+        self.assertEqual(consultas(5, "A"), consultas(50, "B"))
+
+
+@override_settings(CACHES=CACHE_TESTES)
+class BufferVotosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(self.pasta.cleanup)
+        ajustes = override_settings(
+            NOTICIAS_VOTOS_BUFFER=True, NOTICIAS_VOTOS_BUFFER_DIR=self.pasta.name, NOTICIAS_VOTOS_BUFFER_FSYNC=False,
+        )
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        User = get_user_model()
+        self.ana, self.bia = User.objects.create_user("ana", password="x"), User.objects.create_user("bia", password="x")
+        self.n = Noticia.objects.create(titulo="Viral", conteudo="x")
+
+    def votar(self, user, valor):
+        c = Client()
+        c.force_login(user)
+        resp = c.post(reverse("noticias:votar", args=[self.n.pk]), {"valor": valor}, HTTP_X_REQUESTED_WITH="XMLHttpRequest")
+        return resp.json()
+
+    def contadores(self):
+        self.n.refresh_from_db()
+        return self.n.upvotes, self.n.downvotes, self.n.score
+
+    def test_resposta_otimista_e_descarga_coalescida(self):
+        self.assertEqual(self.votar(self.ana, 1), {"up": 1, "down": 0, "score": 1, "voto_usuario": 1})
+        self.votar(self.ana, 1)  # desfaz
+        self.assertEqual(self.votar(self.ana, -1)["voto_usuario"], -1)
+        self.assertEqual(self.votar(self.bia, 1), {"up": 1, "down": 1, "score": 0, "voto_usuario": 1})
+        self.assertFalse(Voto.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(buffer_votos.descarregar(), 2)
+        self.assertEqual(dict(Voto.objects.values_list("usuario__username", "valor")), {"ana": -1, "bia": 1})
+        self.assertEqual(self.contadores(), (1, 1, 0))
+        # clique depois da descarga parte do estado gravado
+        self.assertEqual(self.votar(self.ana, -1), {"up": 1, "down": 0, "score": 1, "voto_usuario": 0})
+        buffer_votos.descarregar()
+        self.assertEqual(self.contadores(), (1, 0, 1))
+
+    def test_queda_no_meio_da_descarga_nao_perde_nem_duplica(self):
+        self.votar(self.ana, 1)
+        self.votar(self.bia, -1)
+        with mock.patch.object(buffer_votos, "_aplicar_alvo", side_effect=RuntimeError("queda")):
+            with self.assertRaises(RuntimeError):
+                buffer_votos.descarregar()
+        self.assertFalse(Voto.objects.exists())
+        self.votar(self.ana, 1)  # chega durante a "queda": desfaz o voto da ana
+
+        # queda depois do commit e antes de apagar o .alvo.json: reaplicar não muda nada
+        aplicar = buffer_votos._aplicar_alvo
+
+        def aplicar_sem_apagar(caminho):
+            copia = Path(caminho).read_bytes()
+            total = aplicar(caminho)
+            Path(caminho).write_bytes(copia)
+            return total
+
+        with mock.patch.object(buffer_votos, "_aplicar_alvo", side_effect=aplicar_sem_apagar):
+            buffer_votos.descarregar()
+        buffer_votos.descarregar()
+
+        self.assertEqual(list(Voto.objects.values_list("usuario__username", "valor")), [("bia", -1)])
+        self.assertEqual(self.contadores(), (0, 1, -1))
+        self.assertEqual(list(Path(self.pasta.name).glob("lote-*")), [])
+
+    def test_queda_entre_gravar_alvo_e_apagar_cliques(self):
+        self.votar(self.ana, 1)
+        lote = buffer_votos._rotacionar()
+        cliques = lote.read_bytes()
+        buffer_votos._resolver(lote)
+        lote.write_bytes(cliques)  # o unlink do lote não chegou a acontecer
+
+        buffer_votos.descarregar()
+        self.assertEqual(list(Voto.objects.values_list("usuario__username", "valor")), [("ana", 1)])
+        self.assertEqual(self.contadores(), (1, 0, 1))
+        self.assertEqual(list(Path(self.pasta.name).glob("lote-*")), [])
+
+    def test_queda_antes_de_apagar_o_alvo_nao_desconta_deltas_duas_vezes(self):
+        self.votar(self.ana, 1)
+        unlink = os.unlink
+
+        def queda_no_alvo(caminho, *args, **kwargs):
+            if str(caminho).endswith(".alvo.json"):
+                raise OSError("queda")
+            return unlink(caminho, *args, **kwargs)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with mock.patch("os.unlink", side_effect=queda_no_alvo), self.assertRaises(OSError):
+                buffer_votos.descarregar()
+            buffer_votos.descarregar()
+
+        self.assertEqual(self.contadores(), (1, 0, 1))
+        # resposta otimista = banco + o clique novo, sem delta descontado a mais
+        self.assertEqual(self.votar(self.bia, 1), {"up": 2, "down": 0, "score": 2, "voto_usuario": 1})
+
+    def test_voto_pendente_no_cache_dispensa_o_banco(self):
+        self.votar(self.ana, 1)
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertEqual(buffer_votos.registrar(self.ana, self.n.pk, 1)["voto_usuario"], 0)
+        self.assertFalse([q for q in consultas.captured_queries if "noticias_voto" in q["sql"]])
+
+
+class ConfiguracaoBancoTests(TestCase):
+    def test_pragmas_do_sqlite_na_conexao(self):
+        with connection.cursor() as cursor:
+            valores = [cursor.execute(f"PRAGMA {p}").fetchone()[0] for p in ("journal_mode", "synchronous", "busy_timeout")]
+        # banco de testes em memória não tem WAL: o SQLite mantém o journal "memory"
+        journal = "memory" if connection.is_in_memory_db() else "wal"
+        self.assertEqual(valores, [journal, 1, 5000])
+
+    def test_database_url(self):
+        with mock.patch.dict("os.environ", {"DATABASE_URL": "postgres://u:s@db:5432/brasa"}):
+            banco_pg = banco.configurar("sqlite:///x.sqlite3", conn_max_age=600)
+        self.assertEqual((banco_pg["ENGINE"], banco_pg["NAME"], banco_pg["CONN_MAX_AGE"]), (
+            "django.db.backends.postgresql", "brasa", 600,
+        ))
+        self.assertNotIn("transaction_mode", banco_pg.get("OPTIONS", {}))
+        self.assertEqual(banco.configurar("sqlite:///x.sqlite3")["OPTIONS"], {"transaction_mode": "IMMEDIATE"})
+
+
+@override_settings(
+    DATABASE_REPLICAS=["replica_teste"],
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}},
+)
+class ReplicaLeituraTests(TransactionTestCase):
+    """Primário e réplica são dois arquivos SQLite; `sincronizar` faz o papel da replicação."""
+
+    databases = {"default", "replica_teste"}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.pasta = tempfile.TemporaryDirectory()
+        connections.settings["replica_teste"] = {
+            **connections["default"].settings_dict, "NAME": str(Path(cls.pasta.name) / "replica.sqlite3"),
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections["replica_teste"].close()
+        del connections.settings["replica_teste"]
+        del connections["replica_teste"]
+        cls.pasta.cleanup()
+
+    def sincronizar(self):
+        connections["replica_teste"].close()
+        origem = sqlite3.connect(connections["default"].settings_dict["NAME"])
+        destino = sqlite3.connect(connections["replica_teste"].settings_dict["NAME"])
+        with destino:
+            origem.backup(destino)
+        origem.close()
+        destino.close()
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("leitor", password="x")
+        self.n = Noticia.objects.create(titulo="Na réplica", conteudo="x")
+        self.sincronizar()
+        # só no primário: a réplica ainda não recebeu
+        Noticia.objects.filter(pk=self.n.pk).update(titulo="No primário")
+        self.detalhe = reverse("noticias:noticia_detalhe", args=[self.n.pk])
+
+    def test_feed_e_detalhe_leem_da_replica(self):
+        self.assertContains(self.client.get(reverse("noticias:index")), "Na réplica")
+        self.assertContains(self.client.get(self.detalhe), "Na réplica")
+        # views fora de REPLICA_VIEWS continuam no primário
+        self.assertContains(self.client.get(reverse("noticias:busca"), {"q": "x"}), "No primário")
+
+    def test_quem_votou_le_do_primario(self):
+        self.client.force_login(self.user)
+        resp = self.client.post(reverse("noticias:votar", args=[self.n.pk]), {"valor": 1})
+        self.assertIn(replicas.REPLICA_COOKIE, resp.cookies)
+        self.assertContains(self.client.get(self.detalhe), "No primário")
+
+        self.client.cookies.pop(replicas.REPLICA_COOKIE)
+        self.assertContains(self.client.get(self.detalhe), "Na réplica")
+
+    def test_replica_fora_do_ar_cai_no_primario(self):
+        with override_settings(DATABASE_REPLICAS=["replica_teste", "inexistente"]):
+            self.assertEqual(replicas.replicas(), ["replica_teste"])
+        Path(connections["replica_teste"].settings_dict["NAME"]).unlink()
+        connections["replica_teste"].close()
+        with mock.patch.dict(connections["replica_teste"].settings_dict, {"NAME": "/inexistente/r.sqlite3"}):
+            self.assertContains(self.client.get(self.detalhe), "No primário")
+        replicas._fora_ate.clear()
+
+
+@override_settings(NOTICIAS_AO_VIVO_HEARTBEAT=0.05, CACHES=CACHE_TESTES)
+class ContadoresAoVivoTests(TestCase):
+    def setUp(self):
+        self.n = Noticia.objects.create(titulo="Ao vivo", conteudo="x", upvotes=2, score=2)
+        self.url = reverse("noticias:ao_vivo", args=[self.n.pk])
+
+    async def proximo(self, corpo):
+        return (await asyncio.wait_for(anext(corpo), timeout=2)).decode()
+
+    async def test_stream_recebe_votos_de_outros_leitores(self):
+        resp = await self.async_client.get(self.url)
+        self.assertEqual(resp["Content-Type"], "text/event-stream")
+        corpo = aiter(resp.streaming_content)
+        self.assertIn('data: {"up": 2, "down": 0, "score": 2}', await self.proximo(corpo))
+        self.assertEqual(ao_vivo.conexoes(), 1)
+
+        # vários votos antes de o leitor consumir: só o estado mais recente é entregue
+        for up in range(3, 13):
+            await sync_to_async(ao_vivo.publicar)(self.n.pk, {"up": up, "down": 1, "score": up - 1, "voto_usuario": 1})
+        self.assertEqual(await self.proximo(corpo), 'event: contadores\ndata: {"up": 12, "down": 1, "score": 11}\n\n')
+        self.assertEqual(await self.proximo(corpo), ": ping\n\n")
+        # cliente desconectou: o servidor cancela a tarefa que espera o próximo evento
+        tarefa = asyncio.ensure_future(anext(corpo))
+        await asyncio.sleep(0.01)
+        tarefa.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await tarefa
+        self.assertEqual(ao_vivo.conexoes(), 0)
+
+    async def test_limite_de_conexoes_e_wsgi(self):
+        with override_settings(NOTICIAS_AO_VIVO_MAX_CONEXOES=0):
+            self.assertEqual((await self.async_client.get(self.url)).status_code, 503)
+        self.assertEqual((await self.async_client.get(reverse("noticias:ao_vivo", args=[999]))).status_code, 404)
+        self.assertEqual((await sync_to_async(self.client.get)(self.url)).status_code, 204)
+
+    def test_votar_publica_os_contadores(self):
+        self.client.force_login(get_user_model().objects.create_user("leitor", password="x"))
+        with mock.patch.object(ao_vivo, "publicar") as publicar:
+            self.client.post(reverse("noticias:votar", args=[self.n.pk]), {"valor": -1}, **AJAX)
+        publicar.assert_called_once_with(self.n.pk, {"up": 2, "down": 1, "score": 1, "voto_usuario": -1})
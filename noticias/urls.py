@@ -6,12 +6,17 @@ app_name = 'noticias'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('busca/', views.busca, name='busca'),
     path('noticia/<int:pk>/', views.noticia_detalhe, name='noticia_detalhe'),
     path('noticia/<int:pk>/votar/', views.votar, name='votar'),
+    path('noticia/<int:pk>/ao-vivo/', views.contadores_ao_vivo, name='ao_vivo'),
     path('accounts/signup/', views.signup, name='signup'),
     path("salvos/", views.minhas_salvas, name="salvos"),
     path("noticia/<int:pk>/salvar/", views.toggle_salvo, name="toggle_salvo"),
     path('noticia/<int:pk>/resumir/', views.resumir_noticia, name='resumir_noticia'),
+    path('resumos/tarefa/<int:pk>/', views.status_resumo, name='status_resumo'),
+    path('api/interacoes/', views.interacoes_lote, name='interacoes_lote'),
+    path('exportar/<str:tipo>/', views.exportar, name='exportar'),
 ]
 
 # 🔐 Somente em ambiente de desenvolvimento/teste (DEBUG=True)
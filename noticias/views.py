@@ -1,86 +1,94 @@
+import hashlib
+import json
 from datetime import timedelta
 from django.contrib import messages
 from django.contrib.auth import authenticate, login as auth_login, get_user_model
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
-from django.core.cache import cache
+from django.db import transaction
 from django.db.models import (
     Sum, Case, When, IntegerField, Exists, OuterRef, Value, BooleanField
 )
-from django.db.models import Sum, Case, When, IntegerField, Exists, OuterRef, Value, BooleanField, Q, Count
-from django.http import JsonResponse, HttpResponseForbidden
+from django.db.models import Sum, Case, When, IntegerField, Exists, OuterRef, Value, BooleanField, Q, Count, Subquery
+from django.db.models.functions import Coalesce
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse, HttpResponseForbidden, HttpResponseNotAllowed
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
 from django.shortcuts import render, get_object_or_404, redirect
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
-from .models import Noticia, Voto, Assunto, Salvo
-import google.generativeai as genai
+from .models import Noticia, Voto, Assunto, Salvo, TarefaResumo
+from .paginacao import paginar_keyset
+from . import (
+    ao_vivo, buffer_votos, busca as busca_textual, cache as cache_noticias, exportacao, interacoes, ranking, recomendacoes,
+    resumo,
+)
+
+
+# ==============================================
+# CARDS — dados que cada card do feed precisa
+# ==============================================
+def _com_estado_do_card(qs):
+    """Pré-carrega os assuntos, para que os chips não façam consultas por card."""
+    return qs.prefetch_related("assuntos")
+
+
+def _marcar_salvos(itens, user):
+    """
+    Define `is_saved` (usado por _salvar_btn.html) em cada item com uma única
+    consulta. Fica fora do cache, que é compartilhado entre usuários.
+    """
+    salvos = set()
+    if user.is_authenticated and itens:
+        salvos = set(
+            Salvo.objects.filter(usuario=user, noticia_id__in=[n.pk for n in itens])
+            .values_list("noticia_id", flat=True)
+        )
+    for n in itens:
+        n.is_saved = n.pk in salvos
+    return itens
 
 
 # ==============================================
-# RECOMENDAÇÃO — helper simples por afinidade
+# RECOMENDAÇÃO — lidas da tabela pré-calculada
 # ==============================================
 def _recomendadas_para_usuario(user, limite=10):
     if not user.is_authenticated:
         return Noticia.objects.none()
 
-    # vistos (votados ou salvos) para evitar recomendar o mesmo
-    vistos_ids = Noticia.objects.filter(
-        Q(votos__usuario=user) | Q(salvo__usuario=user)
-    ).values_list("id", flat=True).distinct()
-
-    # sinais (assuntos curtidos/salvos)
-    assuntos_like = Voto.objects.filter(usuario=user, valor=1)\
-                                .values_list("noticia__assuntos", flat=True)
-    assuntos_salvos = Salvo.objects.filter(usuario=user)\
-                                   .values_list("noticia__assuntos", flat=True)
-
-    assuntos_ids = [a for a in list(assuntos_like) + list(assuntos_salvos) if a]
-
-    # (A) afinidade por assuntos
-    if assuntos_ids:
-        qs = (
-            Noticia.objects.exclude(id__in=vistos_ids)
-            .filter(assuntos__in=assuntos_ids)
-            .annotate(
-                match_count=Count("assuntos", filter=Q(assuntos__in=assuntos_ids), distinct=True),
-                score=Sum("votos__valor"),
-            )
-            .order_by("-match_count", "-score", "-criado_em")
-            .distinct()[:limite]
-        )
-        if qs.exists():
-            return qs.annotate(
-                is_saved=Exists(Salvo.objects.filter(usuario=user, noticia=OuterRef("pk")))
-            )
-
-    # (B) fallback: populares recentes
-    semana = timezone.now() - timedelta(days=7)
-    qs_pop = (
-        Noticia.objects.exclude(id__in=vistos_ids)
-        .filter(criado_em__gte=semana)
-        .annotate(score=Sum("votos__valor"))
-        .order_by("-score", "-criado_em")
-        .distinct()[:limite]
+    def _calcular():
+        # lê as recomendações pré-calculadas; na primeira visita (ou depois
+        # de um voto/salvo) recalcula na hora
+        qs = _com_estado_do_card(recomendacoes.recomendadas(user, limite))
+        itens = list(qs)
+        if not itens or recomendacoes.desatualizadas(user.pk):
+            itens = list(qs.all()) if recomendacoes.atualizar_para_usuario(user) else []
+        return itens
+
+    itens = cache_noticias.obter_ou_calcular(
+        cache_noticias.chave_recomendacoes(user.pk), _calcular, cache_noticias.TTL_RECOMENDACOES
     )
-    if qs_pop.exists():
-        return qs_pop.annotate(
-            is_saved=Exists(Salvo.objects.filter(usuario=user, noticia=OuterRef("pk")))
-        )
+    return _marcar_salvos(itens, user)
 
-    # (C) fallback final: últimas
-    qs_recent = (
-        Noticia.objects.exclude(id__in=vistos_ids)
-        .order_by("-criado_em")
-        .distinct()[:limite]
-    )
-    return qs_recent.annotate(
-        is_saved=Exists(Salvo.objects.filter(usuario=user, noticia=OuterRef("pk")))
-    )
 
 # ==============================================
 # PÁGINA INICIAL / FEED
 # ==============================================
+def _querystring_cursor(request, cursor):
+    """Querystring atual (assunto/periodo/sort) trocando apenas o cursor."""
+    if not cursor:
+        return ""
+    params = request.GET.copy()
+    params["cursor"] = cursor
+    return params.urlencode()
+
+
+@cache_noticias.cache_pagina_anonima()
 def index(request):
     noticias = Noticia.objects.all()
     assuntos = Assunto.objects.all()
@@ -98,70 +106,139 @@ def index(request):
         noticias = noticias.filter(criado_em__gte=since)
 
     if sort == "populares":
-        noticias = noticias.annotate(score=Sum("votos__valor")).order_by("-score", "-criado_em")
-    else:
-        noticias = noticias.order_by("-criado_em")
-
-    if request.user.is_authenticated:
-        noticias = noticias.annotate(
-            is_saved=Exists(
-                Salvo.objects.filter(usuario=request.user, noticia=OuterRef("pk"))
-            )
-        )
+        # score com decaimento, materializado e indexado (noticia_quente_idx)
+        chaves = ["score_quente", "id"]
     else:
-        noticias = noticias.annotate(is_saved=Value(False, output_field=BooleanField()))
-
-    top3 = cache.get("top3_semana")
-    if top3 is None:
-        semana = timezone.now() - timedelta(days=7)
-        top3_qs = (
-            Noticia.objects.filter(votos__criado_em__gte=semana)
-            .annotate(
-                score_semanal=Sum("votos__valor"),
-                ups_semana=Sum(Case(When(votos__valor=1, then=1), default=0, output_field=IntegerField())),
-                downs_semana=Sum(Case(When(votos__valor=-1, then=1), default=0, output_field=IntegerField())),
-            )
-            .order_by("-score_semanal", "-ups_semana", "-criado_em")[:3]
-        )
-        top3 = list(top3_qs)
-        cache.set("top3_semana", top3, 300)
+        chaves = ["criado_em", "id"]
+
+    cursor = request.GET.get("cursor")
+    pagina = cache_noticias.obter_ou_calcular(
+        cache_noticias.chave_feed(sort, periodo, selecionados, cursor),
+        lambda: paginar_keyset(
+            _com_estado_do_card(noticias),
+            chaves,
+            cursor=cursor,
+            tamanho=getattr(settings, "NOTICIAS_POR_PAGINA", 20),
+        ),
+        cache_noticias.TTL_FEED,
+    )
+    _marcar_salvos(pagina.itens, request.user)
+
+    # ranking do período filtrado (padrão: semana), lido do rollup VotoDiario
+    janela = periodo if periodo in ranking.JANELAS else "7d"
+    top3 = cache_noticias.obter_ou_calcular(
+        cache_noticias.chave_ranking(janela, 3),
+        lambda: ranking.top(janela, limite=3),
+        cache_noticias.TTL_RANKING,
+    )
 
     # ===== NOVO: bloco de recomendadas por afinidade
     recomendadas = _recomendadas_para_usuario(request.user, limite=8)
 
     ctx = {
-        "noticias": noticias,
+        "noticias": pagina.itens,
+        "pagina_proxima_qs": _querystring_cursor(request, pagina.cursor_proximo),
+        "pagina_anterior_qs": _querystring_cursor(request, pagina.cursor_anterior),
         "assuntos": assuntos,
         "selecionados": selecionados,
         "periodo": periodo or "",
         "sort": sort,
         "top3": top3,
+        "top3_titulo": ranking.TITULOS[janela],
         "recomendadas": recomendadas,  # <= NOVO
     }
     return render(request, "noticias/index.html", ctx)
 
 
+# ==============================================
+# BUSCA
+# ==============================================
+RESULTADOS_POR_PAGINA = 20
+
+
+def busca(request):
+    q = (request.GET.get("q") or "").strip()
+    try:
+        pagina = max(int(request.GET.get("pagina", 1)), 1)
+    except ValueError:
+        pagina = 1
+
+    resultados = []
+    if q:
+        # busca uma a mais para saber se existe próxima página
+        offset = (pagina - 1) * RESULTADOS_POR_PAGINA
+        resultados = busca_textual.buscar(q, limite=RESULTADOS_POR_PAGINA + 1, offset=offset)
+    tem_proxima = len(resultados) > RESULTADOS_POR_PAGINA
+    resultados = _marcar_salvos(resultados[:RESULTADOS_POR_PAGINA], request.user)
+
+    ctx = {
+        "q": q,
+        "resultados": resultados,
+        "pagina": pagina,
+        "pagina_anterior": pagina - 1 if pagina > 1 else None,
+        "pagina_proxima": pagina + 1 if tem_proxima else None,
+    }
+    return render(request, "noticias/busca.html", ctx)
+
+
 # ==============================================
 # DETALHE DE NOTÍCIA
 # ==============================================
+def _detalhe_do_usuario(pk, user):
+    """
+    Notícia + voto e estado "salvo" do usuário numa única consulta.
+    Os contadores já são colunas da própria notícia.
+    """
+    qs = Noticia.objects.annotate(
+        voto_usuario=Coalesce(
+            Subquery(Voto.objects.filter(noticia=OuterRef("pk"), usuario=user).values("valor")[:1]),
+            0,
+        ),
+        is_saved=Exists(Salvo.objects.filter(noticia=OuterRef("pk"), usuario=user)),
+    )
+    return get_object_or_404(qs, pk=pk)
+
+
+def _etag_detalhe(noticia, user):
+    partes = [
+        noticia.pk, noticia.atualizado_em.isoformat(), noticia.score, noticia.upvotes,
+        noticia.downvotes, noticia.resumo_hash, user.pk or 0, noticia.voto_usuario, noticia.is_saved,
+    ]
+    return hashlib.sha1(repr(partes).encode()).hexdigest()
+
+
+@cache_noticias.cache_pagina_anonima()
 def noticia_detalhe(request, pk):
-    noticia = get_object_or_404(Noticia, pk=pk)
-    voto_usuario = None
     if request.user.is_authenticated:
-        voto_usuario = Voto.objects.filter(noticia=noticia, usuario=request.user).first()
-        is_saved = noticia.salvos.filter(pk=request.user.pk).exists()
+        noticia = _detalhe_do_usuario(pk, request.user)
     else:
-        is_saved = False
-
-    ctx = {
-        "noticia": noticia,
-        "score": noticia.score(),
-        "up": noticia.upvotes(),
-        "down": noticia.downvotes(),
-        "voto_usuario": voto_usuario.valor if voto_usuario else 0,
-        "is_saved": is_saved,
-    }
-    return render(request, "noticias/detalhe.html", ctx)
+        # anônimos: a notícia vem do cache (nenhuma consulta quando quente)
+        noticia = cache_noticias.obter_ou_calcular(
+            cache_noticias.chave_detalhe(pk),
+            lambda: get_object_or_404(Noticia, pk=pk),
+            cache_noticias.TTL_DETALHE,
+        )
+        noticia.voto_usuario = 0
+        noticia.is_saved = False
+
+    # GET condicional: se nada mudou para este leitor, 304 sem renderizar
+    etag = quote_etag(_etag_detalhe(noticia, request.user))
+    ultima_modificacao = int(noticia.atualizado_em.timestamp())
+    resposta = get_conditional_response(request, etag=etag, last_modified=ultima_modificacao)
+    if resposta is None:
+        ctx = {
+            "noticia": noticia,
+            "score": noticia.score,
+            "up": noticia.upvotes,
+            "down": noticia.downvotes,
+            "voto_usuario": noticia.voto_usuario,
+            "is_saved": noticia.is_saved,
+        }
+        resposta = render(request, "noticias/detalhe.html", ctx)
+        resposta.headers["Last-Modified"] = http_date(ultima_modificacao)
+    resposta.headers["ETag"] = etag
+    patch_cache_control(resposta, no_cache=True, private=request.user.is_authenticated)
+    return resposta
 
 
 # ==============================================
@@ -183,34 +260,67 @@ def votar(request, pk):
         messages.error(request, "Voto inválido.")
         return redirect("noticias:noticia_detalhe", pk=pk)
 
-    voto, created = Voto.objects.get_or_create(
-        noticia=noticia,
-        usuario=request.user,
-        defaults={"valor": valor},
-    )
-
-    if created:
-        current = valor
+    if buffer_votos.ativo():
+        estado = buffer_votos.registrar(request.user, noticia.pk, valor)
     else:
-        if voto.valor == valor:
-            voto.delete()
-            current = 0
-        else:
-            voto.valor = valor
-            voto.save()
-            current = valor
+        estado = interacoes.alternar_voto(request.user, noticia.pk, valor, criado_em=noticia.criado_em)
+    ao_vivo.publicar(noticia.pk, estado)
 
     if request.headers.get("x-requested-with") == "XMLHttpRequest":
-        return JsonResponse({
-            "up": noticia.upvotes(),
-            "down": noticia.downvotes(),
-            "score": noticia.score(),
-            "voto_usuario": current,
-        })
+        return JsonResponse(estado)
 
     return redirect("noticias:noticia_detalhe", pk=pk)
 
 
+async def contadores_ao_vivo(request, pk):
+    """
+    SSE com os contadores da notícia (ver noticias.ao_vivo). Só sob ASGI:
+    no WSGI cada conexão prenderia um worker, então responde 204 e o
+    EventSource desiste sem reconectar.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    contadores = await Noticia.objects.filter(pk=pk).values("upvotes", "downvotes", "score").afirst()
+    if contadores is None:
+        raise Http404
+    if ao_vivo.lotado():
+        resp = HttpResponse("Muitas conexões ao vivo neste servidor.", status=503)
+        resp["Retry-After"] = "30"
+        return resp
+
+    inicial = {"up": contadores["upvotes"], "down": contadores["downvotes"], "score": contadores["score"]}
+    resp = StreamingHttpResponse(ao_vivo.eventos(pk, inicial), content_type="text/event-stream")
+    resp["Cache-Control"] = "no-cache"
+    resp["X-Accel-Buffering"] = "no"
+    return resp
+
+
+# ==============================================
+# API — interações em lote (clientes offline/móveis)
+# ==============================================
+def interacoes_lote(request):
+    """
+    POST JSON {"operacoes": [...]} (formato em noticias.interacoes).
+    Responde com os contadores e o estado do usuário em cada notícia tocada.
+    """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+    if not request.user.is_authenticated:
+        return JsonResponse({"error": "Autenticação necessária."}, status=401)
+
+    try:
+        payload = json.loads(request.body or b"{}")
+        resultado = interacoes.aplicar_lote(request.user, payload.get("operacoes"))
+    except (ValueError, AttributeError) as e:
+        # LoteInvalido é ValueError; JSON malformado também
+        mensagem = str(e) if isinstance(e, interacoes.LoteInvalido) else "JSON inválido."
+        return JsonResponse({"error": mensagem}, status=400)
+
+    for nid, estado in resultado["noticias"].items():
+        ao_vivo.publicar(int(nid), estado)
+    return JsonResponse(resultado)
+
+
 # ==============================================
 # CADASTRO / LOGIN
 # ==============================================
@@ -245,8 +355,8 @@ def signup(request):
 def minhas_salvas(request):
     noticias = (
         Noticia.objects.filter(salvo__usuario=request.user)
+        .annotate(is_saved=Value(True, output_field=BooleanField()))
         .order_by("-salvo__criado_em")
-        .distinct()
     )
     return render(request, "noticias/noticias_salvas.html", {"noticias": noticias})
 
@@ -270,6 +380,9 @@ def toggle_salvo(request, pk):
         label = "Retirar de Ver mais tarde"
         msg = "Salvo para ler mais tarde."
 
+    recomendacoes.marcar_desatualizadas(request.user.pk)
+    cache_noticias.ao_salvar(noticia.pk, request.user.pk)
+
     if request.headers.get("x-requested-with") == "XMLHttpRequest":
         return JsonResponse({"saved": saved, "label": label})
 
@@ -279,54 +392,80 @@ def toggle_salvo(request, pk):
 
 
 # ==============================================
-# RESUMIR NOTÍCIA — versão híbrida (Gemini + fallback)
+# RESUMIR NOTÍCIA — fila de tarefas (Gemini no worker)
 # ==============================================
+def _tarefa_json(tarefa):
+    data = {
+        "status": tarefa.status,
+        "tarefa": tarefa.pk,
+        "status_url": reverse("noticias:status_resumo", args=[tarefa.pk]),
+    }
+    if tarefa.status == TarefaResumo.Status.CONCLUIDA:
+        data["resumo"] = tarefa.resumo
+    elif tarefa.status == TarefaResumo.Status.FALHOU:
+        data["erro"] = "Não foi possível gerar o resumo."
+    return data
+
+
 @csrf_exempt
 def resumir_noticia(request, pk):
     """
-    Gera ou atualiza o resumo da notícia e garante persistência no banco.
-    Usa Gemini se disponível; se falhar ou não houver chave, usa um fallback local.
-    Retorna JSON com {"status":"ok","resumo":"..."}.
+    Enfileira o resumo da notícia e responde 202 com o id da tarefa e a URL
+    de status (consultada por resumo.js). O resumo em si é gerado pelo
+    worker `manage.py processar_resumos --loop`.
+    Com NOTICIAS_RESUMO_EAGER=True (testes/dev sem worker), ou sem batimento
+    recente do worker (ver resumo.worker_ativo), processa na hora e retorna
+    {"status":"ok","resumo":"..."}.
+    Se título e conteúdo não mudaram desde o último resumo, devolve o resumo
+    guardado na hora; editores (staff) podem mandar forcar=1 para refazer.
     """
+    if request.method != "POST":
+        return HttpResponseNotAllowed(["POST"])
+
     noticia = get_object_or_404(Noticia, pk=pk)
-    api_key = getattr(settings, "GEMINI_API_KEY", None)
+    forcar = request.user.is_staff and request.POST.get("forcar") in ("1", "true")
 
-    fallback_resumo = (
-        "Resumo gerado automaticamente para testes E2E BRASA. "
-        "Este texto é usado apenas para validação de interface e integração."
-    )
+    if not forcar and resumo.resumo_atualizado(noticia):
+        return JsonResponse({"status": "ok", "resumo": noticia.resumo})
+
+    tarefa = resumo.enfileirar(noticia, forcar=forcar)
+
+    if getattr(settings, "NOTICIAS_RESUMO_EAGER", False) or not resumo.worker_ativo():
+        resumo.processar_pendentes()
+        tarefa.refresh_from_db()
+        if tarefa.status != TarefaResumo.Status.CONCLUIDA:
+            return JsonResponse(_tarefa_json(tarefa))
+        return JsonResponse({"status": "ok", "resumo": tarefa.resumo})
 
-    resumo_final = None
-
-    if api_key:
-        try:
-            import google.generativeai as genai
-            genai.configure(api_key=api_key)
-            model = genai.GenerativeModel("gemini-flash-latest")
-
-            prompt = f"""
-            Você é um assistente de jornalismo. Resuma a notícia abaixo de forma clara, objetiva e em português:
-            <noticia>
-            Título: {noticia.titulo}
-            Conteúdo: {noticia.conteudo}
-            </noticia>
-            """
-
-            response = model.generate_content(prompt)
-            resumo = (getattr(response, "text", "") or "").strip()
-            if resumo and len(resumo) > 30:
-                resumo_final = resumo
-        except Exception as e:
-            print(f"[AVISO] Falha no Gemini ({e}); usando fallback")
-
-    if not resumo_final:
-        resumo_final = fallback_resumo
-
-    noticia.resumo = resumo_final
-    noticia.save(update_fields=["resumo"])
-    noticia.refresh_from_db(fields=["resumo"])
-
-    return JsonResponse({"status": "ok", "resumo": noticia.resumo})
+    return JsonResponse(_tarefa_json(tarefa), status=202)
+
+
+def status_resumo(request, pk):
+    tarefa = get_object_or_404(TarefaResumo, pk=pk)
+    return JsonResponse(_tarefa_json(tarefa))
+
+
+# ==============================================
+# EXPORTAÇÃO (staff) — NDJSON/CSV em streaming
+# ==============================================
+@staff_member_required
+def exportar(request, tipo):
+    """
+    /exportar/<noticias|votos|salvos>/?formato=ndjson|csv&desde=<data ISO>
+    O cabeçalho X-Exportacao-Inicio traz o `desde` da próxima exportação incremental.
+    """
+    formato = request.GET.get("formato", "ndjson")
+    try:
+        desde = exportacao.interpretar_desde(request.GET.get("desde"))
+        inicio, pedacos = exportacao.exportar(tipo, formato, desde)
+    except exportacao.ExportacaoInvalida as e:
+        return HttpResponseBadRequest(str(e))
+
+    resposta = StreamingHttpResponse(pedacos, content_type=f"{exportacao.FORMATOS[formato]}; charset=utf-8")
+    resposta.headers["Content-Disposition"] = f'attachment; filename="{tipo}.{formato}"'
+    resposta.headers["X-Exportacao-Inicio"] = inicio.isoformat()
+    resposta.headers["X-Accel-Buffering"] = "no"
+    return resposta
 
 
 # ==============================================
@@ -0,0 +1,10 @@
+#!/bin/sh
+# Comando de inicialização do App Service (startup-command em deploy.yml).
+# Os workers rodam em segundo plano no mesmo contêiner que o gunicorn:
+#   - processar_resumos: fila de resumos (sem ele, as views resumem na requisição)
+#   - descarregar_votos: só com o buffer de votos ligado (NOTICIAS_VOTOS_BUFFER=1)
+python manage.py processar_resumos --loop &
+if [ "$NOTICIAS_VOTOS_BUFFER" = "1" ]; then
+    python manage.py descarregar_votos --loop &
+fi
+exec gunicorn --bind=0.0.0.0 --timeout 600 Brasa.wsgi
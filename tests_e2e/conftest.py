@@ -44,3 +44,10 @@ def user(db):
         password="12345678",
         email="aluno@ex.com"
     )
+
+@pytest.fixture(autouse=True)
+def resumo_sincrono(settings):
+    # Nos E2E não há worker de resumos rodando: processa a tarefa na própria
+    # requisição, com o resumidor local (sem rede).
+    settings.NOTICIAS_RESUMO_EAGER = True
+    settings.NOTICIAS_RESUMIDOR = "noticias.resumo.ResumidorLocal"